@@ -1,21 +1,32 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core import deps
 
 from app.crud import user as crud_user
 from app.crud import booking as crud_reservation
 from app.crud import penalty as crud_penalty
+from app.crud import analytics as crud_analytics
+from app.crud import space as crud_space
 
 from app.models.user import User
 
 from app.schemas.user import UserResponse
 from app.schemas.booking import BookingResponse
 from app.schemas.penalty import PenaltyOut
+from app.schemas.analytics import UtilizationBucket, NoShowRate, HourlyRollupOut
+from app.schemas.purge import PurgeJobOut
 from app.services.no_show import process_no_show_bookings
+from app.services.auto_complete import complete_overdue_bookings
+from app.services.analytics import floor_hour, rebuild_rollups
+from app.services import purge
 # ======================================================================
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -29,7 +40,7 @@ def list_users(
     limit: int = 20,
     role: str | None = None,
     active: bool | None = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: User = Depends(deps.get_current_admin),
 ):
     return crud_user.get_users_filtered(db, page, limit, role, active)
@@ -55,7 +66,7 @@ def unban_user(
 # ================================
 @router.get("/bookings", response_model=List[BookingResponse])
 def list_bookings(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: User = Depends(deps.get_current_admin),
 ):
     return crud_reservation.list_reservations(db)
@@ -65,7 +76,7 @@ def list_bookings(
 # ================================
 @router.get("/penalties", response_model=List[PenaltyOut])
 def list_penalties(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     admin: User = Depends(deps.get_current_admin),
 ):
     return crud_penalty.list_penalties(db)
@@ -77,3 +88,122 @@ def run_no_show(
 ):
     count = process_no_show_bookings(db)
     return {"processed": count}
+
+@router.post("/run-auto-complete", summary="Force complete overdue checked-in bookings")
+def run_auto_complete(
+    penalize: bool = True,
+    db: Session = Depends(get_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    count = complete_overdue_bookings(db, penalize=penalize)
+    return {"processed": count}
+
+# ================================
+# ANALYTICS (đọc từ booking_hourly_rollups)
+# ================================
+def _analytics_window(start: datetime, end: datetime):
+    start, end = floor_hour(start), floor_hour(end)
+    if start >= end:
+        raise HTTPException(400, "Invalid time range.")
+    return start, end
+
+
+@router.get("/analytics/utilization", response_model=List[UtilizationBucket])
+def analytics_utilization(
+    start: datetime,
+    end: datetime,
+    space_id: Optional[int] = None,
+    tz: str = "UTC",
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(400, f"Unknown time zone: {tz}")
+    start, end = _analytics_window(start, end)
+    return crud_analytics.utilization(db, start=start, end=end, space_id=space_id, tz=tz)
+
+
+@router.get("/analytics/no-shows", response_model=List[NoShowRate])
+def analytics_no_shows(
+    start: datetime,
+    end: datetime,
+    space_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    start, end = _analytics_window(start, end)
+    return crud_analytics.no_show_rates(db, start=start, end=end, space_id=space_id)
+
+
+@router.get("/analytics/peaks", response_model=List[HourlyRollupOut])
+def analytics_peaks(
+    start: datetime,
+    end: datetime,
+    space_id: Optional[int] = None,
+    limit: int = 20,
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    start, end = _analytics_window(start, end)
+    return crud_analytics.peak_hours(db, start=start, end=end, space_id=space_id, limit=limit)
+
+
+@router.post("/analytics/rebuild", summary="Backfill hourly rollups for a time range")
+def analytics_rebuild(
+    start: datetime,
+    end: datetime,
+    db: Session = Depends(get_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    start, end = _analytics_window(start, end)
+    return {"rows": rebuild_rollups(db, start, end)}
+
+
+# ================================
+# PURGE (xoá cứng user / space lớn ở nền, xem services.purge)
+# ================================
+@router.post(
+    "/spaces/{space_id}/purge",
+    status_code=204,
+    responses={202: {"model": PurgeJobOut}},
+    summary="Hard-delete a space and its history",
+)
+def purge_space(
+    space_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    db_space = crud_space.get_space(db, space_id)
+    if not db_space:
+        raise HTTPException(404, "Space not found")
+    job = crud_space.purge_space(db, db_space, requested_by=admin.id)
+    if job is not None:
+        return JSONResponse(
+            jsonable_encoder(PurgeJobOut.model_validate(job)),
+            status_code=202,
+            headers={"Location": str(request.url_for("get_purge_job", job_id=job.id))},
+        )
+
+
+@router.get("/purge-jobs", response_model=List[PurgeJobOut])
+def list_purge_jobs(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    return purge.list_jobs(db, limit=limit)
+
+
+@router.get("/purge-jobs/{job_id}", response_model=PurgeJobOut)
+def get_purge_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    admin: User = Depends(deps.get_current_admin),
+):
+    job = purge.get_job(db, job_id)
+    if not job:
+        raise HTTPException(404, "Purge job not found")
+    return job
@@ -1,12 +1,14 @@
 # app/api/v1/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
 from app.schemas.auth import LoginRequest, RegisterRequest, TokenResponse
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
 from app.core.database import get_db
 from app.core.security import create_access_token
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_if_match, check_if_match, set_etag
 from app.crud import user as crud_user
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -18,14 +20,7 @@ router = APIRouter()
 # -------------------------------------------
 @router.post("/register", response_model=UserResponse, status_code=201)
 def register(data: RegisterRequest, db: Session = Depends(get_db)):
-    
-    # Check email conflict
-    if crud_user.get_user_by_email(db, data.email):
-        raise HTTPException(409, "Email already registered")
-
-    # Check username conflict
-    if crud_user.get_user_by_username(db, data.username):
-        raise HTTPException(409, "Username already taken")
+    # Email / username trùng -> 409 do crud_user.create_user map từ unique index
 
     # FE cannot send role → backend sets default
     user_in = UserCreate(
@@ -66,7 +61,8 @@ def login(
 # GET /auth/me
 # -------------------------------------------
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user=Depends(get_current_user)):
+def get_me(response: Response, current_user=Depends(get_current_user)):
+    set_etag(response, current_user)
     return current_user
 
 
@@ -76,8 +72,12 @@ def get_me(current_user=Depends(get_current_user)):
 @router.patch("/me", response_model=UserResponse)
 def update_me(
     update: UserUpdate,
+    response: Response,
+    if_match: Optional[Set[int]] = Depends(get_if_match),
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    check_if_match(current_user, if_match)
     updated = crud_user.update_user(db, current_user, update)
+    set_etag(response, updated)
     return updated
@@ -1,56 +1,106 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional, Set
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.deps import get_current_user
+from app.core.database import get_db, get_read_db
+from app.core.deps import (
+    get_current_user,
+    get_optional_user_id,
+    require_scanner,
+    get_if_match,
+    check_if_match,
+    set_etag,
+)
 from app.models.user import User
 
 from app.crud import booking as crud_booking
-from app.schemas.booking import BookingResponse, BookingCreate, BookingUpdate
+from app.schemas.booking import BookingResponse, BookingCreate, BookingUpdate, QRScanRequest
+from app.core.security import verify_qr_token, QRTokenError
+from app.services.checkin_pipeline import pipeline as checkin_pipeline
+from app.services.idempotency import run_idempotent
 
 router = APIRouter()
 
+
+def _for_viewer(booking, viewer_id: Optional[int]):
+    # QR token = quyền check-in: chỉ chủ booking được thấy
+    if booking.user_id == viewer_id:
+        return booking
+    return BookingResponse.model_validate(booking).model_copy(update={"qr_code_data": None})
+
+
 @router.get("/", response_model=List[BookingResponse])
 def list_bookings(
     userId: Optional[int] = None,
     spaceId: Optional[int] = None,
     status_filter: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    viewer_id: Optional[int] = Depends(get_optional_user_id),
 ):
-    return crud_booking.get_bookings(
+    bookings = crud_booking.get_bookings(
         db,
         user_id=userId,
         space_id=spaceId,
         status=status_filter
     )
+    return [_for_viewer(b, viewer_id) for b in bookings]
 
 @router.get("/{bookingId}", response_model=BookingResponse)
-def get_booking(bookingId: int, db: Session = Depends(get_db)):
+def get_booking(
+    bookingId: int,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    viewer_id: Optional[int] = Depends(get_optional_user_id),
+):
     booking = crud_booking.get_booking(db, bookingId)
     if not booking:
         raise HTTPException(404, "Booking not found")
-    return booking
+    set_etag(response, booking)
+    return _for_viewer(booking, viewer_id)
 
 @router.post("/", response_model=BookingResponse, status_code=201)
 def create_booking(
     data: BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return crud_booking.create_booking(db, data, current_user.id)
+    user_id, role, penalty_points = current_user.id, current_user.role, current_user.penalty_count
+    return run_idempotent(
+        db,
+        idempotency_key,
+        user_id=user_id,
+        route="POST /bookings",
+        payload=data,
+        handler=lambda session: crud_booking.create_booking(
+            session,
+            data,
+            user_id,
+            role=role,
+            penalty_points=penalty_points,
+        ),
+        response_model=BookingResponse,
+        status_code=201,
+    )
 
 @router.patch("/{bookingId}", response_model=BookingResponse)
 def update_booking(
     bookingId: int,
     data: BookingUpdate,
+    response: Response,
+    if_match: Optional[Set[int]] = Depends(get_if_match),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     booking = crud_booking.get_booking(db, bookingId)
+    if not booking:
+        raise HTTPException(404, "Booking not found")
     if booking.user_id != current_user.id:
         raise HTTPException(403, "Not your booking")
-    return crud_booking.update_booking(db, booking, data)
+    check_if_match(booking, if_match)
+    booking = crud_booking.update_booking(db, booking, data, role=current_user.role)
+    set_etag(response, booking)
+    return booking
 
 @router.delete("/{bookingId}", status_code=204)
 def delete_booking(
@@ -66,28 +116,36 @@ def delete_booking(
     crud_booking.delete_booking(db, booking)
 
 
+@router.post("/scan", response_model=BookingResponse, dependencies=[Depends(require_scanner)])
+def scan_qr(
+    data: QRScanRequest,
+    db: Session = Depends(get_db),
+):
+    # Verify chữ ký + thời gian hiệu lực hoàn toàn trong RAM
+    try:
+        claims = verify_qr_token(data.token)
+    except QRTokenError as exc:
+        if exc.reason == "invalid":
+            raise HTTPException(403, "Invalid QR code")
+        raise HTTPException(409, f"QR code is {exc.reason.replace('_', ' ')}")
+
+    if data.space_id is not None and data.space_id != claims["space_id"]:
+        raise HTTPException(409, "QR code is for a different space")
+
+    return crud_booking.check_in_by_token(db, claims)
+
+
 @router.post("/{bookingId}/check-in", response_model=BookingResponse)
 def check_in(
     bookingId: int,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    booking = crud_booking.get_booking(db, bookingId)
-    if not booking:
-        raise HTTPException(404, "Booking not found")
-    if booking.user_id != current_user.id:
-        raise HTTPException(403, "Not your booking")
-    return crud_booking.check_in(db, booking)
+    # Gộp vào micro-batch; ownership + trạng thái được kiểm tra trong câu UPDATE
+    return checkin_pipeline.check_in(bookingId, current_user.id)
 
 @router.post("/{bookingId}/check-out", response_model=BookingResponse)
 def check_out(
     bookingId: int,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    booking = crud_booking.get_booking(db, bookingId)
-    if not booking:
-        raise HTTPException(404, "Booking not found")
-    if booking.user_id != current_user.id:
-        raise HTTPException(403, "Not your booking")
-    return crud_booking.check_out(db, booking)
+    return checkin_pipeline.check_out(bookingId, current_user.id)
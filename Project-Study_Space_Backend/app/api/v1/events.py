@@ -0,0 +1,48 @@
+# app/api/v1/events.py
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.events import bus
+
+router = APIRouter()
+
+MAX_SPACES_PER_SUBSCRIPTION = 50
+HEARTBEAT_SECONDS = 15
+
+
+# -------------------------------------------------------
+# GET /events/bookings?space_id=1&space_id=2   (SSE)
+# -------------------------------------------------------
+@router.get("/bookings")
+async def stream_booking_events(
+    request: Request,
+    space_id: List[int] = Query(...),
+):
+    if len(space_id) > MAX_SPACES_PER_SUBSCRIPTION:
+        raise HTTPException(400, f"Too many spaces (max {MAX_SPACES_PER_SUBSCRIPTION})")
+
+    sub = bus.subscribe(space_id)
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
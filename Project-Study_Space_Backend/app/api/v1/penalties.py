@@ -1,13 +1,14 @@
-from typing import List
+from typing import List, Optional, Set
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.crud import penalty as crud_penalty
-from app.schemas.penalty import PenaltyOut, PenaltyCreate, PenaltyUpdate
+from app.schemas.penalty import PenaltyOut, PenaltyCreate, PenaltyUpdate, MyPenalties
 from app.models.user import User
 from app.core import deps     # import đúng
+from app.services.idempotency import run_idempotent
 
 router = APIRouter(prefix="/penalties", tags=["penalties"])
 
@@ -15,11 +16,21 @@ router = APIRouter(prefix="/penalties", tags=["penalties"])
 @router.post("/", response_model=PenaltyOut, status_code=status.HTTP_201_CREATED)
 def create_penalty(
     data: PenaltyCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
     current_admin: User = Depends(deps.get_current_admin),
 ):
     """Admin tạo penalty cho một user."""
-    return crud_penalty.create_penalty(db, data)
+    return run_idempotent(
+        db,
+        idempotency_key,
+        user_id=current_admin.id,
+        route="POST /penalties",
+        payload=data,
+        handler=lambda session: crud_penalty.create_penalty(session, data),
+        response_model=PenaltyOut,
+        status_code=status.HTTP_201_CREATED,
+    )
 
 
 @router.get("/", response_model=List[PenaltyOut])
@@ -33,26 +44,34 @@ def list_penalties(
     return crud_penalty.list_penalties(db, skip=skip, limit=limit)
 
 
-@router.get("/me", response_model=List[PenaltyOut])
+@router.get("/me", response_model=MyPenalties)
 def list_my_penalties(
     db: Session = Depends(get_db),
     current_user: User = Depends(deps.get_current_user),
 ):
-    """User xem các penalty của chính mình."""
-    return crud_penalty.list_user_penalties(db, user_id=current_user.id)
+    """User xem điểm penalty active và các penalty còn hiệu lực của mình."""
+    return {
+        "active_points": current_user.penalty_count,
+        "penalties": crud_penalty.list_user_penalties(db, user_id=current_user.id, active_only=True),
+    }
 
 
 @router.patch("/{penalty_id}", response_model=PenaltyOut)
 def update_penalty(
     penalty_id: int,
     data: PenaltyUpdate,
+    response: Response,
+    if_match: Optional[Set[int]] = Depends(deps.get_if_match),
     db: Session = Depends(get_db),
     current_admin: User = Depends(deps.get_current_admin),
 ):
     penalty = crud_penalty.get_penalty(db, penalty_id)
     if not penalty:
         raise HTTPException(status_code=404, detail="Penalty not found")
-    return crud_penalty.update_penalty(db, penalty, data)
+    deps.check_if_match(penalty, if_match)
+    penalty = crud_penalty.update_penalty(db, penalty, data)
+    deps.set_etag(response, penalty)
+    return penalty
 
 
 @router.delete("/{penalty_id}", status_code=status.HTTP_204_NO_CONTENT)
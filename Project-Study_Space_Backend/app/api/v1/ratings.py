@@ -1,10 +1,18 @@
 # app/api/v1/ratings.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.deps import get_current_user
-from app.schemas.rating import RatingResponse, RatingCreate, RatingUpdate
+from app.schemas.rating import (
+    RatingResponse,
+    RatingCreate,
+    RatingUpdate,
+    RatingSearchHit,
+    RatingSearchPage,
+)
 from app.crud import rating as crud_rating
 from app.crud import booking as crud_booking  # để kiểm tra user owns booking
 
@@ -12,10 +20,48 @@ router = APIRouter()
 
 
 @router.get("/", response_model=list[RatingResponse])
-def list_ratings(db: Session = Depends(get_db)):
+def list_ratings(db: Session = Depends(get_read_db)):
     return crud_rating.list_ratings(db)
 
 
+def _parse_cursor(cursor: str) -> tuple:
+    try:
+        rank, rating_id = cursor.split(":", 1)
+        return float(rank), int(rating_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+
+@router.get("/search", response_model=RatingSearchPage)
+def search_ratings(
+    q: str = Query(..., min_length=1, max_length=200),
+    space_id: Optional[int] = None,
+    score: Optional[int] = Query(None, ge=1, le=5),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+):
+    rows = crud_rating.search_ratings(
+        db,
+        q=q,
+        space_id=space_id,
+        score=score,
+        after=_parse_cursor(cursor) if cursor else None,
+        limit=limit,
+    )
+
+    items = [
+        RatingSearchHit(**RatingResponse.model_validate(rating).model_dump(), rank=rank)
+        for rating, rank in rows
+    ]
+    next_cursor = None
+    if len(rows) == limit:
+        last_rating, last_rank = rows[-1]
+        next_cursor = f"{last_rank!r}:{last_rating.id}"
+
+    return RatingSearchPage(items=items, next_cursor=next_cursor)
+
+
 @router.post("/", response_model=RatingResponse, status_code=status.HTTP_201_CREATED)
 def create_rating(
     data: RatingCreate,
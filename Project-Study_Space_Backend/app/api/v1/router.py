@@ -1,6 +1,6 @@
 # app/api/v1/router.py
 from fastapi import APIRouter
-from app.api.v1 import bookings, spaces, users, auth, utilities, ratings
+from app.api.v1 import bookings, spaces, users, auth, utilities, ratings, events, sync, waitlist
 from app.api.v1 import penalties as penalties_router
 from app.api.v1 import admin as admin_router
 
@@ -13,4 +13,7 @@ api_router.include_router(auth.router, prefix="/auth", tags=["Auth"])
 api_router.include_router(utilities.router, prefix="/utilities", tags=["Utilities"])
 api_router.include_router(ratings.router, prefix="/ratings", tags=["Ratings"])
 api_router.include_router(penalties_router.router, prefix="/api/v1")
-api_router.include_router(admin_router.router, prefix="/api/v1")
\ No newline at end of file
+api_router.include_router(admin_router.router, prefix="/api/v1")
+api_router.include_router(events.router, prefix="/events", tags=["Events"])
+api_router.include_router(sync.router, prefix="/sync", tags=["Sync"])
+api_router.include_router(waitlist.router, prefix="/waitlist", tags=["Waitlist"])
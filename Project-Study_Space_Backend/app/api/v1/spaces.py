@@ -1,13 +1,33 @@
 # app/api/v1/spaces.py
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Set
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.deps import get_current_admin
-from app.schemas.space import SpaceResponse, SpaceCreate, SpaceUpdate
+from app.core.database import SessionLocal, get_db, get_read_db
+from app.core.deps import get_current_admin, get_current_user, get_if_match, check_if_match, set_etag
+from app.schemas.space import (
+    SpaceResponse,
+    SpaceCreate,
+    SpaceUpdate,
+    SpaceOccupancy,
+    SpaceSort,
+    SpaceRules,
+    HoldCreate,
+    HoldOut,
+    SpaceAvailability,
+    MaintenanceRequest,
+    MaintenanceResult,
+    SlotSuggestion,
+    SpaceType,
+    NearbySpace,
+)
 from app.crud import space as crud_space
+from app.crud import hold as crud_hold
+from app.crud import rating as crud_rating
+from app.schemas.rating import RatingSummary
+from app.services.occupancy import tracker as occupancy
 
 router = APIRouter()
 
@@ -17,27 +37,131 @@ def list_spaces(
     search: Optional[str] = None,
     minCapacity: Optional[int] = None,
     status_filter: Optional[str] = None,
-    db: Session = Depends(get_db),
+    equipment: Optional[List[str]] = Query(
+        None,
+        description='Filter equipment, vd: "projector", "whiteboard=true", "monitors>=2"',
+    ),
+    building: Optional[str] = None,
+    sort: Optional[SpaceSort] = None,
+    db: Session = Depends(get_read_db),
 ):
     return crud_space.get_spaces(
         db,
         search=search,
         min_capacity=minCapacity,
         status=status_filter,
+        equipment=equipment,
+        building=building,
+        sort=sort.value if sort else None,
     )
 
 
+@router.get("/find", response_model=List[SlotSuggestion])
+def find_slots(
+    start_time: datetime,
+    end_time: datetime,
+    type: Optional[SpaceType] = None,
+    minCapacity: int = Query(1, ge=1),
+    utilities: Optional[List[str]] = Query(None, description="Utility keys bắt buộc"),
+    near: Optional[str] = Query(None, description="Lọc theo location, vd: \"B\""),
+    flexMinutes: int = Query(0, ge=0, description="Cho phép lệch giờ bắt đầu ±N phút"),
+    duration: Optional[int] = Query(None, gt=0, description="Thời lượng (phút); mặc định end - start"),
+    stepMinutes: int = Query(15, gt=0),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+):
+    """Gợi ý space + giờ bắt đầu còn trống, xếp theo độ lệch giờ và độ vừa khít."""
+    return crud_space.find_slots(
+        db,
+        start=start_time,
+        end=end_time,
+        space_type=type.value if type else None,
+        min_capacity=minCapacity,
+        utilities=utilities,
+        near=near,
+        flex_minutes=flexMinutes,
+        duration_minutes=duration,
+        step_minutes=stepMinutes,
+        limit=limit,
+    )
+
+
+@router.get("/nearest", response_model=List[NearbySpace])
+def find_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    floor: Optional[int] = None,
+    type: Optional[SpaceType] = None,
+    minCapacity: int = Query(1, ge=1),
+    building: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    maxDistance: Optional[float] = Query(None, gt=0, description="Mét"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+):
+    """Space gần nhất theo khoảng cách; có start_time/end_time thì chỉ trả space còn chỗ."""
+    return crud_space.find_nearest(
+        db,
+        latitude=lat,
+        longitude=lon,
+        floor=floor,
+        space_type=type.value if type else None,
+        min_capacity=minCapacity,
+        building=building,
+        start=start_time,
+        end=end_time,
+        max_distance_m=maxDistance,
+        limit=limit,
+    )
+
+
+@router.get("/occupancy", response_model=List[SpaceOccupancy])
+def get_occupancy():
+    # Đọc từ bộ đếm trong RAM; chỉ chạm DB lần đầu (trước khi scheduler reconcile).
+    # Bộ đếm dùng chung cả process -> nạp từ primary như job reconcile, không từ replica
+    if not occupancy.is_ready:
+        db = SessionLocal()
+        try:
+            occupancy.reconcile(db)
+        finally:
+            db.close()
+    return occupancy.snapshot()
+
+
+@router.post("/maintenance", response_model=MaintenanceResult)
+def start_maintenance(
+    data: MaintenanceRequest,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin),
+):
+    """Đưa space vào bảo trì: huỷ booking bị ảnh hưởng và xếp lại sang space tương đương."""
+    return crud_space.start_maintenance(db, data)
+
+
 @router.get("/{space_id}", response_model=SpaceResponse)
 def get_space(
     space_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
 ):
     db_space = crud_space.get_space(db, space_id)
     if not db_space or not db_space.is_active:
         raise HTTPException(404, "Space not found")
+    set_etag(response, db_space)
     return db_space
 
 
+@router.get("/{space_id}/ratings/summary", response_model=RatingSummary)
+def get_space_rating_summary(
+    space_id: int,
+    db: Session = Depends(get_read_db),
+):
+    if not crud_space.is_active_space(db, space_id):
+        raise HTTPException(404, "Space not found")
+    return crud_rating.get_rating_summary(db, space_id)
+
+
 @router.post("/", response_model=SpaceResponse, status_code=201)
 def create_new_space(
     space_in: SpaceCreate,
@@ -51,13 +175,18 @@ def create_new_space(
 def update_existing_space(
     space_id: int,
     space_in: SpaceUpdate,
+    response: Response,
+    if_match: Optional[Set[int]] = Depends(get_if_match),
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin),
 ):
     db_space = crud_space.get_space(db, space_id)
     if not db_space:
         raise HTTPException(404, "Space not found")
-    return crud_space.update_space(db, db_space, space_in)
+    check_if_match(db_space, if_match)
+    db_space = crud_space.update_space(db, db_space, space_in)
+    set_etag(response, db_space)
+    return db_space
 
 
 @router.delete("/{space_id}", response_model=SpaceResponse)
@@ -70,3 +199,73 @@ def delete_space(
     if not db_space:
         raise HTTPException(404, "Space not found")
     return crud_space.soft_delete_space(db, db_space)
+
+
+@router.get("/{space_id}/rules", response_model=Optional[SpaceRules])
+def get_space_rules(
+    space_id: int,
+    db: Session = Depends(get_read_db),
+):
+    if not crud_space.is_active_space(db, space_id):
+        raise HTTPException(404, "Space not found")
+    return crud_space.get_space_rules(db, space_id)
+
+
+@router.put("/{space_id}/rules", response_model=SpaceRules)
+def set_space_rules(
+    space_id: int,
+    rules_in: SpaceRules,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin),
+):
+    db_space = crud_space.get_space(db, space_id)
+    if not db_space:
+        raise HTTPException(404, "Space not found")
+    return crud_space.set_space_rules(db, db_space, rules_in)
+
+
+@router.delete("/{space_id}/rules", status_code=204)
+def delete_space_rules(
+    space_id: int,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin),
+):
+    crud_space.delete_space_rules(db, space_id)
+
+
+# ======================================================
+# SOFT HOLDS + AVAILABILITY
+# ======================================================
+
+@router.get("/{space_id}/availability", response_model=SpaceAvailability)
+def get_space_availability(
+    space_id: int,
+    start_time: datetime,
+    end_time: datetime,
+    db: Session = Depends(get_read_db),
+):
+    db_space = crud_space.get_space(db, space_id)
+    if not db_space or not db_space.is_active:
+        raise HTTPException(404, "Space not found")
+    return crud_hold.get_availability(db, db_space, start_time, end_time)
+
+
+@router.post("/{space_id}/holds", response_model=HoldOut, status_code=201)
+def place_hold(
+    space_id: int,
+    hold_in: HoldCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Giữ chỗ tạm trong HOLD_TTL_SECONDS; gửi hold_id khi POST /bookings."""
+    return crud_hold.place_hold(db, space_id, hold_in, current_user.id)
+
+
+@router.delete("/{space_id}/holds/{hold_id}", status_code=204)
+def release_hold(
+    space_id: int,
+    hold_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    crud_hold.release_hold(db, space_id, hold_id, current_user.id)
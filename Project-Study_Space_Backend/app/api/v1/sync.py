@@ -0,0 +1,25 @@
+# app/api/v1/sync.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.deps import get_current_user
+from app.crud import sync as crud_sync
+from app.schemas.sync import SyncResponse
+
+router = APIRouter()
+
+
+# -------------------------------------------------------
+# GET /sync?since=<token>
+#   since=0 -> toàn bộ lịch sử; sau đó dùng next_token của lần trước.
+#   has_more=true -> gọi tiếp ngay với next_token.
+# -------------------------------------------------------
+@router.get("/", response_model=SyncResponse)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return crud_sync.get_changes(db, user_id=current_user.id, since=since, limit=limit)
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional, Set
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.schemas.purge import PurgeJobOut
 from app.crud import user as crud_user
 from app.core.security import get_current_user, get_current_admin
+from app.core.deps import get_if_match, check_if_match, set_etag
 
 router = APIRouter()
 
@@ -18,25 +24,16 @@ def list_users(
     return crud_user.get_users(db)
 
 
-# 🛡 REGISTER: public nhưng check conflict đúng
+# 🛡 REGISTER: public; email / username trùng -> 409 từ unique index (crud_user)
 @router.post("/", response_model=UserResponse, status_code=201)
 def create_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    # Email conflict
-    if crud_user.get_user_by_email(db, user_in.email):
-        raise HTTPException(409, "Email already registered")
-
-    # Username conflict (giống CRUD)
-    if db.query(crud_user.User).filter(
-        crud_user.User.username == user_in.username
-    ).first():
-        raise HTTPException(409, "Username already taken")
-
     return crud_user.create_user(db, user_in)
 
 
 # 👤 USER: lấy thông tin chính mình
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user = Depends(get_current_user)):
+def get_me(response: Response, current_user = Depends(get_current_user)):
+    set_etag(response, current_user)
     return current_user
 
 
@@ -44,6 +41,7 @@ def get_me(current_user = Depends(get_current_user)):
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
     user_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -55,6 +53,7 @@ def get_user(
     if current_user.role != "admin" and current_user.id != user_id:
         raise HTTPException(403, "Not allowed to view other users")
 
+    set_etag(response, user)
     return user
 
 
@@ -63,6 +62,8 @@ def get_user(
 def update_user(
     user_id: int,
     data: UserUpdate,
+    response: Response,
+    if_match: Optional[Set[int]] = Depends(get_if_match),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -74,12 +75,17 @@ def update_user(
     if current_user.role != "admin" and current_user.id != user_id:
         raise HTTPException(403, "Not allowed to update other users")
 
-    return crud_user.update_user(db, user, data)
+    check_if_match(user, if_match)
+    user = crud_user.update_user(db, user, data)
+    set_etag(response, user)
+    return user
 
 # 🔐 ADMIN ONLY: xoá user
-@router.delete("/{user_id}", status_code=204)
+# 204 = đã xoá xong; 202 = tài khoản lớn, đang xoá ở nền (theo dõi qua Location)
+@router.delete("/{user_id}", status_code=204, responses={202: {"model": PurgeJobOut}})
 def delete_user(
     user_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
@@ -87,4 +93,10 @@ def delete_user(
     if not user:
         raise HTTPException(404, "User not found")
 
-    crud_user.delete_user(db, user)
+    job = crud_user.delete_user(db, user, requested_by=admin.id)
+    if job is not None:
+        return JSONResponse(
+            jsonable_encoder(PurgeJobOut.model_validate(job)),
+            status_code=202,
+            headers={"Location": str(request.url_for("get_purge_job", job_id=job.id))},
+        )
@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.core.deps import get_current_user
+from app.models.user import User
+
+from app.crud import waitlist as crud_waitlist
+from app.schemas.waitlist import WaitlistCreate, WaitlistOut, WaitlistStatus
+from app.services.idempotency import run_idempotent
+
+router = APIRouter()
+
+
+@router.post("/", response_model=WaitlistOut, status_code=201)
+def join_waitlist(
+    data: WaitlistCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Xếp hàng chờ khi space đã kín; được tạo booking tự động khi có chỗ."""
+    user_id = current_user.id
+    return run_idempotent(
+        db,
+        idempotency_key,
+        user_id=user_id,
+        route="POST /waitlist",
+        payload=data,
+        handler=lambda session: crud_waitlist.join_waitlist(session, data, user_id),
+        response_model=WaitlistOut,
+        status_code=201,
+    )
+
+
+@router.get("/me", response_model=List[WaitlistOut])
+def list_my_waitlist(
+    status_filter: Optional[WaitlistStatus] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    return crud_waitlist.list_user_entries(
+        db, current_user.id, status_filter.value if status_filter else None
+    )
+
+
+@router.get("/space/{spaceId}", response_model=List[WaitlistOut])
+def list_space_waitlist(spaceId: int, db: Session = Depends(get_db)):
+    return crud_waitlist.list_space_waitlist(db, spaceId)
+
+
+@router.delete("/{entryId}", response_model=WaitlistOut)
+def leave_waitlist(
+    entryId: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    entry = crud_waitlist.get_entry(db, entryId)
+    if not entry:
+        raise HTTPException(404, "Waitlist entry not found")
+    if entry.user_id != current_user.id:
+        raise HTTPException(403, "Not your waitlist entry")
+    return crud_waitlist.leave_waitlist(db, entry)
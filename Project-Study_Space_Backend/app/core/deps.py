@@ -1,16 +1,20 @@
 # app/core/deps.py
-from fastapi import Depends, HTTPException, status
+import hmac
+from typing import Optional, Set
+
+from fastapi import Depends, Header, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.security import decode_access_token
+from app.core.security import decode_access_token, SCANNER_API_KEY
 from app.crud.user import get_user
 from app.schemas.user import UserRole 
 from app.models.user import UserRole, User
 
 # DÙNG ĐƯỜNG DẪN ĐẦY ĐỦ
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 
 def get_current_user(
@@ -33,6 +37,18 @@ def get_current_user(
     return user
 
 
+def get_optional_user_id(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[int]:
+    """User id trong JWT nếu có (không chạm DB), cho endpoint công khai."""
+    if not token:
+        return None
+    return decode_access_token(token)
+
+
+def require_scanner(x_scanner_key: Optional[str] = Header(None, alias="X-Scanner-Key")) -> None:
+    if x_scanner_key is None or not hmac.compare_digest(x_scanner_key, SCANNER_API_KEY):
+        raise HTTPException(status_code=401, detail="Scanner credentials required")
+
+
 def get_current_admin(current_user=Depends(get_current_user)):
     # Tùy cách anh define UserRole, nhưng cơ bản là check role = admin
     if str(current_user.role) != UserRole.admin.value and current_user.role != "admin":
@@ -49,3 +65,43 @@ def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
             detail="Admin privilege required",
         )
     return current_user
+
+
+# ======================================================
+# OPTIMISTIC CONCURRENCY: ETag / If-Match
+# ======================================================
+# ETag = cột version của resource (version_id_col). Client gửi lại qua
+# If-Match khi PATCH: lệch -> 412 (đọc lại rồi sửa); khớp nhưng có người
+# commit chen giữa lúc đọc và lúc ghi -> 409 (crud.constraints).
+# Không gửi If-Match (hoặc "*") -> chỉ còn kiểm tra 409 lúc ghi.
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def set_etag(response: Response, obj) -> None:
+    response.headers["ETag"] = etag(obj.version)
+
+
+def get_if_match(if_match: Optional[str] = Header(None, alias="If-Match")) -> Optional[Set[int]]:
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = set()
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if not tag.isdigit():
+            raise HTTPException(400, "Invalid If-Match header")
+        versions.add(int(tag))
+    return versions
+
+
+def check_if_match(obj, expected: Optional[Set[int]]) -> None:
+    if expected is not None and obj.version not in expected:
+        raise HTTPException(
+            status.HTTP_412_PRECONDITION_FAILED,
+            "Resource has been modified; reload and retry.",
+            headers={"ETag": etag(obj.version)},
+        )
@@ -0,0 +1,245 @@
+# app/core/limits.py
+"""
+Rate limit + admission control cho toàn bộ API (ASGI middleware).
+
+1. Phân loại request thành route class (checkin / write / read / admin).
+2. Token bucket theo (principal, route class): principal = user id trong
+   JWT (decode không cần DB) hoặc IP. Vượt -> 429 + Retry-After.
+   Backend mặc định trong RAM mỗi worker; RATE_LIMIT_BACKEND = "postgres"
+   dùng bảng UNLOGGED rate_limit_buckets để chia sẻ giữa các worker (DB lỗi
+   -> cho qua + log, limiter không được làm sập API).
+   Máy quét cửa (/bookings/scan) gửi thay cho mọi người đi qua cửa từ 1 IP:
+   không có bucket theo principal, chỉ qua admission control.
+3. Admission control: giới hạn số request đang chạy theo class và tổng.
+   Class ưu tiên thấp chỉ được vào khi tổng in-flight còn dưới ngưỡng của
+   nó (admin/analytics bị cắt trước, check-in/check-out luôn còn chỗ).
+   Không có chỗ -> chờ tối đa deadline của class rồi 503 + Retry-After.
+
+SSE (/events) và docs không đi qua limiter.
+"""
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from app.core.database import SessionLocal
+from app.core.security import decode_access_token
+from app.models.rate_limit import RateLimitBucket  # noqa: F401  (đăng ký bảng)
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = "memory"   # "memory" | "postgres"
+MAX_INFLIGHT = 80
+MAX_TRACKED_BUCKETS = 50000
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    rate: float            # token / giây
+    burst: int             # dung lượng bucket
+    max_inflight: int      # request đồng thời tối đa của class
+    shed_at: float         # chỉ nhận khi tổng in-flight < shed_at * MAX_INFLIGHT
+    deadline: float        # giây tối đa chờ slot trước khi 503
+    per_principal: bool = True   # False = không token bucket, chỉ admission
+
+
+ROUTE_CLASSES: Dict[str, RouteClass] = {
+    "scan": RouteClass("scan", rate=0, burst=0, max_inflight=MAX_INFLIGHT, shed_at=1.0, deadline=2.0,
+                       per_principal=False),
+    "checkin": RouteClass("checkin", rate=2, burst=10, max_inflight=MAX_INFLIGHT, shed_at=1.0, deadline=2.0),
+    "write": RouteClass("write", rate=2, burst=20, max_inflight=32, shed_at=0.9, deadline=1.0),
+    "read": RouteClass("read", rate=10, burst=40, max_inflight=40, shed_at=0.75, deadline=0.5),
+    "admin": RouteClass("admin", rate=0.5, burst=5, max_inflight=4, shed_at=0.5, deadline=0.0),
+}
+
+_API_PREFIX = "/api/v1"
+_EXEMPT = re.compile(r"^/(docs|redoc|openapi\.json)?$|^/api/v1/events/")
+_SCAN = re.compile(r"^/bookings/scan$")
+_CHECKIN = re.compile(r"^/bookings/\d+/check-(in|out)$")
+_ADMIN = re.compile(r"(^|/)(admin)(/|$)")
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    if _EXEMPT.match(path):
+        return None
+    if path.startswith(_API_PREFIX):
+        path = path[len(_API_PREFIX):]
+    if _ADMIN.search(path):
+        return "admin"
+    if method == "POST" and _SCAN.match(path.rstrip("/")):
+        return "scan"
+    if method == "POST" and _CHECKIN.match(path.rstrip("/")):
+        return "checkin"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+def principal(scope) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                user_id = decode_access_token(token)
+                if user_id is not None:
+                    return f"user:{user_id}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+# ======================================================
+# TOKEN BUCKET BACKENDS
+# ======================================================
+
+class MemoryBuckets:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """0 nếu được phép, ngược lại số giây cần chờ."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > MAX_TRACKED_BUCKETS:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+_TAKE_SQL = text("""
+INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+VALUES (:key, :burst - 1, clock_timestamp())
+ON CONFLICT (key) DO UPDATE SET
+    tokens = LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * :rate) - 1,
+    updated_at = clock_timestamp()
+WHERE LEAST(:burst, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * :rate) >= 1
+RETURNING tokens
+""")
+
+_PEEK_SQL = text("""
+SELECT LEAST(:burst, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * :rate)
+FROM rate_limit_buckets WHERE key = :key
+""")
+
+
+class PostgresBuckets:
+    """Bucket dùng chung giữa các worker: 1 câu upsert có điều kiện / request."""
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        db = SessionLocal()
+        try:
+            params = {"key": key, "rate": rate, "burst": burst}
+            taken = db.execute(_TAKE_SQL, params).first()
+            db.commit()
+            if taken is not None:
+                return 0.0
+            tokens = db.execute(_PEEK_SQL, params).scalar() or 0.0
+            return max((1 - float(tokens)) / rate, 0.0)
+        except Exception:
+            # fail open: admission control vẫn chặn quá tải
+            logger.warning("rate limit bucket %s unavailable, allowing request", key, exc_info=True)
+            return 0.0
+        finally:
+            db.close()
+
+
+# ======================================================
+# ADMISSION CONTROL
+# ======================================================
+
+class Admission:
+    def __init__(self):
+        self.total = 0
+        self.by_class: Dict[str, int] = {name: 0 for name in ROUTE_CLASSES}
+        self._changed: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _fits(self, rc: RouteClass) -> bool:
+        return (
+            self.by_class[rc.name] < rc.max_inflight
+            and self.total < math.ceil(rc.shed_at * MAX_INFLIGHT)
+        )
+
+    async def acquire(self, rc: RouteClass) -> bool:
+        changed = self._condition()
+        async with changed:
+            if not self._fits(rc):
+                if rc.deadline <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(changed.wait_for(lambda: self._fits(rc)), rc.deadline)
+                except asyncio.TimeoutError:
+                    return False
+            self.total += 1
+            self.by_class[rc.name] += 1
+            return True
+
+    async def release(self, rc: RouteClass) -> None:
+        changed = self._condition()
+        async with changed:
+            self.total -= 1
+            self.by_class[rc.name] -= 1
+            changed.notify_all()
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class LimitsMiddleware:
+    def __init__(self, app, backend: Optional[str] = None):
+        self.app = app
+        self.buckets = PostgresBuckets() if (backend or RATE_LIMIT_BACKEND) == "postgres" else MemoryBuckets()
+        self.admission = Admission()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+        rc = ROUTE_CLASSES[name]
+
+        who = principal(scope)
+        key = f"{who}:{name}"
+        if not rc.per_principal:
+            wait = 0.0
+        elif isinstance(self.buckets, MemoryBuckets):
+            wait = self.buckets.take(key, rc.rate, rc.burst)
+        else:
+            wait = await run_in_threadpool(self.buckets.take, key, rc.rate, rc.burst)
+        if wait > 0:
+            return await _reject(429, "Too many requests.", wait)(scope, receive, send)
+
+        if not await self.admission.acquire(rc):
+            return await _reject(503, "Server is busy, please retry.", 1)(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.admission.release(rc)
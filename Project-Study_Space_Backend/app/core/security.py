@@ -1,4 +1,7 @@
-from datetime import datetime, timedelta
+import base64
+import hashlib
+import hmac
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from jose import JWTError, jwt
@@ -19,6 +22,12 @@ SECRET_KEY = "very-secret-key-change-me-once-and-keep"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24h
 
+# QR check-in token (HMAC, không phải JWT để QR ngắn gọn)
+QR_SECRET_KEY = (SECRET_KEY + ":qr-check-in").encode()
+QR_TOKEN_VERSION = "v1"
+# Máy quét cửa gửi key này qua header X-Scanner-Key khi gọi /bookings/scan
+SCANNER_API_KEY = "door-scanner-key-change-me"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
@@ -68,6 +77,69 @@ def decode_access_token(token: str) -> Optional[int]:
         return None
 
 
+# ==========================================
+#   QR CHECK-IN TOKEN
+#   v1.<booking_id>.<space_id>.<valid_from>.<valid_until>.<sig>
+#   Verify chỉ cần SECRET, không cần DB.
+# ==========================================
+
+def _qr_signature(payload: str) -> str:
+    digest = hmac.new(QR_SECRET_KEY, payload.encode(), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def _epoch(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def create_qr_token(booking_id: int, space_id: int, valid_from: datetime, valid_until: datetime) -> str:
+    payload = ".".join([
+        QR_TOKEN_VERSION,
+        str(booking_id),
+        str(space_id),
+        str(_epoch(valid_from)),
+        str(_epoch(valid_until)),
+    ])
+    return f"{payload}.{_qr_signature(payload)}"
+
+
+class QRTokenError(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def verify_qr_token(token: str, now: Optional[datetime] = None) -> dict:
+    """Trả về {booking_id, space_id, valid_from, valid_until} hoặc raise QRTokenError."""
+    parts = token.split(".")
+    if len(parts) != 6 or parts[0] != QR_TOKEN_VERSION:
+        raise QRTokenError("invalid")
+
+    payload, signature = ".".join(parts[:5]), parts[5]
+    if not hmac.compare_digest(signature, _qr_signature(payload)):
+        raise QRTokenError("invalid")
+
+    try:
+        booking_id, space_id, valid_from, valid_until = (int(p) for p in parts[1:5])
+    except ValueError:
+        raise QRTokenError("invalid")
+
+    ts = (now or datetime.now(timezone.utc)).timestamp()
+    if ts < valid_from:
+        raise QRTokenError("not_yet_valid")
+    if ts > valid_until:
+        raise QRTokenError("expired")
+
+    return {
+        "booking_id": booking_id,
+        "space_id": space_id,
+        "valid_from": valid_from,
+        "valid_until": valid_until,
+    }
+
+
 # ==========================================
 #   GET CURRENT USER (MAIN DEPENDENCY)
 # ==========================================
@@ -0,0 +1,115 @@
+# app/crud/analytics.py
+from datetime import datetime, time, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, func, extract, desc
+from sqlalchemy.orm import Session
+
+from app.models.analytics import BookingHourlyRollup as R
+from app.models.space import Space
+
+
+def _range(stmt, start: datetime, end: datetime, space_id: Optional[int]):
+    stmt = stmt.where(R.hour_start >= start, R.hour_start < end)
+    if space_id is not None:
+        stmt = stmt.where(R.space_id == space_id)
+    return stmt
+
+
+def _weekday_counts(start: datetime, end: datetime, tz: str) -> dict:
+    # Số ngày (theo giờ địa phương) của từng thứ ISO 1..7 -> mẫu số cho utilization
+    zone = ZoneInfo(tz)
+    local_start, local_end = start.astimezone(zone), end.astimezone(zone)
+    day, last = local_start.date(), local_end.date()
+    if local_end.time() != time.min:
+        last += timedelta(days=1)
+
+    counts = {d: 0 for d in range(1, 8)}
+    while day < last:
+        counts[day.isoweekday()] += 1
+        day += timedelta(days=1)
+    return counts
+
+
+def utilization(
+    db: Session,
+    *,
+    start: datetime,
+    end: datetime,
+    space_id: Optional[int] = None,
+    tz: str = "UTC",
+) -> List[dict]:
+    local_hour = func.timezone(tz, R.hour_start)
+    weekday = extract("isodow", local_hour)
+    hour = extract("hour", local_hour)
+
+    stmt = _range(
+        select(
+            R.space_id,
+            Space.capacity,
+            weekday.label("weekday"),
+            hour.label("hour"),
+            func.sum(R.booked_minutes).label("booked_minutes"),
+            func.sum(R.used_minutes).label("used_minutes"),
+            func.max(R.peak_concurrent).label("peak_concurrent"),
+        ).join(Space, Space.id == R.space_id),
+        start, end, space_id,
+    ).group_by(R.space_id, Space.capacity, weekday, hour).order_by(R.space_id, weekday, hour)
+
+    days = _weekday_counts(start, end, tz)
+    result = []
+    for row in db.execute(stmt).all():
+        available = days[int(row.weekday)] * 60 * max(row.capacity, 1)
+        result.append({
+            "space_id": row.space_id,
+            "weekday": int(row.weekday),
+            "hour": int(row.hour),
+            "booked_minutes": int(row.booked_minutes),
+            "used_minutes": int(row.used_minutes),
+            "peak_concurrent": int(row.peak_concurrent),
+            "booked_utilization": row.booked_minutes / available if available else 0.0,
+            "used_utilization": row.used_minutes / available if available else 0.0,
+        })
+    return result
+
+
+def no_show_rates(
+    db: Session,
+    *,
+    start: datetime,
+    end: datetime,
+    space_id: Optional[int] = None,
+) -> List[dict]:
+    stmt = _range(
+        select(
+            R.space_id,
+            func.sum(R.bookings).label("bookings"),
+            func.sum(R.no_shows).label("no_shows"),
+        ),
+        start, end, space_id,
+    ).group_by(R.space_id).order_by(R.space_id)
+
+    return [
+        {
+            "space_id": row.space_id,
+            "bookings": int(row.bookings),
+            "no_shows": int(row.no_shows),
+            "no_show_rate": row.no_shows / row.bookings if row.bookings else 0.0,
+        }
+        for row in db.execute(stmt).all()
+    ]
+
+
+def peak_hours(
+    db: Session,
+    *,
+    start: datetime,
+    end: datetime,
+    space_id: Optional[int] = None,
+    limit: int = 20,
+) -> List[R]:
+    stmt = _range(select(R), start, end, space_id).order_by(
+        desc(R.peak_concurrent), desc(R.booked_minutes)
+    ).limit(limit)
+    return db.execute(stmt).scalars().all()
@@ -1,12 +1,72 @@
 # app/crud/booking.py
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from datetime import datetime
+from sqlalchemy import select, update, delete, func, values, column, case, cast, Integer, String
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
 
-from app.models.space import Space
-from app.models.booking import Booking
+from app.models.space import Space, SpaceHold
+from app.models.booking import Booking, booking_status_enum
+from app.models.waitlist import WaitlistEntry
 from app.schemas.booking import BookingCreate, BookingUpdate
+from app.core.security import create_qr_token
+from app.services.occupancy import tracker as occupancy
+from app.services.events import notify_booking_event, notify_booking_events
+from app.services.booking_policy import policy
+from app.services.space_calendar import calendar
+from app.services.no_show import GRACE_PERIOD_MINUTES
+from app.services.change_log import record_changes
+from app.crud.constraints import commit_or_conflict, flush_or_conflict
+
+# QR check-in hợp lệ từ 15 phút trước giờ bắt đầu đến hết grace period no-show
+CHECK_IN_EARLY_MINUTES = 15
+
+# Khung giờ dài nhất được xếp hàng chờ -> giới hạn dưới cho range scan start_time
+WAITLIST_MAX_MINUTES = 12 * 60
+# Số entry tối đa đọc mỗi lần có chỗ trống
+WAITLIST_SCAN_LIMIT = 20
+# Tăng capacity / mở lại space: promote người chờ trong khoảng này tính từ bây giờ
+WAITLIST_PROMOTION_HORIZON = timedelta(days=7)
+
+
+def issue_qr_token(booking: Booking) -> None:
+    booking.qr_code_data = create_qr_token(
+        booking.id,
+        booking.space_id,
+        booking.start_time - timedelta(minutes=CHECK_IN_EARLY_MINUTES),
+        booking.start_time + timedelta(minutes=GRACE_PERIOD_MINUTES),
+    )
+
+
+def count_taken(db: Session, space_id: int, start: datetime, end: datetime,
+                exclude_user_id: int = None):
+    """
+    (booked, held) trong [start, end): booking pending/confirmed và hold còn
+    hạn của người khác, trong 1 round trip.
+    """
+    booked = (
+        select(func.count())
+        .select_from(Booking)
+        .where(
+            Booking.space_id == space_id,
+            Booking.status.in_(["pending", "confirmed"]),
+            Booking.start_time < end,
+            Booking.end_time > start,
+        )
+        .scalar_subquery()
+    )
+    held = (
+        select(func.count())
+        .select_from(SpaceHold)
+        .where(
+            SpaceHold.space_id == space_id,
+            SpaceHold.expires_at > func.now(),
+            SpaceHold.start_time < end,
+            SpaceHold.end_time > start,
+        )
+    )
+    if exclude_user_id is not None:
+        held = held.where(SpaceHold.user_id != exclude_user_id)
+    return tuple(db.execute(select(booked, held.scalar_subquery())).one())
 
 
 def get_booking(db: Session, booking_id: int):
@@ -28,41 +88,87 @@ def get_bookings(db: Session, *, user_id=None, space_id=None, status=None):
     return db.execute(stmt).scalars().all()
 
 
-def create_booking(db: Session, data: BookingCreate, current_user_id: int):
+def create_booking(
+    db: Session,
+    data: BookingCreate,
+    current_user_id: int,
+    role="student",
+    penalty_points: int = 0,
+):
 
     # time check
     if data.start_time >= data.end_time:
         raise HTTPException(400, "Invalid time range.")
 
-    # space check
-    space = db.query(Space).filter(Space.id == data.space_id).first()
+    # policy theo role (counter trong RAM, không query thêm khi đã cache)
+    policy.check(
+        db,
+        user_id=current_user_id,
+        role=role,
+        penalty_points=penalty_points,
+        start=data.start_time,
+        end=data.end_time,
+    )
+
+    # space check (chỉ lấy cột cần, không load Space -> tránh selectin bookings/ratings)
+    stmt = select(Space.capacity, Space.is_active, Space.status).where(Space.id == data.space_id)
+    if data.hold_id is None:
+        # Đếm chỗ trống rồi mới INSERT: khoá dòng space giống place_hold để
+        # booking / hold đồng thời trên cùng space xếp hàng, không vượt capacity
+        stmt = stmt.with_for_update()
+    space = db.execute(stmt).first()
     if not space:
         raise HTTPException(404, "Space not found.")
 
     if not space.is_active or space.status != "available":
         raise HTTPException(409, "Space is not available.")
-    
-    user_overlap = db.query(Booking).filter(
-        Booking.user_id == current_user_id,
-        Booking.space_id == data.space_id,
-        Booking.status.in_(["pending", "confirmed"]),
-        Booking.start_time < data.end_time,
-        Booking.end_time > data.start_time,
-    ).count()
-
-    if user_overlap >= 1:
-        raise HTTPException(409, "You already have a booking in this time range.")
-
-    # overlap
-    active_bookings = db.query(Booking).filter(
-        Booking.space_id == data.space_id,
-        Booking.status.in_(["pending", "confirmed"]),
-        Booking.start_time < data.end_time,
-        Booking.end_time > data.start_time,
-    ).count()
-
-    if active_bookings >= space.capacity:
-        raise HTTPException(409, "Space is fully booked in this time range.")
+
+    # opening hours / closures / duration / slot / lead time
+    calendar.validate(db, data.space_id, data.start_time, data.end_time)
+
+    if data.hold_id is not None:
+        # Chỗ đã được giữ + đã kiểm tra trùng lịch lúc tạo hold -> chỉ cần
+        # tiêu thụ hold (1 câu DELETE ... RETURNING), bỏ qua overlap check
+        converted = db.execute(
+            delete(SpaceHold)
+            .where(
+                SpaceHold.id == data.hold_id,
+                SpaceHold.user_id == current_user_id,
+                SpaceHold.space_id == data.space_id,
+                SpaceHold.start_time == data.start_time,
+                SpaceHold.end_time == data.end_time,
+                SpaceHold.expires_at > func.now(),
+            )
+            .returning(SpaceHold.id)
+        ).first()
+        if converted is None:
+            raise HTTPException(409, "Hold has expired or does not match this booking.")
+    else:
+        user_overlap = db.query(Booking).filter(
+            Booking.user_id == current_user_id,
+            Booking.space_id == data.space_id,
+            Booking.status.in_(["pending", "confirmed"]),
+            Booking.start_time < data.end_time,
+            Booking.end_time > data.start_time,
+        ).count()
+
+        if user_overlap >= 1:
+            raise HTTPException(409, "You already have a booking in this time range.")
+
+        # Đặt thẳng không qua hold: hold cũ của user trên space này bỏ luôn
+        # (cùng transaction), không để nó chiếm thêm 1 chỗ tới khi hết hạn
+        db.execute(
+            delete(SpaceHold).where(
+                SpaceHold.space_id == data.space_id,
+                SpaceHold.user_id == current_user_id,
+            )
+        )
+
+        # overlap (booking + hold còn hạn của người khác)
+        booked, held = count_taken(db, data.space_id, data.start_time, data.end_time)
+
+        if booked + held >= space.capacity:
+            raise HTTPException(409, "Space is fully booked in this time range.")
 
     booking = Booking(
         user_id=current_user_id,
@@ -70,17 +176,20 @@ def create_booking(db: Session, data: BookingCreate, current_user_id: int):
         start_time=data.start_time,
         end_time=data.end_time,
         status="pending",
-        qr_code_data=data.qr_code_data,
         notes=data.notes,
     )
 
     db.add(booking)
+    db.flush()
+    # QR do server ký (bỏ qua qr_code_data client gửi lên)
+    issue_qr_token(booking)
+    notify_booking_event(db, "created", booking)
     db.commit()
-    db.refresh(booking)
+    policy.on_created(booking)
     return booking
 
 
-def update_booking(db, booking: Booking, updates: BookingUpdate):
+def update_booking(db, booking: Booking, updates: BookingUpdate, role=None):
 
     data = updates.model_dump(exclude_unset=True)
 
@@ -99,6 +208,19 @@ def update_booking(db, booking: Booking, updates: BookingUpdate):
 
         if new_start >= new_end:
             raise HTTPException(400, "Invalid time range.")
+
+        calendar.validate(db, booking.space_id, new_start, new_end)
+
+        if role is not None:
+            policy.check(
+                db,
+                user_id=booking.user_id,
+                role=role,
+                penalty_points=0,
+                start=new_start,
+                end=new_end,
+                replacing=booking,
+            )
     
         overlap = db.query(Booking).filter(
             Booking.id != booking.id,
@@ -111,20 +233,49 @@ def update_booking(db, booking: Booking, updates: BookingUpdate):
         if overlap >= 1:
             raise HTTPException(409, "This time range is already booked.")
     
+    old_window = (booking.start_time, booking.end_time)
+
+    # qr_code_data do server cấp, không cho client ghi đè
+    data.pop("qr_code_data", None)
+
     for k, v in data.items():
         if hasattr(v, "value"):
             v = v.value
         setattr(booking, k, v)
 
-    db.commit()
-    db.refresh(booking)
+    rescheduled = (booking.start_time, booking.end_time) != old_window
+    if rescheduled:
+        issue_qr_token(booking)
+
+    notify_booking_event(db, "updated", booking)
+    promoted = []
+    if rescheduled:
+        # khung giờ cũ vừa trống -> người chờ lên lượt trong cùng transaction.
+        # autoflush=False: flush giờ mới trước để count_taken không còn đếm chỗ cũ
+        flush_or_conflict(db)
+        promoted = promote_waiters(db, booking.space_id, *old_window)
+    commit_or_conflict(db)
+    if rescheduled:
+        policy.on_rescheduled(booking.user_id, old_window, booking)
+    on_promoted(promoted)
     return booking
 
 
 
 def delete_booking(db, booking: Booking):
+    was_checked_in = booking.status == "checked_in"
+    snapshot = (booking.user_id, booking.status, booking.start_time, booking.end_time)
+    space_id = booking.space_id
+    notify_booking_event(db, "cancelled", booking)
     db.delete(booking)
-    db.commit()
+    # autoflush=False: DELETE phải xuống DB trước khi count_taken đếm chỗ trống
+    flush_or_conflict(db)
+    promoted = promote_waiters(db, space_id, snapshot[2], snapshot[3])
+    commit_or_conflict(db)
+    if was_checked_in:
+        occupancy.decrement(space_id)
+    policy.on_cancelled(*snapshot)
+    on_promoted(promoted)
 
 
 def check_in(db, booking: Booking):
@@ -133,9 +284,10 @@ def check_in(db, booking: Booking):
         raise HTTPException(400, "Booking cannot be checked in now.")
 
     booking.status = "checked_in"
-    booking.check_in_time = datetime.utcnow()
-    db.commit()
-    db.refresh(booking)
+    booking.check_in_time = datetime.now(timezone.utc)
+    notify_booking_event(db, "checked_in", booking)
+    commit_or_conflict(db)
+    occupancy.increment(booking.space_id)
     return booking
 
 
@@ -145,11 +297,220 @@ def check_out(db, booking: Booking):
         raise HTTPException(400, "Booking must be checked in before checking out.")
 
     booking.status = "completed"
-    booking.check_out_time = datetime.utcnow()
+    booking.check_out_time = datetime.now(timezone.utc)
+    notify_booking_event(db, "checked_out", booking)
+    commit_or_conflict(db)
+    occupancy.decrement(booking.space_id)
+    policy.on_finished(booking.user_id)
+    return booking
+
+
+def check_in_by_token(db, claims: dict):
+    """
+    Check-in từ máy quét cửa: token đã được verify (không DB), ở đây chỉ
+    1 câu UPDATE có điều kiện ... RETURNING. Khung giờ check-in được kiểm
+    lại theo start_time hiện tại: token cấp trước khi dời giờ không còn
+    dùng được ngoài khung mới.
+    """
+    now = func.now()
+    stmt = (
+        update(Booking)
+        .where(
+            Booking.id == claims["booking_id"],
+            Booking.space_id == claims["space_id"],
+            Booking.status == "pending",
+            now >= Booking.start_time - timedelta(minutes=CHECK_IN_EARLY_MINUTES),
+            now <= Booking.start_time + timedelta(minutes=GRACE_PERIOD_MINUTES),
+        )
+        .values(status="checked_in", check_in_time=now, version=Booking.version + 1)
+        .returning(Booking)
+        .execution_options(synchronize_session=False)
+    )
+    booking = db.execute(stmt).scalars().first()
+    if booking is None:
+        db.rollback()
+        raise HTTPException(409, "Booking cannot be checked in now (not pending or outside the check-in window).")
+
+    notify_booking_event(db, "checked_in", booking)
+    record_changes(db, "booking", [(booking.id, booking.user_id)])
+    # Giữ nguyên giá trị từ RETURNING, không SELECT lại sau commit
+    db.expunge(booking)
     db.commit()
-    db.refresh(booking)
+    occupancy.increment(booking.space_id)
     return booking
 
 
+# ======================================================
+# BATCH CHECK-IN / CHECK-OUT (services.checkin_pipeline)
+# ======================================================
+
+_TRANSITIONS = {
+    # op: (trạng thái hiện tại bắt buộc, trạng thái mới, event, lỗi nếu sai trạng thái)
+    "check_in": ("pending", "checked_in", "checked_in", "Booking cannot be checked in now."),
+    "check_out": ("checked_in", "completed", "checked_out", "Booking must be checked in before checking out."),
+}
+
+
+def apply_transitions(db: Session, items) -> dict:
+    """
+    items: [(booking_id, user_id, op)] với booking_id không trùng nhau.
+    1 câu UPDATE ... FROM (VALUES ...) RETURNING cho cả batch + 1 commit.
+    Trả về {booking_id: dict các cột booking | HTTPException}.
+    """
+    v = values(
+        column("id", Integer),
+        column("user_id", Integer),
+        column("op", String),
+        name="v",
+    ).data([(booking_id, user_id, op) for booking_id, user_id, op in items])
+
+    expected = case(
+        *((v.c.op == op, t[0]) for op, t in _TRANSITIONS.items()),
+    )
+    new_status = case(
+        *((v.c.op == op, t[1]) for op, t in _TRANSITIONS.items()),
+    )
+    bookings = Booking.__table__
+    now = func.now()
+
+    stmt = (
+        update(bookings)
+        .where(
+            bookings.c.id == v.c.id,
+            bookings.c.user_id == v.c.user_id,
+            bookings.c.status == cast(expected, booking_status_enum),
+        )
+        .values(
+            status=cast(new_status, booking_status_enum),
+            check_in_time=case((v.c.op == "check_in", now), else_=bookings.c.check_in_time),
+            check_out_time=case((v.c.op == "check_out", now), else_=bookings.c.check_out_time),
+            updated_at=now,
+            version=bookings.c.version + 1,
+        )
+        .returning(*bookings.c)
+    )
+    rows = db.execute(stmt).all()
+
+    ops = {booking_id: op for booking_id, _, op in items}
+    results = {row.id: dict(row._mapping) for row in rows}
 
+    notify_booking_events(db, [(_TRANSITIONS[ops[row.id]][2], row) for row in rows])
+    record_changes(db, "booking", [(row.id, row.user_id) for row in rows])
+    db.commit()
 
+    for row in rows:
+        if ops[row.id] == "check_in":
+            occupancy.increment(row.space_id)
+        else:
+            occupancy.decrement(row.space_id)
+            policy.on_finished(row.user_id)
+
+    # Chỉ những item thất bại mới cần đọc lại để trả lỗi đúng như check_in/check_out
+    failed = [item for item in items if item[0] not in results]
+    if failed:
+        current = {
+            row.id: row
+            for row in db.execute(
+                select(Booking.id, Booking.user_id, Booking.status)
+                .where(Booking.id.in_([booking_id for booking_id, _, _ in failed]))
+            ).all()
+        }
+        for booking_id, user_id, op in failed:
+            row = current.get(booking_id)
+            if row is None:
+                results[booking_id] = HTTPException(404, "Booking not found")
+            elif row.user_id != user_id:
+                results[booking_id] = HTTPException(403, "Not your booking")
+            else:
+                results[booking_id] = HTTPException(400, _TRANSITIONS[op][3])
+
+    return results
+
+
+# ======================================================
+# WAITLIST PROMOTION
+# ======================================================
+
+def promote_waiters(db: Session, space_id: int, start: datetime, end: datetime,
+                    limit: int = 1) -> list:
+    """
+    Gọi trong transaction vừa giải phóng chỗ [start, end), trước commit.
+
+    Chỉ đọc entry waiting của space có start_time trong
+    [start - WAITLIST_MAX_MINUTES, end) qua index partial
+    ix_waitlist_waiting_space_start (range seek, không quét cả hàng chờ),
+    FIFO theo id, tối đa WAITLIST_SCAN_LIMIT entry. SKIP LOCKED để 2
+    transaction giải phóng chỗ cùng lúc không promote trùng 1 người.
+    Trả về các booking mới tạo; sau commit gọi on_promoted().
+    """
+    space = db.get(Space, space_id)
+    if space is None or not space.is_active or space.status != "available":
+        return []
+
+    now = datetime.now(timezone.utc)
+    candidates = db.execute(
+        select(WaitlistEntry)
+        .where(
+            WaitlistEntry.space_id == space_id,
+            WaitlistEntry.status == "waiting",
+            WaitlistEntry.start_time >= start - timedelta(minutes=WAITLIST_MAX_MINUTES),
+            WaitlistEntry.start_time < end,
+            WaitlistEntry.end_time > start,
+            WaitlistEntry.end_time > now + timedelta(minutes=GRACE_PERIOD_MINUTES),
+        )
+        .order_by(WaitlistEntry.id)
+        .limit(WAITLIST_SCAN_LIMIT)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    promoted = []
+    for entry in candidates:
+        if limit is not None and len(promoted) >= limit:
+            break
+
+        booked, held = count_taken(
+            db, space_id, entry.start_time, entry.end_time, exclude_user_id=entry.user_id
+        )
+        if booked + held >= space.capacity:
+            continue
+        own = db.query(Booking).filter(
+            Booking.user_id == entry.user_id,
+            Booking.space_id == space_id,
+            Booking.status.in_(["pending", "confirmed"]),
+            Booking.start_time < entry.end_time,
+            Booking.end_time > entry.start_time,
+        ).count()
+        if own:
+            continue
+        # chỗ trống giữa chừng (no-show): bắt đầu từ bây giờ để QR check-in còn hạn
+        start_time = max(entry.start_time, now)
+        # luật của space có thể đã đổi từ lúc xếp hàng: kiểm tra đúng khung giờ
+        # sẽ INSERT (slot, giờ mở cửa); lead time tính theo lúc xếp hàng
+        if not calendar.is_bookable(db, space_id, start_time, entry.end_time, now=entry.created_at):
+            continue
+
+        booking = Booking(
+            user_id=entry.user_id,
+            space_id=space_id,
+            start_time=start_time,
+            end_time=entry.end_time,
+            status="pending",
+            notes=entry.notes,
+        )
+        db.add(booking)
+        db.flush()
+        issue_qr_token(booking)
+
+        entry.status = "promoted"
+        entry.booking_id = booking.id
+        entry.promoted_at = now
+        notify_booking_event(db, "promoted", booking)
+        promoted.append(booking)
+
+    return promoted
+
+
+def on_promoted(bookings: list) -> None:
+    """Cập nhật counter policy cho các booking được promote (sau commit)."""
+    for booking in bookings:
+        policy.on_created(booking)
@@ -0,0 +1,76 @@
+# app/crud/constraints.py
+"""
+Đổi lỗi ràng buộc của Postgres thành HTTPException.
+
+Thay cho kiểu "SELECT kiểm tra trước rồi mới INSERT" (thêm 1 round-trip mà
+vẫn race giữa 2 request): ghi thẳng, để unique / foreign key của DB quyết
+định, rồi map tên constraint bị vi phạm sang thông báo cho client.
+
+Cột version (version_id_col) cũng là 1 ràng buộc: UPDATE/DELETE không khớp
+version đã đọc -> StaleDataError -> 409.
+"""
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def _constraint_name(exc: IntegrityError) -> str:
+    diag = getattr(exc.orig, "diag", None)
+    return getattr(diag, "constraint_name", None) or ""
+
+
+def commit_or_conflict(
+    db: Session,
+    conflicts: Optional[Dict[str, str]] = None,
+    missing: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    Commit (flush INSERT/UPDATE ... RETURNING ngay trong commit).
+    conflicts: {đoạn tên constraint unique: message}  -> 409
+    missing:   {đoạn tên foreign key: message}        -> 404
+    So khớp theo chuỗi con để chạy được với cả tên do SQLAlchemy sinh
+    (ix_users_email) lẫn tên do Postgres sinh (users_email_key).
+    """
+    _write_or_conflict(db, db.commit, conflicts, missing)
+
+
+def flush_or_conflict(
+    db: Session,
+    conflicts: Optional[Dict[str, str]] = None,
+    missing: Optional[Dict[str, str]] = None,
+) -> None:
+    """Như commit_or_conflict nhưng chỉ flush (query sau trong transaction thấy thay đổi)."""
+    _write_or_conflict(db, db.flush, conflicts, missing)
+
+
+def _write_or_conflict(
+    db: Session,
+    write: Callable[[], None],
+    conflicts: Optional[Dict[str, str]],
+    missing: Optional[Dict[str, str]],
+) -> None:
+    try:
+        write()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(409, "Resource was modified concurrently; reload and retry.") from None
+    except IntegrityError as exc:
+        db.rollback()
+        code = getattr(exc.orig, "pgcode", None)
+        name = _constraint_name(exc)
+        if code == UNIQUE_VIOLATION:
+            mapping, status_code = conflicts or {}, 409
+        elif code == FOREIGN_KEY_VIOLATION:
+            mapping, status_code = missing or {}, 404
+        else:
+            raise
+        for needle, message in mapping.items():
+            if needle in name:
+                raise HTTPException(status_code, message) from None
+        raise
@@ -0,0 +1,102 @@
+# app/crud/hold.py
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+from app.models.space import Space, SpaceHold
+from app.schemas.space import HoldCreate
+from app.crud.booking import count_taken
+from app.services.space_calendar import calendar
+
+# Đủ để điền form đặt chỗ; hết hạn thì chỗ tự trả lại
+HOLD_TTL_SECONDS = 120
+
+
+def place_hold(db: Session, space_id: int, data: HoldCreate, current_user_id: int) -> SpaceHold:
+    if data.start_time >= data.end_time:
+        raise HTTPException(400, "Invalid time range.")
+
+    # Khoá dòng space: các hold đồng thời trên cùng space xếp hàng, không cấp quá capacity
+    space = db.execute(
+        select(Space.capacity, Space.is_active, Space.status)
+        .where(Space.id == space_id)
+        .with_for_update()
+    ).first()
+    if not space:
+        raise HTTPException(404, "Space not found.")
+    if not space.is_active or space.status != "available":
+        raise HTTPException(409, "Space is not available.")
+
+    calendar.validate(db, space_id, data.start_time, data.end_time)
+
+    user_overlap = db.query(Booking).filter(
+        Booking.user_id == current_user_id,
+        Booking.space_id == space_id,
+        Booking.status.in_(["pending", "confirmed"]),
+        Booking.start_time < data.end_time,
+        Booking.end_time > data.start_time,
+    ).count()
+    if user_overlap:
+        raise HTTPException(409, "You already have a booking in this time range.")
+
+    # Mỗi user chỉ giữ 1 hold / space: hold mới thay hold cũ
+    db.execute(
+        delete(SpaceHold).where(
+            SpaceHold.space_id == space_id,
+            SpaceHold.user_id == current_user_id,
+        )
+    )
+
+    booked, held = count_taken(db, space_id, data.start_time, data.end_time)
+    if booked + held >= space.capacity:
+        raise HTTPException(409, "Space is fully booked in this time range.")
+
+    hold = SpaceHold(
+        space_id=space_id,
+        user_id=current_user_id,
+        start_time=data.start_time,
+        end_time=data.end_time,
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=HOLD_TTL_SECONDS),
+    )
+    db.add(hold)
+    db.commit()
+    return hold
+
+
+def release_hold(db: Session, space_id: int, hold_id: int, current_user_id: int) -> None:
+    released = db.execute(
+        delete(SpaceHold)
+        .where(
+            SpaceHold.id == hold_id,
+            SpaceHold.space_id == space_id,
+            SpaceHold.user_id == current_user_id,
+        )
+        .returning(SpaceHold.id)
+    ).first()
+    if released is None:
+        raise HTTPException(404, "Hold not found")
+    db.commit()
+
+
+def get_availability(db: Session, space: Space, start: datetime, end: datetime) -> dict:
+    if start >= end:
+        raise HTTPException(400, "Invalid time range.")
+    booked, held = count_taken(db, space.id, start, end)
+    return {
+        "space_id": space.id,
+        "start_time": start,
+        "end_time": end,
+        "capacity": space.capacity,
+        "booked": booked,
+        "held": held,
+        "available": max(space.capacity - booked - held, 0),
+    }
+
+
+def purge_expired_holds(db: Session) -> int:
+    result = db.execute(delete(SpaceHold).where(SpaceHold.expires_at <= datetime.now(timezone.utc)))
+    db.commit()
+    return result.rowcount
@@ -1,4 +1,3 @@
-from datetime import datetime, timedelta
 from typing import List, Optional
 
 from fastapi import HTTPException
@@ -6,34 +5,21 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select
 
 from app.models.penalty import Penalty, PenaltyType
-from app.models.user import User
-from app.models.booking import Booking
 from app.schemas.penalty import PenaltyCreate, PenaltyUpdate
+from app.services import penalty_ledger
+from app.crud.constraints import commit_or_conflict
+
+
+# Vi phạm ràng buộc lúc INSERT penalty -> lỗi cho client (xem crud.constraints)
+PENALTY_CONFLICTS = {"uq_penalties_booking_type": "Penalty already exists for this booking."}
+PENALTY_MISSING = {"user_id": "User not found", "booking_id": "Booking not found"}
 
 
 def create_penalty(db: Session, data: PenaltyCreate) -> Penalty:
-    # 1. Check user tồn tại
-    user = db.get(User, data.user_id)
-    if not user:
-        raise HTTPException(404, "User not found")
-    # 2. Check booking (nếu có)
-    booking = None
-    if data.booking_id:
-        booking = db.get(Booking, data.booking_id)
-        if not booking:
-            raise HTTPException(404, "Booking not found")
-     # 3. Check trùng penalty cho cùng booking
-    if booking:
-        exists = db.query(Penalty).filter(
-            Penalty.user_id == data.user_id,
-            Penalty.booking_id == data.booking_id,
-            Penalty.penalty_type == data.penalty_type
-        ).first()
-
-        if exists:
-            raise HTTPException(409, "Penalty already exists for this booking.")
-    # 4. Tính ngày hết hạn (mặc định 30 ngày)
-    expires_at = datetime.utcnow() + timedelta(days=30)
+    # 1-3. User / booking tồn tại, trùng penalty cho cùng booking: để FK và
+    # uq_penalties_booking_type kiểm tra ngay trong câu INSERT
+    # 4. Tính ngày hết hạn (cửa sổ của penalty ledger)
+    expires_at = penalty_ledger.default_expiry()
 
     penalty = Penalty(
         user_id=data.user_id,
@@ -46,12 +32,10 @@ def create_penalty(db: Session, data: PenaltyCreate) -> Penalty:
 
     db.add(penalty)
 
-    # 5. Cập nhật penalty_count của user
-    user.penalty_count += data.points
-
-    db.commit()
-    db.refresh(penalty)
+    # 5. Cập nhật điểm active (cache) của user
+    penalty_ledger.add_points(db, data.user_id, data.points)
 
+    commit_or_conflict(db, PENALTY_CONFLICTS, PENALTY_MISSING)
     return penalty
 
 
@@ -64,8 +48,10 @@ def list_penalties(db: Session, skip: int = 0, limit: int = 100) -> List[Penalty
     return db.execute(stmt).scalars().all()
 
 
-def list_user_penalties(db: Session, user_id: int) -> List[Penalty]:
+def list_user_penalties(db: Session, user_id: int, active_only: bool = False) -> List[Penalty]:
     stmt = select(Penalty).where(Penalty.user_id == user_id)
+    if active_only:
+        stmt = stmt.where(Penalty.expired.is_(False))
     return db.execute(stmt).scalars().all()
 
 
@@ -78,21 +64,21 @@ def update_penalty(db: Session, penalty: Penalty, data: PenaltyUpdate) -> Penalt
         if key in update_data:
             raise HTTPException(400, f"Cannot modify {key}")
 
+    # Đổi điểm của penalty còn hiệu lực -> điều chỉnh cache theo chênh lệch
+    if "points" in update_data and not penalty.expired:
+        penalty_ledger.add_points(db, penalty.user_id, update_data["points"] - penalty.points)
+
     for field, value in update_data.items():
         setattr(penalty, field, value)
 
-    db.commit()
-    db.refresh(penalty)
+    commit_or_conflict(db)
     return penalty
 
 
 def delete_penalty(db: Session, penalty: Penalty) -> None:
-    user = penalty.user
-
-    # Trả lại penalty_count cho user
-    user.penalty_count -= penalty.points
-    if user.penalty_count < 0:
-        user.penalty_count = 0
+    # Trả lại điểm cho user (penalty đã hết hạn thì đã được trừ rồi)
+    if not penalty.expired:
+        penalty_ledger.add_points(db, penalty.user_id, -penalty.points)
 
     db.delete(penalty)
-    db.commit()
+    commit_or_conflict(db)
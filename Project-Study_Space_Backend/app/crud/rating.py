@@ -1,9 +1,14 @@
 # app/crud/rating.py
+import random
+
 from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, text, cast, tuple_, REAL
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from typing import List, Optional
 
-from app.models.rating import Rating
+from app.models.rating import Rating, SpaceRatingBucket, RATING_SHARDS
 from app.schemas.rating import RatingCreate, RatingUpdate
+from app.crud.constraints import commit_or_conflict
 
 from fastapi import HTTPException
 from app.models.booking import Booking
@@ -14,36 +19,116 @@ def list_ratings(db: Session) -> List[Rating]:
     return db.query(Rating).order_by(Rating.id.desc()).all()
 
 
+def search_ratings(
+    db: Session,
+    *,
+    q: str,
+    space_id: Optional[int] = None,
+    score: Optional[int] = None,
+    after: Optional[tuple] = None,
+    limit: int = 20,
+) -> List[tuple]:
+    """
+    Tìm trong comment (GIN ix_ratings_comment_tsv), xếp theo ts_rank.
+    Keyset pagination: after = (rank, id) của dòng cuối trang trước.
+    Trả về list (Rating, rank).
+    """
+    query = func.websearch_to_tsquery("simple", q)
+    rank = func.ts_rank(Rating.comment_tsv, query)
+
+    stmt = select(Rating, rank).where(Rating.comment_tsv.op("@@")(query))
+
+    if space_id is not None:
+        stmt = stmt.where(Rating.space_id == space_id)
+
+    if score is not None:
+        stmt = stmt.where(Rating.score == score)
+
+    if after is not None:
+        after_rank, after_id = after
+        stmt = stmt.where(tuple_(rank, Rating.id) < tuple_(cast(after_rank, REAL), after_id))
+
+    stmt = stmt.order_by(rank.desc(), Rating.id.desc()).limit(limit)
+    return db.execute(stmt).all()
+
+
 def get_rating(db: Session, rating_id: int) -> Optional[Rating]:
     return db.get(Rating, rating_id)
 
 
+# ======================================================
+# RATING HISTOGRAM (space_rating_buckets)
+# ======================================================
+
+def _bump_bucket(db: Session, space_id: int, score: int, delta: int) -> None:
+    # UPSERT tăng/giảm nguyên tử, không đọc-sửa-ghi trên dòng spaces
+    stmt = pg_insert(SpaceRatingBucket).values(
+        space_id=space_id,
+        score=score,
+        shard=random.randrange(RATING_SHARDS),
+        count=delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            SpaceRatingBucket.space_id,
+            SpaceRatingBucket.score,
+            SpaceRatingBucket.shard,
+        ],
+        set_={"count": SpaceRatingBucket.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def get_rating_summary(db: Session, space_id: int) -> dict:
+    stmt = (
+        select(SpaceRatingBucket.score, func.sum(SpaceRatingBucket.count))
+        .where(SpaceRatingBucket.space_id == space_id)
+        .group_by(SpaceRatingBucket.score)
+    )
+    histogram = {score: 0 for score in range(1, 6)}
+    for score, count in db.execute(stmt).all():
+        histogram[score] = int(count)
+
+    total = sum(histogram.values())
+    average = sum(s * c for s, c in histogram.items()) / total if total else 0.0
+    return {
+        "space_id": space_id,
+        "total_ratings": total,
+        "average_rating": average,
+        "histogram": histogram,
+    }
+
+
+def rebuild_rating_buckets(db: Session) -> None:
+    """Tính lại toàn bộ histogram từ bảng ratings (job định kỳ / sửa lệch)."""
+    db.execute(text("LOCK TABLE space_rating_buckets IN EXCLUSIVE MODE"))
+    db.execute(delete(SpaceRatingBucket))
+    db.execute(text(
+        "INSERT INTO space_rating_buckets (space_id, score, shard, count) "
+        "SELECT space_id, score, 0, COUNT(*) FROM ratings GROUP BY space_id, score"
+    ))
+    db.commit()
+
+
 def create_rating(db: Session, data: RatingCreate, current_user_id: int):
-    # 1. Check Space tồn tại và active
-    space = db.query(Space).filter(Space.id == data.space_id, Space.is_active == True).first()
-    if not space:
+    # 1 + 2. Space tồn tại và active / user đã từng completed booking: 1 câu SELECT
+    # (không load Space -> tránh selectin bookings/ratings)
+    space_ok, completed = db.execute(select(
+        select(Space.id).where(Space.id == data.space_id, Space.is_active.is_(True)).exists(),
+        select(Booking.id).where(
+            Booking.user_id == current_user_id,
+            Booking.space_id == data.space_id,
+            Booking.status == "completed",
+        ).exists(),
+    )).one()
+
+    if not space_ok:
         raise HTTPException(404, "Space not found or inactive.")
 
-    # 2. Check user đã từng completed booking không
-    completed = db.query(Booking).filter(
-        Booking.user_id == current_user_id,
-        Booking.space_id == data.space_id,
-        Booking.status == "completed"
-    ).first()
-
     if not completed:
         raise HTTPException(403, "You can rate only after completing a booking.")
 
-    # 3. Check user đã rating phòng này chưa
-    existing = db.query(Rating).filter(
-        Rating.user_id == current_user_id,
-        Rating.space_id == data.space_id,
-    ).first()
-
-    if existing:
-        raise HTTPException(409, "You have already rated this space.")
-
-    # 4. Tạo rating
+    # 3. Tạo rating (đã rate rồi -> uq_ratings_user_space, xem bước 5)
     obj = Rating(
         user_id=current_user_id,
         space_id=data.space_id,
@@ -52,14 +137,11 @@ def create_rating(db: Session, data: RatingCreate, current_user_id: int):
     )
     db.add(obj)
 
-    # 5. Cập nhật lại average_rating của Space
-    space.total_ratings += 1
-    space.average_rating = (
-        (space.average_rating * (space.total_ratings - 1)) + data.score
-    ) / space.total_ratings
+    # 4. Cập nhật histogram của Space
+    _bump_bucket(db, data.space_id, data.score, +1)
 
-    db.commit()
-    db.refresh(obj)
+    # 5. INSERT ... RETURNING lúc commit; trùng thì rollback luôn histogram
+    commit_or_conflict(db, {"uq_ratings_user_space": "You have already rated this space."})
     return obj
 
 
@@ -77,7 +159,6 @@ def update_rating(db: Session, db_obj: Rating, updates: RatingUpdate, current_us
         setattr(db_obj, k, v)
 
     db.commit()
-    db.refresh(db_obj)
     return db_obj
 
 
@@ -86,6 +167,7 @@ def delete_rating(db: Session, db_obj: Rating, current_user_id: int):
     if db_obj.user_id != current_user_id:
         raise HTTPException(403, "You cannot delete others' rating.")
 
+    _bump_bucket(db, db_obj.space_id, db_obj.score, -1)
     db.delete(db_obj)
     db.commit()
 
@@ -1,12 +1,101 @@
 # app/crud/space.py
-from typing import List, Optional
+import itertools
+import json
+import math
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import undefer_group
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, update, delete, func, cast
+from sqlalchemy.dialects.postgresql import JSONPATH
 from fastapi import HTTPException
 from app.models.booking import Booking
+from app.models.utility import Utility
 
-from app.models.space import Space
-from app.schemas.space import SpaceCreate, SpaceUpdate
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.models.space import Space, SpaceBookingRule, SpaceHold, space_utilities
+from app.schemas.space import SpaceCreate, SpaceUpdate, SpaceRules, MaintenanceRequest
+from app.services.space_calendar import calendar, as_utc, parse_hhmm, WEEKDAYS
+from app.crud.constraints import commit_or_conflict
+from app.models.purge import PurgeJob
+from app.services import purge
+from app.crud.booking import (
+    promote_waiters,
+    on_promoted,
+    issue_qr_token,
+    WAITLIST_PROMOTION_HORIZON,
+)
+from app.services import relocation, slot_finder
+from app.services.space_index import index as space_index
+from app.services.booking_policy import policy
+from app.services.change_log import record_changes
+from app.services.events import notify_booking_events
+
+
+# ======================================================
+# EQUIPMENT FILTERS (JSONB, dùng GIN index ix_spaces_equipment)
+# ======================================================
+
+_EQUIPMENT_FILTER_RE = re.compile(
+    r"^(?:equipment\.)?([A-Za-z0-9_]+)\s*(?:(>=|<=|!=|=|>|<)\s*(.+))?$"
+)
+
+
+def _parse_equipment_value(raw: str) -> Any:
+    raw = raw.strip()
+    lowered = raw.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        value = float(raw)
+    except ValueError:
+        return raw.strip('"')
+    # nan / inf không có trong JSON -> jsonpath / @> sinh ra sẽ lỗi phía Postgres
+    if not math.isfinite(value):
+        raise HTTPException(400, f"Invalid equipment value: {raw}")
+    return value
+
+
+def equipment_predicate(expr: str):
+    """
+    Chuyển 1 filter dạng text thành predicate JSONB:
+      - "projector"          -> equipment ? 'projector'
+      - "projector=true"     -> equipment @> '{"projector": true}'
+      - "monitors>=2"        -> equipment @? '$."monitors" ? (@ >= 2)'
+    Cả 3 toán tử đều được GIN index (jsonb_ops) hỗ trợ.
+    """
+    match = _EQUIPMENT_FILTER_RE.match(expr.strip())
+    if not match:
+        raise HTTPException(400, f"Invalid equipment filter: {expr}")
+
+    key, op, raw_value = match.groups()
+
+    if op is None:
+        return Space.equipment.has_key(key)
+
+    value = _parse_equipment_value(raw_value)
+
+    if op == "=":
+        return Space.equipment.contains({key: value})
+
+    if op != "!=" and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        raise HTTPException(400, f"Equipment filter '{expr}' needs a numeric value")
+
+    path = f'$."{key}" ? (@ {op} {json.dumps(value)})'
+    return Space.equipment.op("@?")(cast(path, JSONPATH))
+
+
+# total_ratings / rating_sum cho SpaceResponse, cùng câu SELECT space
+RATING_STATS = undefer_group("rating_stats")
 
 
 def get_spaces(
@@ -15,8 +104,11 @@ def get_spaces(
     search: Optional[str] = None,
     min_capacity: Optional[int] = None,
     status: Optional[str] = None,
+    equipment: Optional[List[str]] = None,
+    building: Optional[str] = None,
+    sort: Optional[str] = None,
 ) -> List[Space]:
-    stmt = select(Space).where(Space.is_active.is_(True))
+    stmt = select(Space).options(RATING_STATS).where(Space.is_active.is_(True))
 
     if search:
         like = f"%{search}%"
@@ -31,18 +123,223 @@ def get_spaces(
     if status is not None:
         stmt = stmt.where(Space.status == status)
 
+    if building is not None:
+        stmt = stmt.where(Space.building == building)
+
+    for expr in equipment or []:
+        stmt = stmt.where(equipment_predicate(expr))
+
+    if sort == "rating":
+        stmt = stmt.order_by(Space.rating_score.desc(), Space.id)
+    elif sort == "popularity":
+        stmt = stmt.order_by(Space.popularity_score.desc(), Space.id)
+
     return db.execute(stmt).scalars().all()
 
 
+# ======================================================
+# SLOT FINDER (GET /spaces/find) + NEAREST (GET /spaces/nearest)
+# ======================================================
+
+def occupied_intervals(db: Session, space_ids: List[int], start: datetime, end: datetime):
+    """(space_id, start, end) của booking active + hold còn hạn giao với [start, end)."""
+    return db.execute(
+        select(Booking.space_id, Booking.start_time, Booking.end_time).where(
+            Booking.space_id.in_(space_ids),
+            Booking.status.in_(["pending", "confirmed"]),
+            Booking.start_time < end,
+            Booking.end_time > start,
+        ).union_all(
+            select(SpaceHold.space_id, SpaceHold.start_time, SpaceHold.end_time).where(
+                SpaceHold.space_id.in_(space_ids),
+                SpaceHold.expires_at > func.now(),
+                SpaceHold.start_time < end,
+                SpaceHold.end_time > start,
+            )
+        )
+    ).all()
+
+
+FIND_MAX_CANDIDATE_STARTS = 97      # vd. ±12h với bước 15 phút
+
+
+def find_slots(
+    db: Session,
+    *,
+    start: datetime,
+    end: datetime,
+    space_type: Optional[str] = None,
+    min_capacity: int = 1,
+    utilities: Optional[List[str]] = None,
+    near: Optional[str] = None,
+    flex_minutes: int = 0,
+    duration_minutes: Optional[int] = None,
+    step_minutes: int = 15,
+    limit: int = 10,
+) -> List[dict]:
+    # occupied_intervals trả timestamptz: đưa input về UTC aware 1 lần ở đây
+    start, end = as_utc(start), as_utc(end)
+    if start >= end:
+        raise HTTPException(400, "Invalid time range.")
+    duration = timedelta(minutes=duration_minutes) if duration_minutes else end - start
+    steps = flex_minutes // step_minutes
+    if 2 * steps + 1 > FIND_MAX_CANDIDATE_STARTS:
+        raise HTTPException(400, "Flexibility window is too wide for this step.")
+
+    now = datetime.now(timezone.utc)
+    starts = [
+        start + timedelta(minutes=k * step_minutes)
+        for k in range(-steps, steps + 1)
+    ]
+    starts = [s for s in starts if s >= now]
+    if not starts:
+        return []
+
+    # 1) Space ứng viên: 1 query, chỉ các cột cần dùng (không load relationship)
+    stmt = select(
+        Space.id, Space.name, Space.type, Space.capacity, Space.location, Space.rating_score,
+    ).where(
+        Space.is_active.is_(True),
+        Space.status == "available",
+        Space.capacity >= min_capacity,
+    )
+    if space_type:
+        stmt = stmt.where(Space.type == space_type)
+    if near:
+        stmt = stmt.where(Space.location.ilike(f"%{near}%"))
+    if utilities:
+        keys = sorted(set(utilities))
+        stmt = stmt.where(Space.id.in_(
+            select(space_utilities.c.space_id)
+            .join(Utility, Utility.id == space_utilities.c.utility_id)
+            .where(Utility.key.in_(keys))
+            .group_by(space_utilities.c.space_id)
+            .having(func.count() == len(keys))
+        ))
+    spaces = [dict(row._mapping, space_id=row.id) for row in db.execute(stmt).all()]
+    if not spaces:
+        return []
+    space_ids = [space["id"] for space in spaces]
+
+    # 2) Mọi khoảng đã chiếm của các space đó trong cửa sổ: 1 query
+    occupied = occupied_intervals(db, space_ids, starts[0], starts[-1] + duration)
+
+    # 3) Lưới (space x giờ bắt đầu) trong RAM + luật giờ mở cửa đã compile
+    free = slot_finder.free_units(
+        space_ids, [space["capacity"] for space in spaces], occupied, starts, duration
+    )
+    calendar.prefetch(db, space_ids)
+    results = slot_finder.rank(
+        spaces,
+        free,
+        starts,
+        requested=start,
+        min_capacity=min_capacity,
+        bookable=lambda space_id, s: calendar.is_bookable(db, space_id, s, s + duration),
+        limit=limit,
+    )
+    for result in results:
+        result["end_time"] = result["start_time"] + duration
+    return results
+
+
+NEAREST_POOL_SIZE = 32
+
+
+def find_nearest(
+    db: Session,
+    *,
+    latitude: float,
+    longitude: float,
+    floor: Optional[int] = None,
+    space_type: Optional[str] = None,
+    min_capacity: int = 1,
+    building: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_distance_m: Optional[float] = None,
+    limit: int = 10,
+) -> List[dict]:
+    if (start is None) != (end is None):
+        raise HTTPException(400, "start_time and end_time must be given together.")
+    if start is not None:
+        start, end = as_utc(start), as_utc(end)
+        if start >= end:
+            raise HTTPException(400, "Invalid time range.")
+
+    def accept(point) -> bool:
+        return (
+            point.capacity >= min_capacity
+            and (space_type is None or point.type == space_type)
+            and (building is None or point.building == building)
+        )
+
+    neighbours = space_index.nearest(
+        latitude, longitude, floor, accept=accept, max_distance_m=max_distance_m
+    )
+
+    def as_dict(distance, point, free=None) -> dict:
+        return {
+            "id": point.id,
+            "name": point.name,
+            "type": point.type,
+            "capacity": point.capacity,
+            "location": point.location,
+            "building": point.building,
+            "floor": point.floor,
+            "latitude": point.latitude,
+            "longitude": point.longitude,
+            "distance_m": round(distance, 1),
+            "free_units": free,
+        }
+
+    if start is None:
+        return [as_dict(d, p) for d, p in itertools.islice(neighbours, limit)]
+
+    # Có khung giờ: lấy từng lô theo thứ tự khoảng cách, tính chỗ trống cho
+    # cả lô bằng 1 query (như /spaces/find), lô sau lớn gấp đôi lô trước
+    results = []
+    pool = max(NEAREST_POOL_SIZE, limit)
+    while len(results) < limit:
+        batch = list(itertools.islice(neighbours, pool))
+        if not batch:
+            break
+        space_ids = [p.id for _, p in batch]
+        free = slot_finder.free_units(
+            space_ids,
+            [p.capacity for _, p in batch],
+            occupied_intervals(db, space_ids, start, end),
+            [start],
+            end - start,
+        )
+        calendar.prefetch(db, space_ids)
+        for i, (distance, point) in enumerate(batch):
+            if free[i, 0] > 0 and calendar.is_bookable(db, point.id, start, end):
+                results.append(as_dict(distance, point, int(free[i, 0])))
+                if len(results) == limit:
+                    break
+        pool *= 2
+    return results
+
+
 def get_space(db: Session, space_id: int) -> Optional[Space]:
-    return db.get(Space, space_id)
+    return db.get(Space, space_id, options=[RATING_STATS])
+
+
+def is_active_space(db: Session, space_id: int) -> bool:
+    # Không load Space (tránh selectin bookings/ratings)
+    stmt = select(Space.id).where(Space.id == space_id, Space.is_active.is_(True))
+    return db.execute(stmt).first() is not None
 
 
 def create_space(db: Session, data: SpaceCreate) -> Space:
     space = Space(**data.model_dump())
     db.add(space)
     db.commit()
-    db.refresh(space)
+    # Space mới chưa có rating: khỏi query histogram khi trả response
+    set_committed_value(space, "total_ratings", 0)
+    set_committed_value(space, "rating_sum", 0)
+    space_index.invalidate()
     return space
 
 
@@ -74,11 +371,25 @@ def update_space(db: Session, db_space: Space, updates: SpaceUpdate) -> Space:
                 "Cannot set space to unavailable while it has active bookings."
             )
 
+    # Có thêm chỗ -> promote hàng chờ trong cùng transaction
+    frees_slots = (
+        (changing_capacity and data["capacity"] > db_space.capacity)
+        or (changing_status and data["status"] == "available" and db_space.status != "available")
+    )
+
     for key, value in data.items():
         setattr(db_space, key, value)
 
-    db.commit()
-    db.refresh(db_space)
+    promoted = []
+    if frees_slots:
+        now = datetime.now(timezone.utc)
+        promoted = promote_waiters(
+            db, db_space.id, now, now + WAITLIST_PROMOTION_HORIZON, limit=None
+        )
+
+    commit_or_conflict(db)
+    space_index.invalidate()
+    on_promoted(promoted)
     return db_space
 
 
@@ -97,7 +408,248 @@ def soft_delete_space(db: Session, db_space: Space) -> Space:
         )
 
     db_space.is_active = False
-    db.commit()
-    db.refresh(db_space)
+    commit_or_conflict(db)
+    space_index.invalidate()
     return db_space
 
+
+def purge_space(db: Session, db_space: Space, requested_by: Optional[int] = None) -> Optional[PurgeJob]:
+    """
+    Xoá cứng space bằng ON DELETE CASCADE (không load booking / rating về).
+    Space nhiều lịch sử: ẩn ngay + trả về PurgeJob xoá dần ở nền.
+    """
+    active_bookings = db.query(Booking).filter(
+        Booking.space_id == db_space.id,
+        Booking.status.in_(["pending", "confirmed", "checked_in"])
+    ).count()
+
+    if active_bookings > 0:
+        raise HTTPException(
+            409,
+            "Cannot delete space with active bookings."
+        )
+
+    return purge.purge_or_enqueue(db, "space", db_space.id, requested_by)
+
+
+# ======================================================
+# MAINTENANCE: huỷ hàng loạt + xếp lại sang space tương đương
+# ======================================================
+
+# Admin xếp lại nên bỏ qua lead time của space đích
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def start_maintenance(db: Session, data: MaintenanceRequest) -> dict:
+    now = datetime.now(timezone.utc)
+    start = as_utc(data.start_time) if data.start_time is not None else now
+    end = as_utc(data.end_time) if data.end_time is not None else None
+    if end is not None and start >= end:
+        raise HTTPException(400, "Invalid time range.")
+    # Không có chỗ lưu cửa sổ bảo trì trong tương lai: calendar sẽ không
+    # chặn booking mới đặt vào đó sau lệnh này -> chỉ nhận bảo trì từ bây giờ
+    if start > now:
+        raise HTTPException(400, "Maintenance must start now; scheduled windows are not supported.")
+
+    space_ids = sorted(set(data.space_ids))
+    sources = {
+        row.id: row
+        for row in db.execute(
+            select(Space.id, Space.type, Space.capacity, Space.location)
+            .where(Space.id.in_(space_ids), Space.is_active.is_(True))
+            .with_for_update()
+        ).all()
+    }
+    missing = [space_id for space_id in space_ids if space_id not in sources]
+    if missing:
+        raise HTTPException(404, f"Space not found: {missing}")
+
+    db.execute(
+        update(Space)
+        .where(Space.id.in_(space_ids))
+        .values(status="maintenance", version=Space.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    # 1) Huỷ mọi booking bị ảnh hưởng trong 1 câu UPDATE ... RETURNING
+    bookings = Booking.__table__
+    stmt = (
+        update(bookings)
+        .where(
+            bookings.c.space_id.in_(space_ids),
+            bookings.c.status.in_(["pending", "confirmed"]),
+            bookings.c.end_time > start,
+        )
+        .values(status="cancelled", updated_at=func.now(), version=bookings.c.version + 1)
+        .returning(
+            bookings.c.id, bookings.c.user_id, bookings.c.space_id,
+            bookings.c.start_time, bookings.c.end_time, bookings.c.status, bookings.c.notes,
+        )
+    )
+    if end is not None:
+        stmt = stmt.where(bookings.c.start_time < end)
+    cancelled = db.execute(stmt).all()
+
+    db.execute(delete(SpaceHold).where(SpaceHold.space_id.in_(space_ids)))
+    notify_booking_events(db, [("cancelled", row) for row in cancelled])
+    record_changes(db, "booking", [(row.id, row.user_id) for row in cancelled])
+
+    # 2) Ghép cặp sang space tương đương
+    placed = _relocate(db, cancelled, sources, space_ids) if data.relocate and cancelled else {}
+
+    new_bookings = []
+    for row in cancelled:
+        if row.id in placed:
+            new_bookings.append((row, Booking(
+                user_id=row.user_id,
+                space_id=placed[row.id],
+                start_time=row.start_time,
+                end_time=row.end_time,
+                status="pending",
+                notes=row.notes,
+            )))
+    db.add_all([booking for _, booking in new_bookings])
+    db.flush()
+    for _, booking in new_bookings:
+        issue_qr_token(booking)
+    notify_booking_events(db, [("relocated", booking) for _, booking in new_bookings])
+
+    relocated = [
+        {
+            "booking_id": row.id,
+            "new_booking_id": booking.id,
+            "from_space_id": row.space_id,
+            "to_space_id": booking.space_id,
+        }
+        for row, booking in new_bookings
+    ]
+    unplaced = [row for row in cancelled if row.id not in placed]
+
+    db.commit()
+    space_index.invalidate()
+
+    # Booking được xếp lại giữ nguyên user + khung giờ -> counter policy không đổi
+    for row in unplaced:
+        policy.on_cancelled(row.user_id, "pending", row.start_time, row.end_time)
+
+    return {
+        "space_ids": space_ids,
+        "cancelled": len(cancelled),
+        "relocated": relocated,
+        "unplaced": [row.id for row in unplaced],
+    }
+
+
+def _relocate(db: Session, cancelled, sources: dict, closed_ids: List[int]) -> dict:
+    window_start = min(row.start_time for row in cancelled)
+    window_end = max(row.end_time for row in cancelled)
+
+    candidates = {
+        row.id: row
+        for row in db.execute(
+            select(Space.id, Space.type, Space.capacity, Space.location)
+            .where(
+                Space.is_active.is_(True),
+                Space.status == "available",
+                Space.id.notin_(closed_ids),
+                Space.type.in_({src.type for src in sources.values()}),
+            )
+        ).all()
+    }
+    if not candidates:
+        return {}
+
+    utilities = {}
+    for space_id, utility_id in db.execute(
+        select(space_utilities.c.space_id, space_utilities.c.utility_id)
+        .where(space_utilities.c.space_id.in_(list(sources) + list(candidates)))
+    ):
+        utilities.setdefault(space_id, set()).add(utility_id)
+
+    # Chỗ đã bị chiếm trong cửa sổ bị ảnh hưởng: booking active + hold còn hạn
+    occupied = {}
+    for space_id, s, e in occupied_intervals(db, list(candidates), window_start, window_end):
+        occupied.setdefault(space_id, []).append((s, e))
+
+    empty = frozenset()
+
+    def compatible(source_id: int, candidate_id: int) -> bool:
+        src, cand = sources[source_id], candidates[candidate_id]
+        return (
+            cand.type == src.type
+            and cand.capacity >= src.capacity
+            and utilities.get(candidate_id, empty) >= utilities.get(source_id, empty)
+        )
+
+    def preference(source_id: int, candidate_id: int) -> tuple:
+        # ưu tiên cùng toà/vị trí, rồi space vừa khít nhất
+        src, cand = sources[source_id], candidates[candidate_id]
+        return (cand.location != src.location, cand.capacity - src.capacity)
+
+    def bookable(candidate_id: int, s: datetime, e: datetime) -> bool:
+        return calendar.is_bookable(db, candidate_id, s, e, now=_EPOCH)
+
+    return relocation.assign(
+        [(row.id, row.space_id, row.start_time, row.end_time) for row in cancelled],
+        capacities={space_id: row.capacity for space_id, row in candidates.items()},
+        occupied=occupied,
+        compatible=compatible,
+        preference=preference,
+        bookable=bookable,
+    )
+
+
+# ======================================================
+# BOOKING RULES / OPENING HOURS
+# ======================================================
+
+def get_space_rules(db: Session, space_id: int) -> Optional[SpaceBookingRule]:
+    return db.get(SpaceBookingRule, space_id)
+
+
+def set_space_rules(db: Session, db_space: Space, data: SpaceRules) -> SpaceBookingRule:
+    try:
+        ZoneInfo(data.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(400, f"Unknown time zone: {data.timezone}")
+
+    if data.opening_hours is not None:
+        for day, ranges in data.opening_hours.items():
+            if day not in WEEKDAYS:
+                raise HTTPException(400, f"Invalid weekday '{day}', expected one of {WEEKDAYS}")
+            for start, end in ranges:
+                try:
+                    if parse_hhmm(start) >= parse_hhmm(end):
+                        raise ValueError
+                except ValueError:
+                    raise HTTPException(400, f"Invalid opening hours on {day}: {start}-{end}")
+
+    if (
+        data.min_duration_minutes is not None
+        and data.max_duration_minutes is not None
+        and data.min_duration_minutes > data.max_duration_minutes
+    ):
+        raise HTTPException(400, "min_duration_minutes cannot exceed max_duration_minutes")
+
+    values = data.model_dump()
+    if data.closures is not None:
+        values["closures"] = [d.isoformat() for d in data.closures]
+
+    rule = db.get(SpaceBookingRule, db_space.id)
+    if rule is None:
+        rule = SpaceBookingRule(space_id=db_space.id)
+        db.add(rule)
+    for key, value in values.items():
+        setattr(rule, key, value)
+
+    db.commit()
+    calendar.invalidate(db_space.id)
+    return rule
+
+
+def delete_space_rules(db: Session, space_id: int) -> None:
+    rule = db.get(SpaceBookingRule, space_id)
+    if rule is not None:
+        db.delete(rule)
+        db.commit()
+    calendar.invalidate(space_id)
@@ -0,0 +1,87 @@
+# app/crud/sync.py
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, text, or_
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+from app.models.change_log import ChangeLog
+from app.models.penalty import Penalty
+from app.models.space import Space
+from app.models.utility import Utility
+from app.crud.space import RATING_STATS
+
+# Loader option cho model có field tính bằng SQL trong response
+LOAD_OPTIONS = {"space": (RATING_STATS,)}
+
+# entity_type -> (key trong response, model)
+ENTITY_MODELS = {
+    "booking": ("bookings", Booking),
+    "space": ("spaces", Space),
+    "utility": ("utilities", Utility),
+    "penalty": ("penalties", Penalty),
+}
+
+
+def _visible_horizon(db: Session) -> int:
+    # Mọi transaction có txid < xmin đều đã kết thúc -> an toàn để trả về
+    return db.execute(
+        text("SELECT (pg_snapshot_xmin(pg_current_snapshot())::text)::bigint")
+    ).scalar_one()
+
+
+def get_changes(db: Session, *, user_id: int, since: int, limit: int = 500) -> dict:
+    horizon = _visible_horizon(db)
+
+    scope = (
+        ChangeLog.txid >= since,
+        ChangeLog.txid < horizon,
+        or_(ChangeLog.user_id.is_(None), ChangeLog.user_id == user_id),
+    )
+    stmt = (
+        select(ChangeLog.txid, ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.op)
+        .where(*scope)
+        .order_by(ChangeLog.txid, ChangeLog.seq)
+        .limit(limit + 1)
+    )
+    rows = db.execute(stmt).all()
+
+    has_more = len(rows) > limit
+    if not has_more:
+        next_token = max(horizon, since)
+    else:
+        # Trang luôn chứa trọn transaction: cắt ở biên txid cuối cùng
+        boundary = rows[limit - 1].txid
+        if rows[0].txid == boundary:
+            rows = db.execute(
+                select(ChangeLog.txid, ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.op)
+                .where(*scope, ChangeLog.txid == boundary)
+                .order_by(ChangeLog.seq)
+            ).all()
+            next_token = boundary + 1
+        else:
+            rows = [r for r in rows if r.txid < boundary]
+            next_token = boundary
+
+    # Chỉ giữ thay đổi cuối cùng của mỗi entity
+    latest: Dict[Tuple[str, int], str] = {}
+    for row in rows:
+        latest[(row.entity_type, row.entity_id)] = row.op
+
+    changed: Dict[str, List[int]] = {name: [] for name in ENTITY_MODELS}
+    deleted: Dict[str, List[int]] = {name: [] for name in ENTITY_MODELS}
+    for (entity_type, entity_id), op in latest.items():
+        (deleted if op == "delete" else changed)[entity_type].append(entity_id)
+
+    result = {"next_token": next_token, "has_more": has_more, "deleted": {}}
+    for entity_type, (key, model) in ENTITY_MODELS.items():
+        ids = changed[entity_type]
+        stmt = select(model).options(*LOAD_OPTIONS.get(entity_type, ())).where(model.id.in_(ids))
+        objs = db.execute(stmt).scalars().all() if ids else []
+        found = {obj.id for obj in objs}
+        # Entity đã bị xoá cứng sau khi log -> tombstone
+        deleted[entity_type].extend(i for i in ids if i not in found)
+        result[key] = objs
+        result["deleted"][key] = deleted[entity_type]
+
+    return result
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
@@ -8,6 +10,9 @@ from fastapi import HTTPException
 
 from app.core.security import verify_password
 from app.core.security import hash_password
+from app.crud.constraints import commit_or_conflict
+from app.models.purge import PurgeJob
+from app.services import purge
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -30,17 +35,17 @@ def get_users(db: Session, skip=0, limit=100):
     return db.execute(stmt).scalars().all()
 
 
-def create_user(db: Session, user_in: UserCreate):
-    # 1. Check conflict email
-    if get_user_by_email(db, user_in.email):
-        raise HTTPException(409, "Email already exists")
+# unique index của users -> message cho client (xem crud.constraints)
+USER_CONFLICTS = {
+    "email": "Email already exists",
+    "username": "Username already exists",
+}
+
 
-    # 2. Check conflict username
-    existing = db.query(User).filter(User.username == user_in.username).first()
-    if existing:
-        raise HTTPException(409, "Username already exists")
+def create_user(db: Session, user_in: UserCreate):
+    # Email / username trùng: unique index quyết định lúc INSERT (không SELECT trước)
 
-    # 3. Không cho FE tự gửi role
+    # Không cho FE tự gửi role
     role = "user"  # default
 
     hashed = hash_password(user_in.password)
@@ -54,8 +59,7 @@ def create_user(db: Session, user_in: UserCreate):
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    commit_or_conflict(db, USER_CONFLICTS)
     return user
 
 
@@ -68,31 +72,22 @@ def update_user(db: Session, db_user: User, updates: UserUpdate):
         if f in data:
             raise HTTPException(400, f"Cannot modify {f}")
 
-    # Email conflict
-    if "email" in data:
-        existing = get_user_by_email(db, data["email"])
-        if existing and existing.id != db_user.id:
-            raise HTTPException(409, "Email already exists")
-
-    # Username conflict
-    if "username" in data:
-        existing = db.query(User).filter(User.username == data["username"]).first()
-        if existing and existing.id != db_user.id:
-            raise HTTPException(409, "Username already exists")
-
-    # Apply update
+    # Apply update (email / username trùng -> 409 từ unique index)
     for key, value in data.items():
         setattr(db_user, key, value)
 
-    db.commit()
-    db.refresh(db_user)
+    commit_or_conflict(db, USER_CONFLICTS)
     return db_user
 
 
-def delete_user(db: Session, db_user: User):
+def delete_user(db: Session, db_user: User, requested_by: Optional[int] = None) -> Optional[PurgeJob]:
+    """
+    Xoá bằng ON DELETE CASCADE, không load booking / penalty / rating về.
+    Tài khoản lớn: khoá ngay + trả về PurgeJob xoá dần ở nền (services.purge).
+    """
     from app.models.booking import Booking
 
-    active_booking = db.query(Booking).filter(
+    active_booking = db.query(Booking.id).filter(
         Booking.user_id == db_user.id,
         Booking.status.in_(["pending", "confirmed", "checked_in"])
     ).first()
@@ -100,8 +95,7 @@ def delete_user(db: Session, db_user: User):
     if active_booking:
         raise HTTPException(409, "Cannot delete user with active bookings")
 
-    db.delete(db_user)
-    db.commit()
+    return purge.purge_or_enqueue(db, "user", db_user.id, requested_by)
 
 
 
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.utility import Utility
 from app.schemas.utility import UtilityCreate, UtilityUpdate
+from app.crud.constraints import commit_or_conflict
 import re
 
 
@@ -18,10 +19,6 @@ def get_utility_by_key(db: Session, key: str) -> Optional[Utility]:
 
 
 def create_utility(db: Session, data: UtilityCreate) -> Utility:
-    # KEY UNIQUE
-    if get_utility_by_key(db, data.key):
-        raise HTTPException(409, "Utility key already exists")
-
     # Check key format
     if not re.match(r"^[a-z0-9_]+$", data.key):
         raise HTTPException(400, "Key must be snake_case with no spaces")
@@ -37,8 +34,8 @@ def create_utility(db: Session, data: UtilityCreate) -> Utility:
     )
 
     db.add(utility)
-    db.commit()
-    db.refresh(utility)
+    # KEY UNIQUE: unique index quyết định lúc INSERT
+    commit_or_conflict(db, {"key": "Utility key already exists"})
     return utility
 
 
@@ -53,7 +50,6 @@ def update_utility(db: Session, db_utility: Utility, updates: UtilityUpdate) ->
         setattr(db_utility, field, value)
 
     db.commit()
-    db.refresh(db_utility)
     return db_utility
 
 
@@ -0,0 +1,93 @@
+# app/crud/waitlist.py
+from datetime import timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+from app.models.space import Space
+from app.models.waitlist import WaitlistEntry
+from app.schemas.waitlist import WaitlistCreate
+from app.crud.booking import promote_waiters, on_promoted, WAITLIST_MAX_MINUTES
+from app.services.space_calendar import calendar
+
+
+def get_entry(db: Session, entry_id: int) -> Optional[WaitlistEntry]:
+    return db.get(WaitlistEntry, entry_id)
+
+
+def list_user_entries(db: Session, user_id: int, status: Optional[str] = None) -> List[WaitlistEntry]:
+    stmt = select(WaitlistEntry).where(WaitlistEntry.user_id == user_id)
+    if status is not None:
+        stmt = stmt.where(WaitlistEntry.status == status)
+    return db.execute(stmt.order_by(WaitlistEntry.created_at.desc())).scalars().all()
+
+
+def list_space_waitlist(db: Session, space_id: int) -> List[WaitlistEntry]:
+    return db.execute(
+        select(WaitlistEntry)
+        .where(WaitlistEntry.space_id == space_id, WaitlistEntry.status == "waiting")
+        .order_by(WaitlistEntry.id)
+    ).scalars().all()
+
+
+def join_waitlist(db: Session, data: WaitlistCreate, current_user_id: int) -> WaitlistEntry:
+    if data.start_time >= data.end_time:
+        raise HTTPException(400, "Invalid time range.")
+    if data.end_time - data.start_time > timedelta(minutes=WAITLIST_MAX_MINUTES):
+        raise HTTPException(400, f"Waitlist window must be at most {WAITLIST_MAX_MINUTES} minutes.")
+
+    space = db.execute(select(Space.is_active).where(Space.id == data.space_id)).first()
+    if not space:
+        raise HTTPException(404, "Space not found.")
+    if not space.is_active:
+        raise HTTPException(409, "Space is not available.")
+
+    calendar.validate(db, data.space_id, data.start_time, data.end_time)
+
+    already_waiting = db.query(WaitlistEntry).filter(
+        WaitlistEntry.user_id == current_user_id,
+        WaitlistEntry.space_id == data.space_id,
+        WaitlistEntry.status == "waiting",
+        WaitlistEntry.start_time < data.end_time,
+        WaitlistEntry.end_time > data.start_time,
+    ).count()
+    if already_waiting:
+        raise HTTPException(409, "You are already waiting for this time range.")
+
+    has_booking = db.query(Booking).filter(
+        Booking.user_id == current_user_id,
+        Booking.space_id == data.space_id,
+        Booking.status.in_(["pending", "confirmed"]),
+        Booking.start_time < data.end_time,
+        Booking.end_time > data.start_time,
+    ).count()
+    if has_booking:
+        raise HTTPException(409, "You already have a booking in this time range.")
+
+    entry = WaitlistEntry(
+        user_id=current_user_id,
+        space_id=data.space_id,
+        start_time=data.start_time,
+        end_time=data.end_time,
+        notes=data.notes,
+    )
+    db.add(entry)
+    db.flush()
+
+    # Nếu chỗ đã trống sẵn thì hàng chờ (kể cả entry này) lên lượt luôn
+    promoted = promote_waiters(db, data.space_id, data.start_time, data.end_time, limit=None)
+
+    db.commit()
+    on_promoted(promoted)
+    return entry
+
+
+def leave_waitlist(db: Session, entry: WaitlistEntry) -> WaitlistEntry:
+    if entry.status != "waiting":
+        raise HTTPException(400, "Waitlist entry is no longer waiting.")
+    entry.status = "cancelled"
+    db.commit()
+    return entry
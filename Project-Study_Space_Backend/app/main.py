@@ -1,13 +1,35 @@
+import asyncio
+
 from fastapi import FastAPI
 from app.api.v1.router import api_router
+from app.core.limits import LimitsMiddleware
+from app.core.database import ReadYourWritesMiddleware
 from app.tasks.scheduler import start_scheduler
+from app.services.events import start_listener, stop_listener
+import app.services.change_log  # noqa: F401  (đăng ký listener ghi change_log)
 
 start_scheduler()
 
 app = FastAPI(title="Study Space Booking API")
 
+# rate limit theo user/route class + cắt tải theo mức ưu tiên
+app.add_middleware(LimitsMiddleware)
+# read-your-writes giữa các worker: cookie mốc ghi gần nhất (core.database)
+app.add_middleware(ReadYourWritesMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
 
+
+@app.on_event("startup")
+async def start_event_listener():
+    start_listener(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+def stop_event_listener():
+    stop_listener()
+
+
 @app.get("/")
 def root():
     return {"message": "Backend is running"}
@@ -0,0 +1,28 @@
+# app/models/analytics.py
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+
+from app.core.database import Base
+
+
+class BookingHourlyRollup(Base):
+    """
+    1 dòng / (space, giờ UTC) có hoạt động. Giờ không có dòng = toàn bộ bằng 0.
+    Được tính lại theo cửa sổ bởi services.analytics.refresh_rollups.
+    """
+    __tablename__ = "booking_hourly_rollups"
+    __table_args__ = (
+        Index("ix_booking_hourly_rollups_hour", "hour_start"),
+    )
+
+    space_id = Column(
+        Integer,
+        ForeignKey("spaces.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    hour_start = Column(DateTime(timezone=True), primary_key=True)
+
+    booked_minutes = Column(Integer, nullable=False, default=0)   # mọi booking trừ cancelled
+    used_minutes = Column(Integer, nullable=False, default=0)     # check-in -> check-out thực tế
+    bookings = Column(Integer, nullable=False, default=0)         # booking bắt đầu trong giờ này
+    no_shows = Column(Integer, nullable=False, default=0)
+    peak_concurrent = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, Text, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -21,6 +21,17 @@ booking_status_enum = ENUM(
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # range scan cho analytics rollup (start_time < window_end)
+        Index("ix_bookings_start_time", "start_time"),
+        # sweep no-show (status, start_time) và auto-complete (status, end_time)
+        Index("ix_bookings_status_start_time", "status", "start_time"),
+        Index("ix_bookings_status_end_time", "status", "end_time"),
+        # FK: ON DELETE CASCADE + purge theo chunk cần index phía bảng con
+        # (kèm start_time cho các truy vấn trùng giờ theo user / space)
+        Index("ix_bookings_user_start", "user_id", "start_time"),
+        Index("ix_bookings_space_start", "space_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -50,7 +61,15 @@ class Booking(Base):
         nullable=False,
     )
 
+    # Optimistic concurrency (ETag / If-Match): mọi UPDATE qua ORM kèm
+    # WHERE version = :cũ; lệch -> StaleDataError. UPDATE set-based tự +1.
+    version = Column(Integer, nullable=False, server_default="1")
+
+    # updated_at / version về cùng câu UPDATE ... RETURNING, không SELECT lại
+    __mapper_args__ = {"eager_defaults": True, "version_id_col": version}
+
     # 🔥 Relationship
     user = relationship("User", back_populates="bookings")
     space = relationship("Space", back_populates="bookings")
-    penalties = relationship("Penalty", back_populates="booking", cascade="all, delete-orphan")
+    # Penalty sống lâu hơn booking (FK ON DELETE SET NULL, điểm vẫn tính trong ledger)
+    penalties = relationship("Penalty", back_populates="booking", passive_deletes=True)
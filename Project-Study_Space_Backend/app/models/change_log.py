@@ -0,0 +1,37 @@
+# app/models/change_log.py
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index, func, text
+
+from app.core.database import Base
+
+
+class ChangeLog(Base):
+    """
+    Nhật ký thay đổi cho delta-sync (GET /sync).
+
+    txid là transaction id (xid8) của transaction đã ghi dòng này; sync token
+    chính là txid, nên client không bao giờ bỏ sót thay đổi của transaction
+    commit muộn hơn transaction có txid lớn hơn.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_txid_seq", "txid", "seq"),
+    )
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=True)
+    txid = Column(
+        BigInteger,
+        nullable=False,
+        server_default=text("(pg_current_xact_id()::text)::bigint"),
+    )
+
+    entity_type = Column(String(20), nullable=False)   # booking | space | utility | penalty
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)            # upsert | delete
+
+    # Chủ sở hữu (booking/penalty); NULL = dữ liệu public (space, utility)
+    user_id = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ChangeLog seq={self.seq} {self.entity_type}:{self.entity_id} {self.op}>"
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.core.database import Base
+
+
+class IdempotencyRecord(Base):
+    """
+    Kết quả đã trả cho 1 Idempotency-Key (services.idempotency).
+
+    key = "<user_id>:<route>:<Idempotency-Key>"; status_code NULL nghĩa là
+    request đầu tiên vẫn đang chạy (từ claimed_at). Dòng hết hạn bị
+    scheduler dọn.
+    """
+    __tablename__ = "idempotency_records"
+    __table_args__ = (
+        Index("ix_idempotency_records_expires_at", "expires_at"),
+    )
+
+    key = Column(String(300), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)   # sha256 của request body
+
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSONB, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # lần cuối 1 request nhận key; quá STALE_CLAIM mà chưa có kết quả = worker đã chết
+    claimed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
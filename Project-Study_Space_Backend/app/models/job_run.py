@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+
+from app.core.database import Base
+
+
+class JobRun(Base):
+    """
+    Lần chạy gần nhất của job scheduler dùng chung giữa các worker
+    (services.job_runs): mỗi worker đều có scheduler riêng, job nặng chỉ
+    chạy ở worker nào claim được lượt.
+    """
+    __tablename__ = "job_runs"
+
+    name = Column(String(100), primary_key=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=False)
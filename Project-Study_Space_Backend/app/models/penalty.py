@@ -5,10 +5,13 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Boolean,
     DateTime,
     Text,
     ForeignKey,
+    Index,
     Enum as SQLEnum,
+    text,
 )
 from sqlalchemy.orm import relationship
 
@@ -23,6 +26,30 @@ class PenaltyType(str, PyEnum):
 
 class Penalty(Base):
     __tablename__ = "penalties"
+    __table_args__ = (
+        # Chỉ index penalty còn hiệu lực: tính điểm active + sweep hết hạn
+        Index(
+            "ix_penalties_active_user",
+            "user_id",
+            "expires_at",
+            postgresql_where=text("expired IS FALSE"),
+        ),
+        Index(
+            "ix_penalties_active_expires_at",
+            "expires_at",
+            postgresql_where=text("expired IS FALSE"),
+        ),
+        # FK users: ON DELETE CASCADE + purge theo chunk (index trên là partial)
+        Index("ix_penalties_user_id", "user_id"),
+        # Mỗi booking chỉ bị phạt 1 lần / loại -> sweep dùng ON CONFLICT DO NOTHING
+        Index(
+            "uq_penalties_booking_type",
+            "booking_id",
+            "penalty_type",
+            unique=True,
+            postgresql_where=text("booking_id IS NOT NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -44,9 +71,16 @@ class Penalty(Base):
     reason = Column(Text, nullable=True)
 
     expires_at = Column(DateTime(timezone=True), nullable=False)
+    # Đã được sweep trừ khỏi users.penalty_count
+    expired = Column(Boolean, nullable=False, default=False, server_default="false")
 
     created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
 
+    # Optimistic concurrency, xem Booking.version (sweep hết hạn cũng +1)
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
     # relationships
     user = relationship("User", back_populates="penalties")
     booking = relationship("Booking", back_populates="penalties")
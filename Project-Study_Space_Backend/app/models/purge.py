@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func, text
+
+from app.core.database import Base
+
+
+class PurgeJob(Base):
+    """
+    Xoá cứng 1 user / space lớn theo từng chunk (services.purge).
+
+    Bảng con lớn (penalties, ratings, bookings) bị xoá dần PURGE_BATCH_SIZE
+    dòng / commit, cuối cùng xoá dòng cha và để ON DELETE CASCADE dọn nốt
+    các bảng nhỏ. total / deleted để admin theo dõi tiến độ.
+    """
+    __tablename__ = "purge_jobs"
+    __table_args__ = (
+        # Mỗi entity chỉ có 1 job đang chạy; cũng là index cho scheduler nhặt job
+        Index(
+            "uq_purge_jobs_active",
+            "entity_type",
+            "entity_id",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    entity_type = Column(String(20), nullable=False)   # user | space
+    entity_id = Column(Integer, nullable=False)        # không FK: dòng cha sẽ bị xoá
+    requested_by = Column(Integer, nullable=True)      # admin id
+
+    status = Column(String(20), nullable=False, server_default="pending")  # pending | running | done | failed
+    total = Column(Integer, nullable=False, server_default="0")     # số dòng con lúc tạo job
+    deleted = Column(Integer, nullable=False, server_default="0")
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __mapper_args__ = {"eager_defaults": True}
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done":
+            return 1.0
+        return min(self.deleted / self.total, 1.0) if self.total else 0.0
+
+    def __repr__(self) -> str:
+        return f"<PurgeJob id={self.id} {self.entity_type}={self.entity_id} {self.status}>"
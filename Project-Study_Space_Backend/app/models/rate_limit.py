@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Float, DateTime, func
+
+from app.core.database import Base
+
+
+class RateLimitBucket(Base):
+    """
+    Token bucket dùng chung giữa các worker (core.limits, backend "postgres").
+    UNLOGGED: mất khi crash chỉ làm bucket đầy lại, không ảnh hưởng dữ liệu.
+    """
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(200), primary_key=True)      # "<principal>:<route class>"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
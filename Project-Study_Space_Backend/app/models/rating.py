@@ -1,10 +1,19 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, Computed, Index, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (
+        Index("ix_ratings_comment_tsv", "comment_tsv", postgresql_using="gin"),
+        # Mỗi user rate 1 space 1 lần (crud.rating map vi phạm -> 409)
+        UniqueConstraint("user_id", "space_id", name="uq_ratings_user_space"),
+        # FK spaces (FK users dùng được uq_ratings_user_space)
+        Index("ix_ratings_space_id", "space_id"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -23,8 +32,37 @@ class Rating(Base):
     score = Column(Integer, nullable=False)  # 1–5
     comment = Column(Text)
 
+    # Full-text search: config 'simple' (comment có cả tiếng Việt lẫn tiếng Anh)
+    comment_tsv = Column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', coalesce(comment, ''))", persisted=True),
+    )
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user = relationship("User", back_populates="ratings")
     space = relationship("Space", back_populates="ratings")
+
+
+# Số shard cho mỗi (space, score): rating đồng thời vào cùng phòng được rải ra
+# nhiều dòng thay vì cùng tranh 1 dòng.
+RATING_SHARDS = 8
+
+
+class SpaceRatingBucket(Base):
+    """
+    Histogram rating theo space: count của (space, score) = SUM(count) qua các shard.
+    Một shard có thể âm (delete rơi vào shard khác create); chỉ tổng có nghĩa.
+    """
+    __tablename__ = "space_rating_buckets"
+
+    space_id = Column(
+        Integer,
+        ForeignKey("spaces.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    score = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+
+    count = Column(Integer, nullable=False, server_default="0")
@@ -7,12 +7,16 @@ from sqlalchemy import (
     DateTime,
     func,
     ForeignKey,
-    Table
+    Table,
+    Index,
+    text,
+    select,
 )
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, column_property
 
 from app.core.database import Base
+from app.models.rating import SpaceRatingBucket
 
 # ======================================================
 # ASSOCIATION TABLE Space <-> Utility (ONE AND ONLY)
@@ -32,6 +36,25 @@ space_utilities = Table(
 
 class Space(Base):
     __tablename__ = "spaces"
+    __table_args__ = (
+        # GIN (jsonb_ops) phục vụ filter equipment: @>, ?, @?
+        Index("ix_spaces_equipment", "equipment", postgresql_using="gin"),
+        # sort=rating|popularity trên danh sách space active: khớp đúng
+        # ORDER BY <score> DESC, id để đọc index theo thứ tự, khỏi sort
+        Index(
+            "ix_spaces_active_rating_score",
+            text("rating_score DESC"),
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        Index(
+            "ix_spaces_active_popularity_score",
+            text("popularity_score DESC"),
+            "id",
+            postgresql_where=text("is_active"),
+        ),
+        Index("ix_spaces_building_floor", "building", "floor"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -41,30 +64,67 @@ class Space(Base):
     status = Column(String(20), nullable=False, default="available")
     location = Column(String, nullable=False)
 
+    # Vị trí có cấu trúc (services.space_index); location giữ làm mô tả tự do
+    building = Column(String(50), nullable=True)
+    floor = Column(Integer, nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+
     description = Column(String, nullable=True)
     equipment = Column(JSONB, nullable=True)
 
-    average_rating = Column(Float, nullable=False, server_default="0")
-    total_ratings = Column(Integer, nullable=False, server_default="0")
+    # Điểm xếp hạng precompute (services.ranking)
+    rating_score = Column(Float, nullable=False, server_default="0")
+    popularity_score = Column(Float, nullable=False, server_default="0")
 
     is_active = Column(Boolean, nullable=False, server_default="true")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    # Relations
+    # Optimistic concurrency, xem Booking.version
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"eager_defaults": True, "version_id_col": version}
+
+    # Relations (xem User: không load kèm, xoá bằng ON DELETE CASCADE)
     bookings = relationship(
         "Booking",
         back_populates="space",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
     )
 
     ratings = relationship(
         "Rating",
         back_populates="space",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
+    )
+
+    # Tổng histogram rating (xem crud.rating), tính bằng subquery ngay trong
+    # câu SELECT space thay vì load từng dòng bucket. deferred + raiseload:
+    # chỉ query trả SpaceResponse mới undefer (crud.space.RATING_STATS),
+    # các chỗ load Space khác không tốn thêm và không lazy load lén.
+    # expire_on_flush=False: sửa space không đổi rating, giữ giá trị đã load
+    # để PATCH / DELETE trả SpaceResponse sau commit mà không bị raiseload.
+    total_ratings = column_property(
+        select(func.coalesce(func.sum(SpaceRatingBucket.count), 0))
+        .where(SpaceRatingBucket.space_id == id)
+        .scalar_subquery(),
+        deferred=True,
+        raiseload=True,
+        expire_on_flush=False,
+        group="rating_stats",
+    )
+    rating_sum = column_property(
+        select(func.coalesce(func.sum(SpaceRatingBucket.score * SpaceRatingBucket.count), 0))
+        .where(SpaceRatingBucket.space_id == id)
+        .scalar_subquery(),
+        deferred=True,
+        raiseload=True,
+        expire_on_flush=False,
+        group="rating_stats",
     )
 
     # ⭐ Correct Many-to-Many
@@ -74,3 +134,70 @@ class Space(Base):
         back_populates="spaces",
         lazy="selectin",
     )
+
+    @property
+    def average_rating(self) -> float:
+        total = self.total_ratings
+        if not total:
+            return 0.0
+        return self.rating_sum / total
+
+
+# ======================================================
+# BOOKING RULES / OPENING HOURS (1-1 với Space)
+# ======================================================
+
+class SpaceBookingRule(Base):
+    """
+    Luật đặt chỗ của 1 space, được compile thành lịch trong RAM
+    (services.space_calendar). Không có dòng = không giới hạn.
+    """
+    __tablename__ = "space_booking_rules"
+    __mapper_args__ = {"eager_defaults": True}
+
+    space_id = Column(
+        Integer,
+        ForeignKey("spaces.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    timezone = Column(String(64), nullable=False, server_default="UTC")
+
+    # {"mon": [["08:00", "22:00"]], "sat": [["09:00", "12:00"], ["13:00", "17:00"]], ...}
+    # NULL = mở cửa 24/7; thiếu 1 thứ = đóng cửa cả ngày đó
+    opening_hours = Column(JSONB, nullable=True)
+    # ["2026-12-25", "2027-01-01", ...] theo ngày địa phương
+    closures = Column(JSONB, nullable=True)
+
+    slot_minutes = Column(Integer, nullable=True)
+    min_duration_minutes = Column(Integer, nullable=True)
+    max_duration_minutes = Column(Integer, nullable=True)
+    min_lead_minutes = Column(Integer, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SpaceHold(Base):
+    """
+    Giữ chỗ tạm (soft hold) trong vài phút khi user đang điền form đặt chỗ.
+
+    Bảng UNLOGGED: dùng chung giữa các worker, ghi nhanh (không qua WAL),
+    mất khi Postgres crash cũng không sao vì hold vốn chỉ sống HOLD_TTL.
+    Hold hết hạn bị bỏ qua qua điều kiện expires_at > now(), được dọn định kỳ.
+    """
+    __tablename__ = "space_holds"
+    __table_args__ = (
+        Index("ix_space_holds_space_start", "space_id", "start_time"),
+        Index("ix_space_holds_expires_at", "expires_at"),
+        {"prefixes": ["UNLOGGED"]},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    space_id = Column(Integer, ForeignKey("spaces.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -23,17 +23,29 @@ class User(Base):
     role = Column(Enum(UserRole), nullable=False, default=UserRole.student)
     is_active = Column(Boolean, default=True)
 
+    # Điểm penalty active (cache của penalty ledger, xem services.penalty_ledger)
+    penalty_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True),
                         server_default=func.now(),
                         onupdate=func.now())
+
+    # Optimistic concurrency, xem Booking.version. Không tăng khi penalty
+    # ledger sửa penalty_count (cache, không nằm trong UserResponse).
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"eager_defaults": True, "version_id_col": version}
     
     
+    # Bảng con không load kèm user (mọi request đều load current_user).
+    # passive_deletes: xoá user không load con về xoá từng dòng, để
+    # ON DELETE CASCADE của DB lo (user lớn: services.purge xoá theo chunk)
     penalties = relationship(
         "Penalty",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
     )
 
     # 🔥 MUST-HAVE for Booking system
@@ -41,7 +53,7 @@ class User(Base):
         "Booking",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin",
+        passive_deletes=True,
     )
 
-    ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan")
+    ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
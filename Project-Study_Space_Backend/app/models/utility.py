@@ -6,6 +6,7 @@ from app.models.space import space_utilities
 
 class Utility(Base):
     __tablename__ = "utilities"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String(50), nullable=False, unique=True, index=True)
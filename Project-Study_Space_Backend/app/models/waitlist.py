@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class WaitlistEntry(Base):
+    """
+    Hàng chờ theo space + khung giờ. Thứ tự FIFO theo id.
+
+    Khi có chỗ trống (huỷ, đổi giờ, no-show, tăng capacity), crud.booking
+    .promote_waiters chỉ đọc các entry waiting của đúng space có start_time
+    gần khung giờ vừa trống (index partial bên dưới) rồi tạo booking ngay
+    trong transaction đó.
+    """
+    __tablename__ = "waitlist_entries"
+    __table_args__ = (
+        Index(
+            "ix_waitlist_waiting_space_start",
+            "space_id",
+            "start_time",
+            postgresql_where=text("status = 'waiting'"),
+        ),
+        Index("ix_waitlist_user", "user_id", "created_at"),
+        # FK bookings ON DELETE SET NULL: xoá booking không quét cả bảng
+        Index("ix_waitlist_booking", "booking_id", postgresql_where=text("booking_id IS NOT NULL")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    space_id = Column(Integer, ForeignKey("spaces.id", ondelete="CASCADE"), nullable=False)
+
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    notes = Column(Text, nullable=True)
+
+    status = Column(String(20), nullable=False, server_default="waiting")  # waiting | promoted | cancelled
+    booking_id = Column(Integer, ForeignKey("bookings.id", ondelete="SET NULL"), nullable=True)
+    promoted_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<WaitlistEntry id={self.id} user={self.user_id} space={self.space_id} {self.status}>"
@@ -0,0 +1,35 @@
+# app/schemas/analytics.py
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class UtilizationBucket(BaseModel):
+    space_id: int
+    weekday: int        # ISO: 1 = Monday ... 7 = Sunday
+    hour: int           # 0..23 theo tz của request
+    booked_minutes: int
+    used_minutes: int
+    peak_concurrent: int
+    booked_utilization: float
+    used_utilization: float
+
+
+class NoShowRate(BaseModel):
+    space_id: int
+    bookings: int
+    no_shows: int
+    no_show_rate: float
+
+
+class HourlyRollupOut(BaseModel):
+    space_id: int
+    hour_start: datetime
+    booked_minutes: int
+    used_minutes: int
+    bookings: int
+    no_shows: int
+    peak_concurrent: int
+
+    class Config:
+        from_attributes = True
@@ -37,6 +37,8 @@ class BookingBase(BaseModel):
 class BookingCreate(BookingBase):
     qr_code_data: Optional[str] = None
     notes: Optional[str] = None
+    # hold từ POST /spaces/{id}/holds, phải khớp space + khung giờ
+    hold_id: Optional[int] = None
 
     class Config:
         extra = "forbid"
@@ -80,7 +82,21 @@ class BookingResponse(BaseModel):
 
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    # = ETag; gửi lại qua If-Match khi PATCH
+    version: int
 
     class Config:
         from_attributes = True
 
+
+# ===========================
+#   QR SCAN (máy quét cửa)
+# ===========================
+
+class QRScanRequest(BaseModel):
+    token: str = Field(..., max_length=200)
+    # space của cửa đang quét; nếu có thì phải khớp với token
+    space_id: Optional[int] = None
+
+    class Config:
+        extra = "forbid"
@@ -1,6 +1,6 @@
 # app/schemas/penalty.py
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 from app.models.penalty import PenaltyType
 
@@ -39,7 +39,16 @@ class PenaltyOut(BaseModel):
     points: int
     reason: Optional[str]
     expires_at: datetime
+    expired: bool = False
     created_at: datetime
+    # = ETag; gửi lại qua If-Match khi PATCH
+    version: int
 
     class Config:
         from_attributes = True
+
+
+# ---------- Của chính user ----------
+class MyPenalties(BaseModel):
+    active_points: int              # đọc từ cache users.penalty_count
+    penalties: List[PenaltyOut]     # chỉ penalty còn hiệu lực
@@ -0,0 +1,22 @@
+# app/schemas/purge.py
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PurgeJobOut(BaseModel):
+    id: int
+    entity_type: str            # user | space
+    entity_id: int
+    status: str                 # pending | running | done | failed
+    total: int                  # số dòng con lúc tạo job
+    deleted: int
+    progress: float             # 0..1
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 # app/schemas/rating.py
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class RatingBase(BaseModel):
@@ -30,3 +30,19 @@ class RatingResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class RatingSummary(BaseModel):
+    space_id: int
+    total_ratings: int
+    average_rating: float
+    histogram: Dict[int, int]   # score (1-5) -> số lượt
+
+
+class RatingSearchHit(RatingResponse):
+    rank: float
+
+
+class RatingSearchPage(BaseModel):
+    items: List[RatingSearchHit]
+    next_cursor: Optional[str] = None   # truyền lại vào ?cursor= để lấy trang sau
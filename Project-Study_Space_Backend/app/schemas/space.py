@@ -1,7 +1,7 @@
 # app/schemas/space.py
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -19,12 +19,21 @@ class SpaceStatus(str, Enum):
     maintenance = "maintenance"
 
 
+class SpaceSort(str, Enum):
+    rating = "rating"
+    popularity = "popularity"
+
+
 class SpaceBase(BaseModel):
     name: str = Field(..., max_length=100)
     capacity: int = Field(..., gt=0)
     type: SpaceType
     status: SpaceStatus = SpaceStatus.available
     location: str
+    building: Optional[str] = Field(None, max_length=50)
+    floor: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     description: Optional[str] = None
     equipment: Optional[Dict[str, Any]] = None  # map JSONB
 
@@ -39,6 +48,10 @@ class SpaceUpdate(BaseModel):
     type: Optional[SpaceType] = None
     status: Optional[SpaceStatus] = None
     location: Optional[str] = None
+    building: Optional[str] = Field(None, max_length=50)
+    floor: Optional[int] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     description: Optional[str] = None
     equipment: Optional[Dict[str, Any]] = None
 
@@ -50,6 +63,117 @@ class SpaceResponse(SpaceBase):
     is_active: bool = True
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # = ETag; gửi lại qua If-Match khi PATCH
+    version: int
+
+    class Config:
+        from_attributes = True
+
+
+class SpaceOccupancy(BaseModel):
+    space_id: int
+    occupied: int
+    capacity: Optional[int] = None
+
+
+class SpaceRules(BaseModel):
+    timezone: str = "UTC"
+    # {"mon": [["08:00", "22:00"]], ...}; None = mở 24/7
+    opening_hours: Optional[Dict[str, List[Tuple[str, str]]]] = None
+    closures: Optional[List[date]] = None
+    slot_minutes: Optional[int] = Field(None, gt=0)
+    min_duration_minutes: Optional[int] = Field(None, gt=0)
+    max_duration_minutes: Optional[int] = Field(None, gt=0)
+    min_lead_minutes: Optional[int] = Field(None, ge=0)
+
+    class Config:
+        extra = "forbid"
+        from_attributes = True
+
+
+class HoldCreate(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+    class Config:
+        extra = "forbid"
+
+
+class HoldOut(BaseModel):
+    id: int
+    space_id: int
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class SpaceAvailability(BaseModel):
+    space_id: int
+    start_time: datetime
+    end_time: datetime
+    capacity: int
+    booked: int
+    held: int
+    available: int
+
+
+class MaintenanceRequest(BaseModel):
+    space_ids: List[int] = Field(..., min_length=1)
+    # None = từ bây giờ; không nhận thời điểm trong tương lai
+    start_time: Optional[datetime] = None
+    # None = tới khi admin mở lại space
+    end_time: Optional[datetime] = None
+    relocate: bool = True
+
+    class Config:
+        extra = "forbid"
+
+
+class Relocation(BaseModel):
+    booking_id: int
+    new_booking_id: int
+    from_space_id: int
+    to_space_id: int
+
+
+class MaintenanceResult(BaseModel):
+    space_ids: List[int]
+    cancelled: int
+    relocated: List[Relocation]
+    # booking đã huỷ nhưng không tìm được space tương đương
+    unplaced: List[int]
+
+
+class SlotSuggestion(BaseModel):
+    space_id: int
+    name: str
+    type: SpaceType
+    capacity: int
+    location: str
+    rating_score: float = 0.0
+
+    start_time: datetime
+    end_time: datetime
+    # số chỗ còn trống trong khung giờ này
+    free_units: int
+    # độ lệch so với giờ bắt đầu yêu cầu
+    shift_minutes: int
+
+
+class NearbySpace(BaseModel):
+    id: int
+    name: str
+    type: SpaceType
+    capacity: int
+    location: str
+    building: Optional[str] = None
+    floor: Optional[int] = None
+    latitude: float
+    longitude: float
+
+    distance_m: float
+    # chỉ có khi truyền start_time/end_time
+    free_units: Optional[int] = None
@@ -0,0 +1,26 @@
+# app/schemas/sync.py
+from typing import List
+
+from pydantic import BaseModel
+
+from app.schemas.booking import BookingResponse
+from app.schemas.penalty import PenaltyOut
+from app.schemas.space import SpaceResponse
+from app.schemas.utility import UtilityResponse
+
+
+class SyncDeleted(BaseModel):
+    bookings: List[int] = []
+    spaces: List[int] = []
+    utilities: List[int] = []
+    penalties: List[int] = []
+
+
+class SyncResponse(BaseModel):
+    next_token: int
+    has_more: bool
+    bookings: List[BookingResponse] = []
+    spaces: List[SpaceResponse] = []
+    utilities: List[UtilityResponse] = []
+    penalties: List[PenaltyOut] = []
+    deleted: SyncDeleted
@@ -49,6 +49,8 @@ class UserResponse(BaseModel):
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # = ETag; gửi lại qua If-Match khi PATCH
+    version: int
 
     class Config:
         from_attributes = True
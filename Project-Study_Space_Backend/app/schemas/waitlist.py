@@ -0,0 +1,42 @@
+# app/schemas/waitlist.py
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class WaitlistStatus(str, Enum):
+    waiting = "waiting"
+    promoted = "promoted"
+    cancelled = "cancelled"
+
+
+class WaitlistCreate(BaseModel):
+    space_id: int = Field(..., gt=0)
+    start_time: datetime
+    end_time: datetime
+    notes: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
+
+
+class WaitlistOut(BaseModel):
+    id: int
+    user_id: int
+    space_id: int
+
+    start_time: datetime
+    end_time: datetime
+    notes: Optional[str] = None
+
+    status: WaitlistStatus
+    # booking được tạo khi lên lượt
+    booking_id: Optional[int] = None
+    promoted_at: Optional[datetime] = None
+
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,239 @@
+# app/services/analytics.py
+"""
+Tính rollup theo giờ cho booking bằng NumPy.
+
+Mỗi lần refresh chỉ đọc 1 lần (projected scan) các booking giao với cửa sổ
+[start, end), sau đó toàn bộ bucketing được vector hoá:
+  - _spread(): tách mỗi interval thành các đoạn theo giờ (np.repeat)
+  - peak concurrent: sweep line bằng cumsum trên các event +1/-1
+rồi ghi đè rollup của cửa sổ đó (DELETE + INSERT trong 1 transaction).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+import numpy as np
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import Session
+
+from app.models.analytics import BookingHourlyRollup
+from app.models.booking import Booking
+
+HOUR = 3600
+REFRESH_LOOKBACK_HOURS = 48
+BACKFILL_CHUNK = timedelta(days=7)
+
+
+def floor_hour(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _epoch(values) -> np.ndarray:
+    return np.array(
+        [v.timestamp() if v is not None else np.nan for v in values],
+        dtype=np.float64,
+    )
+
+
+def _spread(space: np.ndarray, start: np.ndarray, end: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Interval [start, end) -> (space, hour_index, seconds trong giờ đó)."""
+    keep = end > start
+    space, start, end = space[keep], start[keep], end[keep]
+    if space.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+
+    first = np.floor(start / HOUR).astype(np.int64)
+    last = np.floor((end - 1e-6) / HOUR).astype(np.int64)
+    counts = last - first + 1
+
+    owner = np.repeat(np.arange(space.size), counts)
+    offsets = np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    hour = first[owner] + offsets
+
+    seconds = (
+        np.minimum(end[owner], (hour + 1) * HOUR)
+        - np.maximum(start[owner], hour * HOUR)
+    )
+    return space[owner], hour, seconds
+
+
+def _peak_concurrency(space: np.ndarray, start: np.ndarray, end: np.ndarray):
+    """Sweep line: số booking đồng thời lớn nhất của mỗi (space, giờ)."""
+    n = space.size
+    ev_space = np.concatenate([space, space])
+    ev_time = np.concatenate([start, end])
+    ev_delta = np.concatenate([np.ones(n, dtype=np.int64), -np.ones(n, dtype=np.int64)])
+
+    # Sắp theo (space, time, delta): kết thúc (-1) trước bắt đầu (+1) tại cùng thời điểm
+    order = np.lexsort((ev_delta, ev_time, ev_space))
+    ev_space, ev_time, ev_delta = ev_space[order], ev_time[order], ev_delta[order]
+
+    # Tổng delta của mỗi space = 0 nên cumsum toàn cục tự reset giữa các space
+    level = np.cumsum(ev_delta)
+
+    # Đoạn [t_i, t_{i+1}) giữ mức level_i (chỉ khi cùng space)
+    same = ev_space[:-1] == ev_space[1:]
+    seg_space, seg_hour, seg_seconds = _spread(
+        ev_space[:-1][same], ev_time[:-1][same], ev_time[1:][same]
+    )
+    seg_level = np.repeat(
+        level[:-1][same],
+        _hour_span(ev_time[:-1][same], ev_time[1:][same]),
+    )
+    return seg_space, seg_hour, seg_level
+
+
+def _hour_span(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    keep = end > start
+    counts = np.zeros(start.size, dtype=np.int64)
+    counts[keep] = (
+        np.floor((end[keep] - 1e-6) / HOUR).astype(np.int64)
+        - np.floor(start[keep] / HOUR).astype(np.int64)
+        + 1
+    )
+    return counts
+
+
+def compute_rollups(rows, window_start: datetime, window_end: datetime, now: datetime) -> list:
+    """rows: (space_id, start_time, end_time, status, check_in_time, check_out_time)."""
+    if not rows:
+        return []
+
+    lo, hi = window_start.timestamp(), window_end.timestamp()
+    space_id, start_t, end_t, status, check_in, check_out = zip(*rows)
+
+    space = np.array(space_id, dtype=np.int64)
+    start = _epoch(start_t)
+    end = _epoch(end_t)
+    status = np.array(status, dtype=object)
+    check_in = _epoch(check_in)
+    check_out = _epoch(check_out)
+
+    # --- booked (mọi status trừ cancelled), cắt theo cửa sổ ---
+    booked = status != "cancelled"
+    b_space = space[booked]
+    b_start = np.clip(start[booked], lo, hi)
+    b_end = np.clip(end[booked], lo, hi)
+
+    # --- used: check-in thực tế đến check-out (hoặc end/now nếu chưa check-out) ---
+    used = ~np.isnan(check_in)
+    open_end = np.minimum(end, now.timestamp())
+    u_end = np.where(np.isnan(check_out), open_end, check_out)
+
+    # --- đếm theo giờ bắt đầu ---
+    in_window = booked & (start >= lo) & (start < hi)
+    start_hour = np.floor(start / HOUR).astype(np.int64)
+
+    parts = {
+        "booked": _spread(b_space, b_start, b_end),
+        "used": _spread(space[used], np.clip(check_in[used], lo, hi), np.clip(u_end[used], lo, hi)),
+    }
+    peak_space, peak_hour, peak_level = _peak_concurrency(b_space, b_start, b_end)
+
+    # Gộp tất cả key (space, hour) rồi cộng dồn bằng np.add.at / np.maximum.at
+    all_space = np.concatenate([
+        parts["booked"][0], parts["used"][0], space[in_window], peak_space,
+    ])
+    all_hour = np.concatenate([
+        parts["booked"][1], parts["used"][1], start_hour[in_window], peak_hour,
+    ])
+    if all_space.size == 0:
+        return []
+
+    keys, inverse = np.unique(np.stack([all_space, all_hour], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    n_keys = keys.shape[0]
+
+    booked_seconds = np.zeros(n_keys)
+    used_seconds = np.zeros(n_keys)
+    bookings = np.zeros(n_keys, dtype=np.int64)
+    no_shows = np.zeros(n_keys, dtype=np.int64)
+    peak = np.zeros(n_keys, dtype=np.int64)
+
+    n_booked = parts["booked"][0].size
+    n_used = parts["used"][0].size
+    n_started = int(in_window.sum())
+
+    idx = inverse[:n_booked]
+    np.add.at(booked_seconds, idx, parts["booked"][2])
+    pos = n_booked
+
+    idx = inverse[pos:pos + n_used]
+    np.add.at(used_seconds, idx, parts["used"][2])
+    pos += n_used
+
+    idx = inverse[pos:pos + n_started]
+    np.add.at(bookings, idx, 1)
+    np.add.at(no_shows, idx, (status[in_window] == "no_show").astype(np.int64))
+    pos += n_started
+
+    np.maximum.at(peak, inverse[pos:], peak_level)
+
+    return [
+        {
+            "space_id": int(keys[i, 0]),
+            "hour_start": datetime.fromtimestamp(int(keys[i, 1]) * HOUR, tz=timezone.utc),
+            "booked_minutes": int(round(booked_seconds[i] / 60)),
+            "used_minutes": int(round(used_seconds[i] / 60)),
+            "bookings": int(bookings[i]),
+            "no_shows": int(no_shows[i]),
+            "peak_concurrent": int(peak[i]),
+        }
+        for i in range(n_keys)
+    ]
+
+
+def refresh_rollups(db: Session, window_start: datetime, window_end: datetime) -> int:
+    window_start, window_end = floor_hour(window_start), floor_hour(window_end)
+    if window_end <= window_start:
+        return 0
+
+    stmt = select(
+        Booking.space_id,
+        Booking.start_time,
+        Booking.end_time,
+        Booking.status,
+        Booking.check_in_time,
+        Booking.check_out_time,
+    ).where(
+        Booking.start_time < window_end,
+        Booking.end_time > window_start,
+    )
+    rows = db.execute(stmt).all()
+
+    values = compute_rollups(rows, window_start, window_end, datetime.now(timezone.utc))
+
+    db.execute(
+        delete(BookingHourlyRollup).where(
+            BookingHourlyRollup.hour_start >= window_start,
+            BookingHourlyRollup.hour_start < window_end,
+        )
+    )
+    if values:
+        db.execute(insert(BookingHourlyRollup), values)
+    db.commit()
+    return len(values)
+
+
+def refresh_recent_rollups(db: Session) -> int:
+    # Cửa sổ gần đây: status còn thay đổi (no-show, check-out, huỷ)
+    now = datetime.now(timezone.utc)
+    return refresh_rollups(
+        db,
+        now - timedelta(hours=REFRESH_LOOKBACK_HOURS),
+        now + timedelta(hours=1),
+    )
+
+
+def rebuild_rollups(db: Session, start: datetime, end: datetime) -> int:
+    """Backfill theo từng chunk 7 ngày để giới hạn bộ nhớ."""
+    total = 0
+    cursor = floor_hour(start)
+    end = floor_hour(end)
+    while cursor < end:
+        chunk_end = min(cursor + BACKFILL_CHUNK, end)
+        total += refresh_rollups(db, cursor, chunk_end)
+        cursor = chunk_end
+    return total
@@ -0,0 +1,53 @@
+# app/services/auto_complete.py
+"""
+Tự động hoàn tất booking quá giờ mà user quên check-out.
+
+Booking checked_in có end_time + OVERSTAY_GRACE_MINUTES < now -> completed
+(check_out_time = end_time), kèm penalty late_checkout nếu bật. Chạy theo
+chunk giống no-show sweep, dựa trên index ix_bookings_status_end_time.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.models.penalty import PenaltyType
+from app.services import penalty_ledger
+from app.services.booking_policy import policy
+from app.services.booking_sweep import sweep_sql, run_sweep
+from app.services.occupancy import tracker
+
+OVERSTAY_GRACE_MINUTES = 15
+LATE_CHECKOUT_PENALTY = True
+LATE_CHECKOUT_POINTS = 1
+
+_AUTO_COMPLETE_SQL = sweep_sql(
+    due_where="status = 'checked_in' AND end_time < :cutoff",
+    order_by="end_time",
+    set_clause="status = 'completed', check_out_time = b.end_time",
+    penalty_type=PenaltyType.late_checkout.value,
+)
+
+
+def complete_overdue_bookings(db: Session, penalize: bool = LATE_CHECKOUT_PENALTY) -> int:
+    now = datetime.utcnow()
+
+    completed = run_sweep(
+        db,
+        _AUTO_COMPLETE_SQL,
+        {
+            "cutoff": now - timedelta(minutes=OVERSTAY_GRACE_MINUTES),
+            "penalize": penalize,
+            "points": LATE_CHECKOUT_POINTS,
+            "reason": "User did not check out before the booking ended.",
+            "expires_at": penalty_ledger.default_expiry(now),
+        },
+        event_type="checked_out",
+    )
+
+    for space_id, n in Counter(row.space_id for row in completed).items():
+        tracker.decrement(space_id, n)
+    for row in completed:
+        policy.on_finished(row.user_id)
+
+    return len(completed)
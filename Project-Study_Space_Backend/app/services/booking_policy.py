@@ -0,0 +1,220 @@
+# app/services/booking_policy.py
+"""
+Booking admission policy theo role, đánh giá từ counter trong RAM.
+
+Counter mỗi user (số booking active, số phút đã đặt theo tuần ISO) chỉ được
+load từ DB lần đầu gặp user trong worker (hoặc khi quá TTL); sau đó được cập
+nhật trực tiếp bởi các write path của booking -> đường đi phổ biến của
+create_booking không tốn thêm round trip nào. Điểm penalty lấy từ
+users.penalty_count (row user đã được load khi xác thực).
+
+Mỗi worker giữ counter riêng; write ở worker khác chỉ được thấy sau TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+
+ACTIVE_STATUSES = ("pending", "confirmed", "checked_in")
+# Booking được tính vào quota giờ/tuần
+COUNTED_STATUSES = ACTIVE_STATUSES + ("completed",)
+
+COUNTER_TTL_SECONDS = 300
+MAX_CACHED_USERS = 10000
+
+
+@dataclass(frozen=True)
+class RoleRule:
+    max_active_bookings: Optional[int]
+    max_hours_per_week: Optional[float]
+    max_penalty_points: Optional[int]
+
+
+ROLE_RULES: Dict[str, RoleRule] = {
+    "student": RoleRule(max_active_bookings=3, max_hours_per_week=10, max_penalty_points=3),
+    "lecturer": RoleRule(max_active_bookings=10, max_hours_per_week=40, max_penalty_points=5),
+    "admin": RoleRule(max_active_bookings=None, max_hours_per_week=None, max_penalty_points=None),
+}
+DEFAULT_RULE = ROLE_RULES["student"]
+
+
+def _week_key(dt: datetime) -> Tuple[int, int]:
+    iso = dt.isocalendar()
+    return iso[0], iso[1]
+
+
+def _minutes(start: datetime, end: datetime) -> int:
+    return int((end - start).total_seconds() // 60)
+
+
+def _role_name(role) -> str:
+    return getattr(role, "value", role) or "student"
+
+
+class _UserCounters:
+    __slots__ = ("active", "week_minutes", "loaded_at")
+
+    def __init__(self):
+        self.active = 0
+        self.week_minutes: Dict[Tuple[int, int], int] = {}
+        self.loaded_at = time.monotonic()
+
+
+class BookingPolicy:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[int, _UserCounters]" = OrderedDict()
+
+    # ---------------- cache ----------------
+
+    def _load(self, db: Session, user_id: int) -> _UserCounters:
+        now = datetime.now(timezone.utc)
+        week_start = (now - timedelta(days=now.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        stmt = select(Booking.status, Booking.start_time, Booking.end_time).where(
+            Booking.user_id == user_id,
+            or_(
+                Booking.status.in_(ACTIVE_STATUSES),
+                (Booking.status == "completed") & (Booking.start_time >= week_start),
+            ),
+        )
+        counters = _UserCounters()
+        for status, start, end in db.execute(stmt).all():
+            if status in ACTIVE_STATUSES:
+                counters.active += 1
+            if start >= week_start:
+                key = _week_key(start)
+                counters.week_minutes[key] = counters.week_minutes.get(key, 0) + _minutes(start, end)
+        return counters
+
+    def _get(self, db: Session, user_id: int) -> _UserCounters:
+        with self._lock:
+            counters = self._users.get(user_id)
+            if counters is not None and time.monotonic() - counters.loaded_at < COUNTER_TTL_SECONDS:
+                self._users.move_to_end(user_id)
+                return counters
+
+        counters = self._load(db, user_id)
+        with self._lock:
+            self._users[user_id] = counters
+            self._users.move_to_end(user_id)
+            while len(self._users) > MAX_CACHED_USERS:
+                self._users.popitem(last=False)
+        return counters
+
+    def _adjust(self, user_id: int, active: int = 0, start: datetime = None, minutes: int = 0) -> None:
+        with self._lock:
+            counters = self._users.get(user_id)
+            if counters is None:
+                return  # chưa cache -> lần sau load lại từ DB
+            counters.active = max(counters.active + active, 0)
+            if start is not None and minutes:
+                key = _week_key(start)
+                counters.week_minutes[key] = max(counters.week_minutes.get(key, 0) + minutes, 0)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    # ---------------- evaluate ----------------
+
+    def violations(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        role,
+        penalty_points: int,
+        start: datetime,
+        end: datetime,
+        replacing: Optional[Booking] = None,
+    ) -> List[dict]:
+        rule = ROLE_RULES.get(_role_name(role), DEFAULT_RULE)
+        result = []
+
+        if rule.max_penalty_points is not None and penalty_points >= rule.max_penalty_points:
+            result.append({
+                "rule": "max_penalty_points",
+                "limit": rule.max_penalty_points,
+                "current": penalty_points,
+                "message": "Too many active penalty points to make a booking.",
+            })
+
+        if rule.max_active_bookings is None and rule.max_hours_per_week is None:
+            return result
+
+        counters = self._get(db, user_id)
+
+        if replacing is None and rule.max_active_bookings is not None \
+                and counters.active >= rule.max_active_bookings:
+            result.append({
+                "rule": "max_active_bookings",
+                "limit": rule.max_active_bookings,
+                "current": counters.active,
+                "message": f"You can hold at most {rule.max_active_bookings} active bookings.",
+            })
+
+        if rule.max_hours_per_week is not None:
+            key = _week_key(start)
+            used = counters.week_minutes.get(key, 0)
+            if replacing is not None and _week_key(replacing.start_time) == key:
+                used -= _minutes(replacing.start_time, replacing.end_time)
+            requested = _minutes(start, end)
+            limit = int(rule.max_hours_per_week * 60)
+            if used + requested > limit:
+                result.append({
+                    "rule": "max_hours_per_week",
+                    "limit": rule.max_hours_per_week,
+                    "current": round(used / 60, 2),
+                    "requested": round(requested / 60, 2),
+                    "message": f"Weekly booking limit of {rule.max_hours_per_week}h exceeded.",
+                })
+
+        return result
+
+    def check(self, db: Session, **kwargs) -> None:
+        violations = self.violations(db, **kwargs)
+        if violations:
+            raise HTTPException(
+                409,
+                {"message": "Booking rejected by policy.", "violations": violations},
+            )
+
+    # ---------------- write hooks (gọi sau commit) ----------------
+
+    def on_created(self, booking: Booking) -> None:
+        self._adjust(
+            booking.user_id, active=1,
+            start=booking.start_time, minutes=_minutes(booking.start_time, booking.end_time),
+        )
+
+    def on_rescheduled(self, user_id: int, old: Tuple[datetime, datetime], booking: Booking) -> None:
+        self._adjust(user_id, start=old[0], minutes=-_minutes(*old))
+        self._adjust(
+            user_id, start=booking.start_time,
+            minutes=_minutes(booking.start_time, booking.end_time),
+        )
+
+    def on_cancelled(self, user_id: int, status: str, start: datetime, end: datetime) -> None:
+        if status in ACTIVE_STATUSES:
+            self._adjust(user_id, active=-1, start=start, minutes=-_minutes(start, end))
+
+    def on_finished(self, user_id: int, start: datetime = None, end: datetime = None,
+                    no_show: bool = False) -> None:
+        # completed: giờ vẫn tính vào quota; no_show: trả lại giờ
+        if no_show and start is not None:
+            self._adjust(user_id, active=-1, start=start, minutes=-_minutes(start, end))
+        else:
+            self._adjust(user_id, active=-1)
+
+
+policy = BookingPolicy()
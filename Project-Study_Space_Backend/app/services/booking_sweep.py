@@ -0,0 +1,75 @@
+# app/services/booking_sweep.py
+"""
+Khung chung cho các job quét booking set-based (no-show, auto-complete).
+
+Mỗi chunk là 1 câu SQL duy nhất:
+  due    : chọn tối đa :batch_size booking theo index (status, thời gian),
+           FOR UPDATE SKIP LOCKED để nhiều worker chạy song song không đụng nhau
+  moved  : UPDATE trạng thái, RETURNING booking
+  pen    : INSERT penalty hàng loạt (ON CONFLICT DO NOTHING nhờ
+           uq_penalties_booking_type -> chạy lại không tạo trùng)
+  usr    : cộng điểm vào users.penalty_count theo user
+rồi pg_notify + change_log + commit cho từng chunk.
+"""
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.change_log import record_changes
+from app.services.events import notify_booking_events
+
+SWEEP_BATCH_SIZE = 500
+
+
+def sweep_sql(due_where: str, order_by: str, set_clause: str, penalty_type: str) -> text:
+    return text(f"""
+WITH due AS (
+    SELECT id FROM bookings
+    WHERE {due_where}
+    ORDER BY {order_by}
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+),
+moved AS (
+    UPDATE bookings b SET {set_clause}, updated_at = now(), version = b.version + 1
+    FROM due
+    WHERE b.id = due.id
+    RETURNING b.id, b.user_id, b.space_id, b.start_time, b.end_time, b.status
+),
+pen AS (
+    INSERT INTO penalties (user_id, booking_id, penalty_type, points, reason, expires_at, expired, created_at)
+    SELECT moved.user_id, moved.id, '{penalty_type}', :points, :reason, :expires_at, FALSE, now()
+    FROM moved
+    WHERE :penalize
+    ON CONFLICT DO NOTHING
+    RETURNING user_id, points
+),
+usr AS (
+    UPDATE users u SET penalty_count = u.penalty_count + p.points
+    FROM (SELECT user_id, SUM(points) AS points FROM pen GROUP BY user_id) p
+    WHERE u.id = p.user_id
+    RETURNING u.id
+)
+SELECT id, user_id, space_id, start_time, end_time, status FROM moved
+""")
+
+
+def run_sweep(db: Session, statement, params: dict, event_type: str,
+              batch_size: int = SWEEP_BATCH_SIZE,
+              before_commit: Optional[Callable[[List], None]] = None) -> List:
+    """
+    Chạy từng chunk cho tới khi hết; trả về toàn bộ booking đã chuyển trạng thái.
+    before_commit(rows) chạy trong transaction của chunk (vd. promote waitlist).
+    """
+    moved = []
+    while True:
+        rows = db.execute(statement, {**params, "batch_size": batch_size}).all()
+        notify_booking_events(db, [(event_type, row) for row in rows])
+        record_changes(db, "booking", [(row.id, row.user_id) for row in rows])
+        if before_commit is not None:
+            before_commit(rows)
+        db.commit()
+        moved.extend(rows)
+        if len(rows) < batch_size:
+            return moved
@@ -0,0 +1,78 @@
+# app/services/change_log.py
+"""
+Ghi change_log cho mọi write qua ORM (after_flush), phục vụ delta-sync.
+
+Các câu UPDATE/DELETE set-based (không đi qua unit of work) phải tự gọi
+record_changes() trong cùng transaction.
+"""
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+from app.models.change_log import ChangeLog
+from app.models.penalty import Penalty
+from app.models.space import Space
+from app.models.utility import Utility
+
+TRACKED = {
+    Booking: "booking",
+    Space: "space",
+    Utility: "utility",
+    Penalty: "penalty",
+}
+
+
+def _owner_id(obj) -> Optional[int]:
+    return getattr(obj, "user_id", None) if isinstance(obj, (Booking, Penalty)) else None
+
+
+def _op_for(obj, deleted: bool) -> str:
+    if deleted:
+        return "delete"
+    # Space bị soft delete -> tombstone với client
+    if isinstance(obj, Space) and obj.is_active is False:
+        return "delete"
+    return "upsert"
+
+
+def record_changes(
+    db: Session,
+    entity_type: str,
+    rows: Iterable[Tuple[int, Optional[int]]],
+    op: str = "upsert",
+) -> None:
+    """rows: (entity_id, user_id) cho các write set-based."""
+    values = [
+        {"entity_type": entity_type, "entity_id": entity_id, "op": op, "user_id": user_id}
+        for entity_id, user_id in rows
+    ]
+    if values:
+        db.execute(insert(ChangeLog), values)
+
+
+@event.listens_for(Session, "after_flush")
+def _log_flushed_changes(session: Session, flush_context) -> None:
+    values = []
+
+    def collect(objs, deleted: bool = False, only_modified: bool = False):
+        for obj in objs:
+            entity_type = TRACKED.get(type(obj))
+            if entity_type is None:
+                continue
+            if only_modified and not session.is_modified(obj, include_collections=False):
+                continue
+            values.append({
+                "entity_type": entity_type,
+                "entity_id": obj.id,
+                "op": _op_for(obj, deleted),
+                "user_id": _owner_id(obj),
+            })
+
+    collect(session.new)
+    collect(session.dirty, only_modified=True)
+    collect(session.deleted, deleted=True)
+
+    if values:
+        session.connection().execute(insert(ChangeLog), values)
@@ -0,0 +1,130 @@
+# app/services/checkin_pipeline.py
+"""
+Gộp check-in/check-out thành micro-batch.
+
+Request handler (chạy trong threadpool) gọi submit() và chờ kết quả của
+chính nó; 1 thread nền gom các yêu cầu trong tối đa MAX_WAIT_MS hoặc
+MAX_BATCH_SIZE item rồi ghi bằng 1 câu UPDATE nhiều dòng + 1 commit
+(crud.booking.apply_transitions). Lúc cao điểm đầu giờ, hàng trăm check-in
+chỉ tốn vài commit thay vì mỗi request 1 commit + 1 refresh.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.database import SessionLocal
+from app.crud.booking import apply_transitions
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 200
+MAX_WAIT_MS = 5
+RESULT_TIMEOUT_SECONDS = 10
+
+_Item = Tuple[int, int, str, Future]
+
+
+class CheckInPipeline:
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[_Item]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="checkin-pipeline", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, booking_id: int, user_id: int, op: str) -> dict:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((booking_id, user_id, op, future))
+        try:
+            result = future.result(timeout=RESULT_TIMEOUT_SECONDS)
+        except FutureTimeout:
+            # Chưa vào batch nào thì huỷ luôn; đã đang ghi thì client thử lại
+            # sẽ nhận 409 nếu lần này thực ra đã thành công
+            future.cancel()
+            raise HTTPException(503, "Check-in is busy, please retry.", headers={"Retry-After": "1"})
+        if isinstance(result, HTTPException):
+            raise result
+        return result
+
+    def check_in(self, booking_id: int, user_id: int) -> dict:
+        return self.submit(booking_id, user_id, "check_in")
+
+    def check_out(self, booking_id: int, user_id: int) -> dict:
+        return self.submit(booking_id, user_id, "check_out")
+
+    # ---------------- worker ----------------
+
+    def _collect(self, batch: List[_Item]) -> List[_Item]:
+        if not batch:
+            batch = [self._queue.get()]
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        carry: List[_Item] = []
+        while True:
+            batch = self._collect(carry)
+            carry = []
+
+            # Mỗi booking chỉ 1 lần / batch; lần lặp lại để batch sau
+            seen, current = set(), []
+            for item in batch:
+                if item[0] in seen:
+                    carry.append(item)
+                else:
+                    seen.add(item[0])
+                    current.append(item)
+
+            self._flush(current)
+
+    def _flush(self, batch: List[_Item]) -> None:
+        # Bỏ item mà request đã timeout + huỷ; còn lại không huỷ được nữa
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        db = None
+        try:
+            db = self._session_factory()
+            results = apply_transitions(db, [(b, u, op) for b, u, op, _ in batch])
+            for booking_id, _, _, future in batch:
+                future.set_result(results[booking_id])
+            self.batches += 1
+            self.items += len(batch)
+        except Exception as exc:
+            if db is not None:
+                db.rollback()
+            logger.exception("check-in batch of %d failed", len(batch))
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            if db is not None:
+                db.close()
+
+
+pipeline = CheckInPipeline()
@@ -0,0 +1,167 @@
+# app/services/events.py
+"""
+Realtime booking events.
+
+Luồng dữ liệu:
+  crud.booking (write path) --pg_notify--> Postgres --LISTEN--> mỗi worker
+  --> EventBus (in-process) --> các subscriber SSE theo space_id.
+
+NOTIFY được gửi trong cùng transaction với write nên chỉ tới tay listener
+khi commit thành công, và mọi worker (kể cả worker đã ghi) đều nhận qua
+cùng một đường LISTEN -> không bị trùng event.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "booking_events"
+
+# Mỗi subscriber giữ tối đa chừng này event chưa gửi. Client chậm hơn thế sẽ
+# bị xoá hàng đợi và nhận 1 event "resync" để tự tải lại dữ liệu.
+MAX_PENDING_EVENTS = 64
+
+
+# ======================================================
+# WRITE SIDE (gọi từ crud, trước commit)
+# ======================================================
+
+def _payload(event_type: str, booking) -> str:
+    return json.dumps({
+        "type": event_type,
+        "booking_id": booking.id,
+        "space_id": booking.space_id,
+        "status": booking.status,
+        "start_time": booking.start_time.isoformat() if booking.start_time else None,
+        "end_time": booking.end_time.isoformat() if booking.end_time else None,
+    })
+
+
+def notify_booking_event(db: Session, event_type: str, booking) -> None:
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": _payload(event_type, booking)},
+    )
+
+
+def notify_booking_events(db: Session, events: Iterable[Tuple[str, object]]) -> None:
+    """Nhiều event trong 1 round trip (write path set-based)."""
+    payloads = [_payload(event_type, booking) for event_type, booking in events]
+    if payloads:
+        db.execute(
+            text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) AS p"),
+            {"channel": CHANNEL, "payloads": payloads},
+        )
+
+
+# ======================================================
+# IN-PROCESS PUB/SUB
+# ======================================================
+
+class Subscription:
+    __slots__ = ("space_ids", "queue")
+
+    def __init__(self, space_ids: Iterable[int]):
+        self.space_ids = frozenset(space_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+
+    def push(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Backpressure: bỏ toàn bộ backlog thay vì để RAM phình theo client chậm
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "space_ids": sorted(self.space_ids)})
+
+
+class EventBus:
+    """Chỉ được dùng trên event loop của worker (không thread-safe)."""
+
+    def __init__(self):
+        self._by_space: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, space_ids: Iterable[int]) -> Subscription:
+        sub = Subscription(space_ids)
+        for space_id in sub.space_ids:
+            self._by_space.setdefault(space_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for space_id in sub.space_ids:
+            subs = self._by_space.get(space_id)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._by_space[space_id]
+
+    def dispatch(self, event: dict) -> None:
+        for sub in self._by_space.get(event.get("space_id"), ()):
+            sub.push(event)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({sub for subs in self._by_space.values() for sub in subs})
+
+
+bus = EventBus()
+
+
+# ======================================================
+# LISTEN/NOTIFY -> BUS (1 thread / worker)
+# ======================================================
+
+_stop = threading.Event()
+_listener: Optional[threading.Thread] = None
+
+
+def _listen_forever(loop: asyncio.AbstractEventLoop) -> None:
+    while not _stop.is_set():
+        conn = None
+        try:
+            raw = engine.raw_connection()
+            raw.detach()
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+
+            while not _stop.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    event = json.loads(notification.payload)
+                    loop.call_soon_threadsafe(bus.dispatch, event)
+        except Exception:
+            logger.exception("booking event listener failed, reconnecting")
+            time.sleep(1)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def start_listener(loop: asyncio.AbstractEventLoop) -> None:
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    _stop.clear()
+    _listener = threading.Thread(
+        target=_listen_forever, args=(loop,), name="booking-events", daemon=True
+    )
+    _listener.start()
+
+
+def stop_listener() -> None:
+    _stop.set()
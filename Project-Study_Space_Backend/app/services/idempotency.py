@@ -0,0 +1,202 @@
+# app/services/idempotency.py
+"""
+Idempotency-Key cho các endpoint tạo mới (POST /bookings, POST /penalties, ...).
+
+  1. Tra LRU trong RAM (giới hạn MAX_CACHED_RESPONSES, TTL) -> replay ngay,
+     không chạm DB.
+  2. Chưa có: INSERT ... ON CONFLICT DO NOTHING vào idempotency_records để
+     "giữ" key (dùng chung giữa các worker).
+       - giữ được  -> chạy handler, lưu status + body, commit
+       - đã tồn tại -> replay kết quả đã lưu, hoặc 409 nếu request đầu còn chạy
+       - chưa có kết quả sau STALE_CLAIM (worker chết trước khi commit) ->
+         request này nhận lại key và chạy lại
+  3. Cùng key nhưng body khác -> 422.
+
+Dữ liệu handler ghi và kết quả lưu vào idempotency_records nằm trong CÙNG
+1 transaction: handler nhận session gắn vào connection đang mở transaction
+(join_transaction_mode="rollback_only"), db.commit() bên trong handler chỉ
+flush, commit thật 1 lần sau khi ghi kết quả. Key chưa có kết quả vì thế
+chắc chắn chưa ghi gì -> chạy lại sau STALE_CLAIM là an toàn.
+
+Lỗi 4xx (HTTPException) được lưu và replay như kết quả thường; lỗi bất ngờ
+thì nhả key để client retry được.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.idempotency import IdempotencyRecord
+
+RECORD_TTL = timedelta(hours=24)
+CACHE_TTL_SECONDS = 600
+MAX_CACHED_RESPONSES = 10000
+MAX_KEY_LENGTH = 200
+# Lâu hơn mọi handler tạo mới; sau đó key chưa có kết quả coi như bị bỏ rơi
+STALE_CLAIM = timedelta(seconds=60)
+
+
+class ResponseCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tuple[float, str, int, object]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[str, int, object]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] >= CACHE_TTL_SECONDS:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1:]
+
+    def put(self, key: str, fingerprint: str, status_code: int, body) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic(), fingerprint, status_code, body)
+            self._items.move_to_end(key)
+            while len(self._items) > MAX_CACHED_RESPONSES:
+                self._items.popitem(last=False)
+
+
+cache = ResponseCache()
+
+
+def _fingerprint(payload: Optional[BaseModel]) -> str:
+    raw = payload.model_dump_json() if payload is not None else ""
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _replay(fingerprint: str, stored_fingerprint: str, status_code: int, body) -> JSONResponse:
+    if fingerprint != stored_fingerprint:
+        raise HTTPException(422, "Idempotency-Key was already used with a different request body.")
+    return JSONResponse(body, status_code=status_code)
+
+
+def run_idempotent(
+    db: Session,
+    idempotency_key: Optional[str],
+    *,
+    user_id: int,
+    route: str,
+    payload: Optional[BaseModel],
+    handler: Callable[[Session], object],
+    response_model: Type[BaseModel],
+    status_code: int = 200,
+):
+    """handler(session) làm việc tạo mới trên session được truyền vào."""
+    if idempotency_key is None:
+        return handler(db)
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(400, "Invalid Idempotency-Key header.")
+
+    key = f"{user_id}:{route}:{idempotency_key}"
+    fingerprint = _fingerprint(payload)
+
+    cached = cache.get(key)
+    if cached is not None:
+        return _replay(fingerprint, *cached)
+
+    stmt = insert(IdempotencyRecord).values(
+        key=key,
+        fingerprint=fingerprint,
+        expires_at=datetime.now(timezone.utc) + RECORD_TTL,
+    )
+    claimed = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"claimed_at": func.now(), "expires_at": stmt.excluded.expires_at},
+            # chỉ giành lại key bị bỏ rơi của cùng request
+            where=(
+                IdempotencyRecord.status_code.is_(None)
+                & (IdempotencyRecord.fingerprint == fingerprint)
+                & (IdempotencyRecord.claimed_at < func.now() - STALE_CLAIM)
+            ),
+        )
+        .returning(IdempotencyRecord.key)
+    ).first()
+    db.commit()
+
+    if claimed is None:
+        stored = db.execute(
+            select(
+                IdempotencyRecord.fingerprint,
+                IdempotencyRecord.status_code,
+                IdempotencyRecord.response,
+            ).where(IdempotencyRecord.key == key)
+        ).first()
+        if stored is not None and stored.fingerprint != fingerprint:
+            raise HTTPException(422, "Idempotency-Key was already used with a different request body.")
+        if stored is None or stored.status_code is None:
+            raise HTTPException(
+                409,
+                "A request with this Idempotency-Key is still in progress.",
+                headers={"Retry-After": "1"},
+            )
+        cache.put(key, stored.fingerprint, stored.status_code, stored.response)
+        return _replay(fingerprint, stored.fingerprint, stored.status_code, stored.response)
+
+    with db.get_bind().connect() as conn:
+        outer = conn.begin()
+        tx = SessionLocal(bind=conn, join_transaction_mode="rollback_only")
+        tx.info.update(db.info)
+        try:
+            result = handler(tx)
+            code = status_code
+            body = jsonable_encoder(response_model.model_validate(result))
+            conn.execute(_store_result(key, code, body))
+            outer.commit()
+        except HTTPException as exc:
+            if outer.is_active:
+                outer.rollback()
+            if exc.status_code >= 500:
+                _release(db, key)
+                raise
+            # Lỗi nghiệp vụ: không ghi gì, chỉ lưu lỗi để replay
+            code, body = exc.status_code, {"detail": exc.detail}
+            db.execute(_store_result(key, code, body))
+            db.commit()
+        except Exception:
+            if outer.is_active:
+                outer.rollback()
+            _release(db, key)
+            raise
+        finally:
+            tx.close()
+
+    cache.put(key, fingerprint, code, body)
+    return JSONResponse(body, status_code=code)
+
+
+def _store_result(key: str, code: int, body):
+    return (
+        update(IdempotencyRecord)
+        .where(IdempotencyRecord.key == key)
+        .values(status_code=code, response=body)
+    )
+
+
+def _release(db: Session, key: str) -> None:
+    db.rollback()
+    db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+    db.commit()
+
+
+def purge_expired_records(db: Session) -> int:
+    result = db.execute(
+        delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.now(timezone.utc))
+    )
+    db.commit()
+    return result.rowcount
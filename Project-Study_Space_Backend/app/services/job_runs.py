@@ -0,0 +1,28 @@
+# app/services/job_runs.py
+"""
+Cho job scheduler chạy 1 lần / interval trên toàn cụm thay vì 1 lần /
+worker. claim() dời last_run_at trong transaction của chính job: worker thứ
+2 chờ row lock, thấy lượt đã được nhận thì bỏ qua; job lỗi rollback thì
+lượt được trả lại cho worker khác.
+"""
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.job_run import JobRun
+
+# Các worker khởi động lệch nhau vài giây: chừa slack để không lỡ lượt
+CLAIM_SLACK = timedelta(seconds=30)
+
+
+def claim(db: Session, name: str, every: timedelta) -> bool:
+    """True nếu worker này nhận lượt chạy `name` (chưa commit)."""
+    stmt = pg_insert(JobRun).values(name=name, last_run_at=func.now())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[JobRun.name],
+        set_={"last_run_at": func.now()},
+        where=JobRun.last_run_at < func.now() - (every - CLAIM_SLACK),
+    ).returning(JobRun.name)
+    return db.execute(stmt).first() is not None
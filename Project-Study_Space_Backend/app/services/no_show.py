@@ -1,48 +1,50 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from app.models.booking import Booking
-from app.models.user import User
-from app.models.penalty import Penalty, PenaltyType
+from app.models.penalty import PenaltyType
+from app.services import penalty_ledger
+from app.services.booking_policy import policy
+from app.services.booking_sweep import sweep_sql, run_sweep
 
 GRACE_PERIOD_MINUTES = 15
 
+# Dùng index ix_bookings_status_start_time
+_NO_SHOW_SQL = sweep_sql(
+    due_where="status IN ('pending', 'confirmed') AND start_time < :cutoff",
+    order_by="start_time",
+    set_clause="status = 'no_show'",
+    penalty_type=PenaltyType.no_show.value,
+)
+
 
 def process_no_show_bookings(db: Session):
-    now = datetime.utcnow()
+    # import trong hàm: crud.booking import GRACE_PERIOD_MINUTES từ module này
+    from app.crud.booking import promote_waiters, on_promoted
 
-    # Lấy tất cả booking quá hạn check-in
-    overdue = db.query(Booking).filter(
-        Booking.status.in_(["pending", "confirmed"]),
-        Booking.start_time + timedelta(minutes=GRACE_PERIOD_MINUTES) < now
-    ).all()
-
-    for booking in overdue:
-        # Nếu đã bị xử lý no-show → bỏ qua
-        existing_penalty = db.query(Penalty).filter(
-            Penalty.booking_id == booking.id,
-            Penalty.type == PenaltyType.no_show,
-        ).first()
-
-        if existing_penalty:
-            continue
-
-        # 1) Cập nhật trạng thái booking
-        booking.status = "no_show"
-
-        # 2) Tạo penalty
-        penalty = Penalty(
-            user_id=booking.user_id,
-            booking_id=booking.id,
-            type=PenaltyType.no_show,
-            reason="User did not check in on time."
-        )
-        db.add(penalty)
-
-        # 3) Tăng penalty_count
-        user = db.query(User).filter(User.id == booking.user_id).first()
-        if user:
-            user.penalty_count += 1
-
-    db.commit()
-
-    return len(overdue)
+    now = datetime.utcnow()
+    promoted = []
+
+    def promote(rows):
+        # chỗ của booking no-show trống -> người chờ lên lượt trong cùng transaction
+        for row in rows:
+            promoted.extend(promote_waiters(db, row.space_id, row.start_time, row.end_time))
+
+    # Booking quá hạn check-in -> no_show + penalty, theo chunk
+    marked = run_sweep(
+        db,
+        _NO_SHOW_SQL,
+        {
+            "cutoff": now - timedelta(minutes=GRACE_PERIOD_MINUTES),
+            "penalize": True,
+            "points": 1,
+            "reason": "User did not check in on time.",
+            "expires_at": penalty_ledger.default_expiry(now),
+        },
+        event_type="no_show",
+        before_commit=promote,
+    )
+
+    for row in marked:
+        policy.on_finished(row.user_id, row.start_time, row.end_time, no_show=True)
+    on_promoted(promoted)
+
+    return len(marked)
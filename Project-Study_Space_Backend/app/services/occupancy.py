@@ -0,0 +1,76 @@
+# app/services/occupancy.py
+"""
+Bộ đếm occupancy (số booking đang checked_in) theo từng space, giữ trong RAM.
+
+- crud.booking.check_in / check_out (và các job tự động) cập nhật counter
+  sau khi commit thành công.
+- reconcile() chạy định kỳ trong scheduler, đọc lại từ DB bằng 1 câu
+  GROUP BY để sửa lệch (nhiều worker, restart, job chạy ở process khác).
+"""
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.booking import Booking
+from app.models.space import Space
+
+
+class OccupancyTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._occupied: Dict[int, int] = {}
+        self._capacity: Dict[int, int] = {}
+        self.reconciled_at: Optional[datetime] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.reconciled_at is not None
+
+    def increment(self, space_id: int, n: int = 1) -> None:
+        with self._lock:
+            self._occupied[space_id] = self._occupied.get(space_id, 0) + n
+
+    def decrement(self, space_id: int, n: int = 1) -> None:
+        with self._lock:
+            self._occupied[space_id] = max(self._occupied.get(space_id, 0) - n, 0)
+
+    def reconcile(self, db: Session) -> None:
+        checked_in = (
+            select(Booking.space_id, func.count().label("occupied"))
+            .where(Booking.status == "checked_in")
+            .group_by(Booking.space_id)
+            .subquery()
+        )
+        stmt = (
+            select(Space.id, Space.capacity, func.coalesce(checked_in.c.occupied, 0))
+            .outerjoin(checked_in, checked_in.c.space_id == Space.id)
+            .where(Space.is_active.is_(True))
+        )
+        rows = db.execute(stmt).all()
+
+        with self._lock:
+            self._capacity = {space_id: capacity for space_id, capacity, _ in rows}
+            self._occupied = {space_id: occupied for space_id, _, occupied in rows}
+            self.reconciled_at = datetime.utcnow()
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            space_ids = sorted(set(self._capacity) | set(self._occupied))
+            return [
+                {
+                    "space_id": space_id,
+                    "occupied": self._occupied.get(space_id, 0),
+                    "capacity": self._capacity.get(space_id),
+                }
+                for space_id in space_ids
+            ]
+
+
+tracker = OccupancyTracker()
+
+
+def reconcile_occupancy(db: Session) -> None:
+    tracker.reconcile(db)
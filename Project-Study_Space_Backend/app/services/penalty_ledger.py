@@ -0,0 +1,98 @@
+# app/services/penalty_ledger.py
+"""
+Penalty ledger.
+
+- penalties là sổ cái; dòng còn hiệu lực = expired IS FALSE (partial index
+  ix_penalties_active_user trên (user_id, expires_at)).
+- users.penalty_count là điểm active được cache, chỉ thay đổi bằng UPDATE
+  cộng/trừ nguyên tử (không đọc-sửa-ghi trong Python).
+- expire_penalties() quét theo batch các penalty đã hết hạn, đánh dấu expired
+  và trừ điểm của user trong cùng 1 câu lệnh.
+- reconcile_penalty_counts() tính lại cache từ sổ cái (sửa lệch).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, func, text
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+
+# Penalty tự hết hạn sau số ngày này (cửa sổ tính điểm active)
+PENALTY_WINDOW_DAYS = 30
+EXPIRE_BATCH_SIZE = 1000
+
+
+def default_expiry(now: datetime = None) -> datetime:
+    return (now or datetime.utcnow()) + timedelta(days=PENALTY_WINDOW_DAYS)
+
+
+def add_points(db: Session, user_id: int, points: int) -> None:
+    """Cộng (hoặc trừ nếu points < 0) vào cache, không bao giờ xuống dưới 0."""
+    if not points:
+        return
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(penalty_count=func.greatest(User.penalty_count + points, 0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+_EXPIRE_BATCH_SQL = text("""
+WITH due AS (
+    SELECT id FROM penalties
+    WHERE expired IS FALSE AND expires_at <= now()
+    ORDER BY expires_at
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+),
+expired AS (
+    UPDATE penalties p SET expired = TRUE, version = p.version + 1
+    FROM due
+    WHERE p.id = due.id
+    RETURNING p.user_id, p.points
+),
+per_user AS (
+    SELECT user_id, SUM(points) AS points, COUNT(*) AS n
+    FROM expired
+    GROUP BY user_id
+),
+adjusted AS (
+    UPDATE users u SET penalty_count = GREATEST(u.penalty_count - per_user.points, 0)
+    FROM per_user
+    WHERE u.id = per_user.user_id
+    RETURNING u.id
+)
+SELECT COALESCE(SUM(n), 0) FROM per_user
+""")
+
+
+def expire_penalties(db: Session, batch_size: int = EXPIRE_BATCH_SIZE) -> int:
+    total = 0
+    while True:
+        expired = db.execute(_EXPIRE_BATCH_SQL, {"batch_size": batch_size}).scalar_one()
+        db.commit()
+        total += expired
+        if expired < batch_size:
+            return total
+
+
+_RECONCILE_SQL = text("""
+UPDATE users u
+SET penalty_count = COALESCE(active.points, 0)
+FROM users u2
+LEFT JOIN (
+    SELECT user_id, SUM(points) AS points
+    FROM penalties
+    WHERE expired IS FALSE
+    GROUP BY user_id
+) active ON active.user_id = u2.id
+WHERE u.id = u2.id
+  AND u.penalty_count IS DISTINCT FROM COALESCE(active.points, 0)
+""")
+
+
+def reconcile_penalty_counts(db: Session) -> int:
+    result = db.execute(_RECONCILE_SQL)
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,214 @@
+# app/services/purge.py
+"""
+Xoá cứng user / space mà không load cây con vào RAM.
+
+- Ít dòng con (<= PURGE_INLINE_ROWS): xoá ngay trong request, 1 transaction.
+- Nhiều hơn: entity bị tắt (is_active = FALSE) ngay, rồi tạo PurgeJob;
+  scheduler xoá dần các bảng con lớn, mỗi chunk PURGE_BATCH_SIZE dòng +
+  1 commit (không giữ lock / WAL lớn), cập nhật tiến độ trên job.
+
+Mỗi chunk: khoá dòng job (SKIP LOCKED, nhiều worker không đụng nhau) ->
+DELETE ... RETURNING -> tombstone change_log / trừ histogram rating ->
+cộng deleted -> commit. Hết bảng con thì xoá dòng cha, các bảng nhỏ còn
+lại (hold, waitlist, rules, ...) do ON DELETE CASCADE.
+"""
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import Table, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.crud.constraints import commit_or_conflict
+from app.models.booking import Booking
+from app.models.penalty import Penalty
+from app.models.purge import PurgeJob
+from app.models.rating import Rating, SpaceRatingBucket
+from app.models.space import Space
+from app.models.user import User
+from app.services.booking_policy import policy
+from app.services.change_log import record_changes
+from app.services.space_calendar import calendar
+from app.services.space_index import index as space_index
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 2000
+PURGE_INLINE_ROWS = 2000
+# Mỗi lần scheduler chạy tối đa chừng này giây rồi nhường lượt sau
+PURGE_TIME_BUDGET_SECONDS = 20
+
+ACTIVE_STATUSES = ("pending", "running")
+
+_PARENTS = {"user": User.__table__, "space": Space.__table__}
+
+# Bảng con lớn theo thứ tự xoá (penalties trước bookings: khỏi SET NULL thừa)
+_CHILDREN = {
+    "user": (
+        (Penalty.__table__, "user_id"),
+        (Rating.__table__, "user_id"),
+        (Booking.__table__, "user_id"),
+    ),
+    "space": (
+        (Rating.__table__, "space_id"),
+        (Booking.__table__, "space_id"),
+    ),
+}
+
+_TOMBSTONES = {"bookings": "booking", "penalties": "penalty"}
+
+
+def count_children(db: Session, entity_type: str, entity_id: int) -> int:
+    counts = [
+        select(func.count()).where(table.c[column] == entity_id).scalar_subquery()
+        for table, column in _CHILDREN[entity_type]
+    ]
+    return sum(db.execute(select(*counts)).one())
+
+
+def _delete_chunk(db: Session, table: Table, column: str, entity_id: int,
+                  batch_size: Optional[int]) -> List:
+    doomed = select(table.c.id).where(table.c[column] == entity_id)
+    if batch_size is not None:
+        doomed = doomed.limit(batch_size)
+
+    returning = [table.c.id, table.c.user_id]
+    if table is Rating.__table__:
+        returning += [table.c.space_id, table.c.score]
+    rows = db.execute(
+        delete(table).where(table.c.id.in_(doomed.scalar_subquery())).returning(*returning)
+    ).all()
+    if not rows:
+        return rows
+
+    entity = _TOMBSTONES.get(table.name)
+    if entity is not None:
+        record_changes(db, entity, [(row.id, row.user_id) for row in rows], op="delete")
+
+    if table is Rating.__table__:
+        # Histogram rating: trừ gộp theo (space, score) vào shard 0
+        per_bucket = Counter((row.space_id, row.score) for row in rows)
+        stmt = pg_insert(SpaceRatingBucket).values([
+            {"space_id": space_id, "score": score, "shard": 0, "count": -n}
+            for (space_id, score), n in per_bucket.items()
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[SpaceRatingBucket.space_id, SpaceRatingBucket.score, SpaceRatingBucket.shard],
+            set_={"count": SpaceRatingBucket.count + stmt.excluded.count},
+        ))
+    return rows
+
+
+def _delete_parent(db: Session, entity_type: str, entity_id: int) -> None:
+    parent = _PARENTS[entity_type]
+    db.execute(delete(parent).where(parent.c.id == entity_id))
+
+
+def _invalidate(entity_type: str, entity_id: int) -> None:
+    if entity_type == "user":
+        policy.invalidate(entity_id)
+    else:
+        calendar.invalidate(entity_id)
+        space_index.invalidate()
+
+
+def purge_or_enqueue(
+    db: Session,
+    entity_type: str,
+    entity_id: int,
+    requested_by: Optional[int] = None,
+) -> Optional[PurgeJob]:
+    """
+    Xoá ngay nếu nhỏ (trả về None), ngược lại tắt entity + tạo PurgeJob.
+    Caller đã kiểm tra nghiệp vụ (booking đang hoạt động, quyền, ...).
+    """
+    total = count_children(db, entity_type, entity_id)
+
+    if total <= PURGE_INLINE_ROWS:
+        for table, column in _CHILDREN[entity_type]:
+            _delete_chunk(db, table, column, entity_id, batch_size=None)
+        _delete_parent(db, entity_type, entity_id)
+        commit_or_conflict(db)
+        _invalidate(entity_type, entity_id)
+        return None
+
+    parent = _PARENTS[entity_type]
+    db.execute(
+        update(parent)
+        .where(parent.c.id == entity_id)
+        .values(is_active=False, version=parent.c.version + 1)
+    )
+    job = PurgeJob(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        requested_by=requested_by,
+        total=total,
+    )
+    db.add(job)
+    commit_or_conflict(db, {"uq_purge_jobs_active": "A purge is already in progress for this entity."})
+    _invalidate(entity_type, entity_id)
+    return job
+
+
+def _step(db: Session, job: PurgeJob) -> int:
+    """1 chunk của job (job đã bị khoá FOR UPDATE); trả về số dòng đã xoá."""
+    for table, column in _CHILDREN[job.entity_type]:
+        rows = _delete_chunk(db, table, column, job.entity_id, PURGE_BATCH_SIZE)
+        if rows:
+            job.status = "running"
+            job.deleted += len(rows)
+            db.commit()
+            logger.info(
+                "purge %s %s: %d/%d rows (%s)",
+                job.entity_type, job.entity_id, job.deleted, job.total, table.name,
+            )
+            return len(rows)
+
+    _delete_parent(db, job.entity_type, job.entity_id)
+    job.status = "done"
+    job.finished_at = datetime.now(timezone.utc)
+    db.commit()
+    _invalidate(job.entity_type, job.entity_id)
+    logger.info("purge %s %s: done, %d rows", job.entity_type, job.entity_id, job.deleted)
+    return 0
+
+
+def run_purge_jobs(db: Session, time_budget: float = PURGE_TIME_BUDGET_SECONDS) -> int:
+    """Chạy các job đang chờ tới khi hết việc hoặc hết time budget; trả về số dòng đã xoá."""
+    deadline = time.monotonic() + time_budget
+    deleted = 0
+    while time.monotonic() < deadline:
+        job = db.execute(
+            select(PurgeJob)
+            .where(PurgeJob.status.in_(ACTIVE_STATUSES))
+            .order_by(PurgeJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalars().first()
+        if job is None:
+            break
+
+        job_id = job.id
+        try:
+            deleted += _step(db, job)
+        except Exception as exc:
+            db.rollback()
+            logger.exception("purge job %s failed", job_id)
+            db.execute(
+                update(PurgeJob)
+                .where(PurgeJob.id == job_id)
+                .values(status="failed", error=str(exc)[:1000], finished_at=func.now())
+            )
+            db.commit()
+    return deleted
+
+
+def list_jobs(db: Session, limit: int = 50) -> List[PurgeJob]:
+    return db.execute(select(PurgeJob).order_by(PurgeJob.id.desc()).limit(limit)).scalars().all()
+
+
+def get_job(db: Session, job_id: int) -> Optional[PurgeJob]:
+    return db.get(PurgeJob, job_id)
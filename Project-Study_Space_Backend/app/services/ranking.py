@@ -0,0 +1,70 @@
+# app/services/ranking.py
+"""
+Điểm xếp hạng precompute cho GET /spaces?sort=rating|popularity.
+
+- rating_score: Bayesian average = (C * m + tổng điểm) / (C + số rating),
+  m = điểm trung bình toàn hệ thống, C = BAYES_PRIOR_WEIGHT. Phòng ít rating
+  bị kéo về m nên 1 rating 5 sao không vượt 300 rating 4.8.
+- popularity_score: số booking (không tính cancelled) bắt đầu trong
+  POPULARITY_WINDOW_DAYS ngày gần nhất.
+
+Job chỉ ghi những dòng có điểm thay đổi (IS DISTINCT FROM) và chỉ 1 worker
+chạy mỗi lượt (services.job_runs). Vẫn tính lại toàn bộ: prior m là trung
+bình toàn hệ thống và cửa sổ popularity trượt theo thời gian, nên space
+không có thay đổi nào điểm vẫn đổi.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services import job_runs
+
+BAYES_PRIOR_WEIGHT = 10
+POPULARITY_WINDOW_DAYS = 30
+REFRESH_INTERVAL_MINUTES = 10
+
+_REFRESH_SQL = text("""
+WITH stats AS (
+    SELECT space_id, SUM(count) AS n, SUM(score * count) AS total
+    FROM space_rating_buckets
+    GROUP BY space_id
+),
+prior AS (
+    SELECT COALESCE(SUM(total)::float / NULLIF(SUM(n), 0), 0) AS m FROM stats
+),
+pop AS (
+    SELECT space_id, COUNT(*) AS c
+    FROM bookings
+    WHERE start_time >= :since AND status <> 'cancelled'
+    GROUP BY space_id
+),
+scores AS (
+    SELECT s.id,
+           (:c * prior.m + COALESCE(stats.total, 0)) / (:c + COALESCE(stats.n, 0)) AS rating_score,
+           COALESCE(pop.c, 0)::float AS popularity_score
+    FROM spaces s
+    CROSS JOIN prior
+    LEFT JOIN stats ON stats.space_id = s.id
+    LEFT JOIN pop ON pop.space_id = s.id
+)
+UPDATE spaces
+SET rating_score = scores.rating_score,
+    popularity_score = scores.popularity_score
+FROM scores
+WHERE spaces.id = scores.id
+  AND (spaces.rating_score IS DISTINCT FROM scores.rating_score
+       OR spaces.popularity_score IS DISTINCT FROM scores.popularity_score)
+""")
+
+
+def refresh_space_scores(db: Session) -> int:
+    if not job_runs.claim(db, "space_scores", timedelta(minutes=REFRESH_INTERVAL_MINUTES)):
+        # worker khác đã / đang chạy lượt này
+        db.rollback()
+        return 0
+
+    since = datetime.utcnow() - timedelta(days=POPULARITY_WINDOW_DAYS)
+    result = db.execute(_REFRESH_SQL, {"since": since, "c": BAYES_PRIOR_WEIGHT})
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,141 @@
+# app/services/relocation.py
+"""
+Xếp lại booking bị huỷ do bảo trì sang space tương đương.
+
+Input đã được crud.space nạp sẵn (không chạm DB ở đây):
+  - bookings cần xếp: (booking_id, source_space_id, start, end)
+  - candidates: space còn hoạt động + các khoảng đã bị chiếm (booking/hold)
+  - compatible(source, candidate): cùng type, đủ capacity, đủ utility
+
+Booking được gom theo khung giờ giống hệt nhau (đa số đặt theo slot nên
+nhóm khá lớn). Trong 1 nhóm mọi booking tranh cùng 1 tập "chỗ trống"
+(candidate, unit) -> ghép cặp cực đại bằng Hopcroft-Karp, O(E * sqrt(V)).
+Các nhóm xử lý theo thứ tự start_time; chỗ đã cấp được cộng vào timeline
+trong RAM (mảng sorted + bisect) trước khi sang nhóm sau.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Sequence, Tuple
+
+INF = float("inf")
+
+
+class _Timeline:
+    """Các khoảng đã chiếm của 1 space; đếm overlap O(log n) như crud.booking."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals: Sequence[Tuple[datetime, datetime]] = ()):
+        self.starts = sorted(s for s, _ in intervals)
+        self.ends = sorted(e for _, e in intervals)
+
+    def overlapping(self, start: datetime, end: datetime) -> int:
+        # số khoảng có s < end  trừ  số khoảng có e <= start
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def add(self, start: datetime, end: datetime) -> None:
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+
+def hopcroft_karp(adjacency: Dict[Hashable, List[Hashable]]) -> Dict[Hashable, Hashable]:
+    """Ghép cặp cực đại trên đồ thị 2 phía; trả về {left: right}."""
+    match_left: Dict[Hashable, Hashable] = {}
+    match_right: Dict[Hashable, Hashable] = {}
+    dist: Dict[Hashable, float] = {}
+
+    def bfs() -> bool:
+        queue = deque()
+        for u in adjacency:
+            if u in match_left:
+                dist[u] = INF
+            else:
+                dist[u] = 0
+                queue.append(u)
+        found = False
+        while queue:
+            u = queue.popleft()
+            for v in adjacency[u]:
+                w = match_right.get(v)
+                if w is None:
+                    found = True
+                elif dist[w] == INF:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        return found
+
+    def dfs(u) -> bool:
+        for v in adjacency[u]:
+            w = match_right.get(v)
+            if w is None or (dist[w] == dist[u] + 1 and dfs(w)):
+                match_left[u] = v
+                match_right[v] = u
+                return True
+        dist[u] = INF
+        return False
+
+    while bfs():
+        for u in adjacency:
+            if u not in match_left:
+                dfs(u)
+    return match_left
+
+
+def assign(
+    bookings: Sequence[Tuple[int, int, datetime, datetime]],
+    capacities: Dict[int, int],
+    occupied: Dict[int, Sequence[Tuple[datetime, datetime]]],
+    compatible: Callable[[int, int], bool],
+    preference: Callable[[int, int], tuple] = lambda source, candidate: (),
+    bookable: Callable[[int, datetime, datetime], bool] = lambda candidate, start, end: True,
+) -> Dict[int, int]:
+    """
+    bookings: (booking_id, source_space_id, start, end)
+    capacities: {candidate_space_id: capacity}
+    occupied: {candidate_space_id: [(start, end), ...]}
+    bookable(candidate, start, end): giờ mở cửa / ngày nghỉ của candidate
+    Trả về {booking_id: candidate_space_id}; booking không xếp được thì vắng mặt.
+    """
+    timelines = {space_id: _Timeline(occupied.get(space_id, ())) for space_id in capacities}
+
+    # Danh sách candidate theo source space (tính 1 lần, không theo booking)
+    sources = {source for _, source, _, _ in bookings}
+    options = {
+        source: sorted(
+            (c for c in capacities if c != source and compatible(source, c)),
+            key=lambda c: preference(source, c),
+        )
+        for source in sources
+    }
+
+    groups: Dict[Tuple[datetime, datetime], List[Tuple[int, int]]] = defaultdict(list)
+    for booking_id, source, start, end in bookings:
+        groups[(start, end)].append((booking_id, source))
+
+    result: Dict[int, int] = {}
+    for (start, end) in sorted(groups):
+        members = groups[(start, end)]
+
+        free = {}
+        for candidate in {c for _, source in members for c in options[source]}:
+            units = capacities[candidate] - timelines[candidate].overlapping(start, end)
+            if units > 0 and bookable(candidate, start, end):
+                free[candidate] = units
+
+        # Mỗi booking nối tới (candidate, unit); tối đa len(members) unit / candidate
+        adjacency = {
+            booking_id: [
+                (candidate, unit)
+                for candidate in options[source]
+                if candidate in free
+                for unit in range(min(free[candidate], len(members)))
+            ]
+            for booking_id, source in members
+        }
+
+        for booking_id, (candidate, _) in hopcroft_karp(adjacency).items():
+            result[booking_id] = candidate
+            timelines[candidate].add(start, end)
+
+    return result
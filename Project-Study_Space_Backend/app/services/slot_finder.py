@@ -0,0 +1,97 @@
+# app/services/slot_finder.py
+"""
+Tìm (space, giờ bắt đầu) còn trống cho GET /spaces/find.
+
+crud.space nạp 1 lần toàn bộ khoảng đã chiếm (booking + hold) của mọi space
+ứng viên trong cửa sổ tìm kiếm; ở đây tính số overlap cho cả lưới
+(space x giờ bắt đầu) bằng NumPy:
+  key = space_index * SPAN + phút   (mọi space nằm trên 1 trục số)
+  overlap = #(start < s + D) - #(end <= s)     -> 4 lần np.searchsorted
+giống hệt cách crud.booking đếm booking trùng giờ.
+"""
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def _minutes(values: Sequence[datetime], origin: datetime) -> np.ndarray:
+    return np.array(
+        [(v - origin).total_seconds() // 60 for v in values], dtype=np.int64
+    )
+
+
+def free_units(
+    space_ids: Sequence[int],
+    capacities: Sequence[int],
+    occupied: Sequence[Tuple[int, datetime, datetime]],
+    starts: Sequence[datetime],
+    duration: timedelta,
+) -> np.ndarray:
+    """
+    occupied: (space_id, start, end) đã giao với [starts[0], starts[-1] + duration)
+    Trả về ma trận (len(space_ids), len(starts)): số chỗ còn trống.
+    """
+    origin = starts[0]
+    length = int(duration.total_seconds() // 60)
+    grid = _minutes(starts, origin)
+    span = int(grid[-1]) + length + 1
+
+    index = {space_id: i for i, space_id in enumerate(space_ids)}
+    n = len(space_ids)
+    base = np.arange(n, dtype=np.int64)[:, None] * span
+
+    if occupied:
+        owner = np.array([index[space_id] for space_id, _, _ in occupied], dtype=np.int64)
+        # kẹp vào [0, span - 1]: không đổi kết quả so sánh với lưới
+        o_start = np.clip(_minutes([s for _, s, _ in occupied], origin), 0, span - 1)
+        o_end = np.clip(_minutes([e for _, _, e in occupied], origin), 0, span - 1)
+        start_keys = np.sort(owner * span + o_start)
+        end_keys = np.sort(owner * span + o_end)
+    else:
+        start_keys = end_keys = np.empty(0, dtype=np.int64)
+
+    lo = np.searchsorted(start_keys, base[:, 0], side="left")[:, None]
+    started = np.searchsorted(start_keys, base + grid + length, side="left") - lo
+
+    lo = np.searchsorted(end_keys, base[:, 0], side="left")[:, None]
+    ended = np.searchsorted(end_keys, base + grid, side="right") - lo
+
+    return np.asarray(capacities, dtype=np.int64)[:, None] - (started - ended)
+
+
+def rank(
+    spaces: List[dict],
+    free: np.ndarray,
+    starts: Sequence[datetime],
+    requested: datetime,
+    min_capacity: int,
+    bookable,
+    limit: int,
+) -> List[dict]:
+    """
+    Mỗi space lấy giờ bắt đầu tốt nhất (lệch ít nhất so với giờ yêu cầu),
+    rồi xếp: độ lệch, capacity vừa khít, còn nhiều chỗ, rating_score.
+    """
+    shift = np.abs(_minutes(starts, requested))
+    order = np.argsort(shift, kind="stable")
+
+    results = []
+    for i, space in enumerate(spaces):
+        for j in order:
+            if free[i, j] > 0 and bookable(space["id"], starts[j]):
+                results.append({
+                    **space,
+                    "start_time": starts[j],
+                    "free_units": int(free[i, j]),
+                    "shift_minutes": int(shift[j]),
+                })
+                break
+
+    results.sort(key=lambda r: (
+        r["shift_minutes"],
+        r["capacity"] - min_capacity,
+        -r["free_units"],
+        -r["rating_score"],
+    ))
+    return results[:limit]
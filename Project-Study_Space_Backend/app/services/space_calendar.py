@@ -0,0 +1,189 @@
+# app/services/space_calendar.py
+"""
+Compile luật đặt chỗ của space (SpaceBookingRule) thành cấu trúc trong RAM.
+
+Giờ mở cửa được trải ra thành mảng prefix-sum theo phút trong tuần
+(7 * 1440 phần tử): một khoảng [start, end) nằm trọn trong giờ mở cửa khi
+prefix[end] - prefix[start] == số phút của khoảng -> kiểm tra O(1).
+
+Prefix lưu bằng array('H') (giá trị tối đa 10080 < 65536): ~20 KB / space.
+Cache LRU theo space_id (tối đa RULES_CACHE_SIZE space); admin sửa luật thì
+invalidate() ngay trong worker đó, các worker khác tự load lại sau
+RULES_TTL_SECONDS.
+"""
+import threading
+import time as _time
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Iterable, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.space import SpaceBookingRule
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+RULES_TTL_SECONDS = 60
+RULES_CACHE_SIZE = 2048
+
+
+def parse_hhmm(value: str) -> int:
+    hours, minutes = value.split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total <= MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time of day: {value}")
+    return total
+
+
+def as_utc(dt: datetime) -> datetime:
+    """Datetime naive được hiểu là UTC (client không gửi offset)."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+class CompiledRules:
+    __slots__ = (
+        "tz", "open_prefix", "closures", "slot", "min_duration",
+        "max_duration", "min_lead",
+    )
+
+    def __init__(self, rule: SpaceBookingRule):
+        self.tz = ZoneInfo(rule.timezone or "UTC")
+        self.closures = frozenset(date.fromisoformat(d) for d in (rule.closures or []))
+        self.slot = rule.slot_minutes
+        self.min_duration = rule.min_duration_minutes
+        self.max_duration = rule.max_duration_minutes
+        self.min_lead = rule.min_lead_minutes
+
+        self.open_prefix = None
+        if rule.opening_hours is not None:
+            is_open = bytearray(MINUTES_PER_WEEK)
+            for day_index, day in enumerate(WEEKDAYS):
+                for start, end in rule.opening_hours.get(day, []):
+                    base = day_index * MINUTES_PER_DAY
+                    lo, hi = parse_hhmm(start), parse_hhmm(end)
+                    is_open[base + lo: base + hi] = b"\x01" * max(hi - lo, 0)
+            self.open_prefix = array("H", accumulate(is_open, initial=0))
+
+    def _open_minutes(self, start: int, length: int) -> int:
+        end = start + length
+        if end <= MINUTES_PER_WEEK:
+            return self.open_prefix[end] - self.open_prefix[start]
+        # khoảng vắt qua Chủ nhật -> Thứ hai
+        return (
+            self.open_prefix[MINUTES_PER_WEEK] - self.open_prefix[start]
+            + self.open_prefix[end - MINUTES_PER_WEEK]
+        )
+
+    def violation(self, start: datetime, end: datetime, now: datetime) -> Optional[str]:
+        start, end, now = as_utc(start), as_utc(end), as_utc(now)
+        duration = int((end - start).total_seconds() // 60)
+
+        if self.min_duration is not None and duration < self.min_duration:
+            return f"Booking must be at least {self.min_duration} minutes."
+        if self.max_duration is not None and duration > self.max_duration:
+            return f"Booking must be at most {self.max_duration} minutes."
+        if self.min_lead is not None and start < now + timedelta(minutes=self.min_lead):
+            return f"Booking must be made at least {self.min_lead} minutes in advance."
+
+        local_start = start.astimezone(self.tz)
+        local_end = end.astimezone(self.tz)
+
+        if self.slot:
+            minute_of_day = local_start.hour * 60 + local_start.minute
+            if local_start.second or minute_of_day % self.slot or duration % self.slot:
+                return f"Booking must align to {self.slot}-minute slots."
+
+        if self.closures:
+            day = local_start.date()
+            last = (local_end - timedelta(microseconds=1)).date()
+            while day <= last:
+                if day in self.closures:
+                    return f"Space is closed on {day.isoformat()}."
+                day += timedelta(days=1)
+
+        if self.open_prefix is not None:
+            if duration > MINUTES_PER_WEEK:
+                return "Booking is outside opening hours."
+            minute_of_week = (
+                local_start.weekday() * MINUTES_PER_DAY
+                + local_start.hour * 60
+                + local_start.minute
+            )
+            if self._open_minutes(minute_of_week, duration) != duration:
+                return "Booking is outside opening hours."
+
+        return None
+
+
+class SpaceCalendar:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[int, Tuple[float, Optional[CompiledRules]]]" = OrderedDict()
+
+    def _store(self, space_id: int, entry: Tuple[float, Optional[CompiledRules]]) -> None:
+        # gọi khi đang giữ self._lock
+        self._cache[space_id] = entry
+        self._cache.move_to_end(space_id)
+        while len(self._cache) > RULES_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def get(self, db: Session, space_id: int) -> Optional[CompiledRules]:
+        with self._lock:
+            cached = self._cache.get(space_id)
+            if cached is not None:
+                self._cache.move_to_end(space_id)
+        if cached is not None and _time.monotonic() - cached[0] < RULES_TTL_SECONDS:
+            return cached[1]
+
+        rule = db.get(SpaceBookingRule, space_id)
+        compiled = CompiledRules(rule) if rule is not None else None
+        with self._lock:
+            self._store(space_id, (_time.monotonic(), compiled))
+        return compiled
+
+    def prefetch(self, db: Session, space_ids: Iterable[int]) -> None:
+        """Nạp luật của nhiều space trong 1 query (thay vì get() từng space)."""
+        now = _time.monotonic()
+        with self._lock:
+            missing = [
+                space_id for space_id in space_ids
+                if space_id not in self._cache or now - self._cache[space_id][0] >= RULES_TTL_SECONDS
+            ]
+        if not missing:
+            return
+        rules = {
+            rule.space_id: rule
+            for rule in db.execute(
+                select(SpaceBookingRule).where(SpaceBookingRule.space_id.in_(missing))
+            ).scalars()
+        }
+        with self._lock:
+            for space_id in missing:
+                rule = rules.get(space_id)
+                self._store(space_id, (now, CompiledRules(rule) if rule is not None else None))
+
+    def invalidate(self, space_id: int) -> None:
+        with self._lock:
+            self._cache.pop(space_id, None)
+
+    def is_bookable(self, db: Session, space_id: int, start: datetime, end: datetime,
+                    now: Optional[datetime] = None) -> bool:
+        compiled = self.get(db, space_id)
+        return compiled is None or compiled.violation(start, end, now or datetime.now(timezone.utc)) is None
+
+    def validate(self, db: Session, space_id: int, start: datetime, end: datetime) -> None:
+        compiled = self.get(db, space_id)
+        if compiled is None:
+            return
+        reason = compiled.violation(start, end, datetime.now(timezone.utc))
+        if reason:
+            raise HTTPException(409, reason)
+
+
+calendar = SpaceCalendar()
@@ -0,0 +1,165 @@
+# app/services/space_index.py
+"""
+Chỉ mục không gian (k-d tree trong RAM) cho GET /spaces/nearest.
+
+Toạ độ (lat, lon, floor) được đổi sang điểm 3D tính bằng mét:
+  (EARTH_RADIUS_M + floor * FLOOR_HEIGHT_M) * vector đơn vị của (lat, lon)
+nên khoảng cách Euclid ~ khoảng cách mặt đất, và khác tầng cũng bị tính xa
+hơn. nearest() duyệt cây best-first (heap theo khoảng cách tới bounding
+box) và yield space theo đúng thứ tự khoảng cách -> filter type/capacity
+áp dụng trong lúc duyệt, dừng ngay khi đủ kết quả, không sort cả catalog.
+
+Cache giống services.space_calendar: crud.space gọi invalidate() khi sửa
+space, worker khác tự build lại sau INDEX_TTL_SECONDS. Cây dùng chung cả
+process nên luôn build từ primary (SessionLocal), không từ session đọc của
+request (có thể là replica đang trễ).
+"""
+import heapq
+import math
+import threading
+import time as _time
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from app.core.database import SessionLocal
+from app.models.space import Space
+
+EARTH_RADIUS_M = 6_371_000.0
+FLOOR_HEIGHT_M = 4.0
+INDEX_TTL_SECONDS = 60
+LEAF_SIZE = 8
+
+
+@dataclass(frozen=True)
+class SpacePoint:
+    id: int
+    name: str
+    type: str
+    capacity: int
+    location: str
+    building: Optional[str]
+    floor: Optional[int]
+    latitude: float
+    longitude: float
+    xyz: Tuple[float, float, float]
+
+
+def to_xyz(latitude: float, longitude: float, floor: Optional[int] = None) -> Tuple[float, float, float]:
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    r = EARTH_RADIUS_M + (floor or 0) * FLOOR_HEIGHT_M
+    return (
+        r * math.cos(lat) * math.cos(lon),
+        r * math.cos(lat) * math.sin(lon),
+        r * math.sin(lat),
+    )
+
+
+class _Node:
+    __slots__ = ("lo", "hi", "points", "left", "right")
+
+    def __init__(self, points: List[SpacePoint]):
+        self.lo = tuple(min(p.xyz[d] for p in points) for d in range(3))
+        self.hi = tuple(max(p.xyz[d] for p in points) for d in range(3))
+        self.left = self.right = None
+        self.points = None
+
+        if len(points) <= LEAF_SIZE:
+            self.points = points
+            return
+        axis = max(range(3), key=lambda d: self.hi[d] - self.lo[d])
+        points = sorted(points, key=lambda p: p.xyz[axis])
+        mid = len(points) // 2
+        self.left = _Node(points[:mid])
+        self.right = _Node(points[mid:])
+
+    def min_dist2(self, q: Tuple[float, float, float]) -> float:
+        total = 0.0
+        for d in range(3):
+            if q[d] < self.lo[d]:
+                total += (self.lo[d] - q[d]) ** 2
+            elif q[d] > self.hi[d]:
+                total += (q[d] - self.hi[d]) ** 2
+        return total
+
+
+def _dist2(a, b) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+class SpaceIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root: Optional[_Node] = None
+        self._built_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def _ensure(self) -> Optional[_Node]:
+        with self._lock:
+            if self._built_at is not None and _time.monotonic() - self._built_at < INDEX_TTL_SECONDS:
+                return self._root
+
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(
+                    Space.id, Space.name, Space.type, Space.capacity, Space.location,
+                    Space.building, Space.floor, Space.latitude, Space.longitude,
+                ).where(
+                    Space.is_active.is_(True),
+                    Space.status == "available",
+                    Space.latitude.isnot(None),
+                    Space.longitude.isnot(None),
+                )
+            ).all()
+        finally:
+            db.close()
+        points = [
+            SpacePoint(**row._mapping, xyz=to_xyz(row.latitude, row.longitude, row.floor))
+            for row in rows
+        ]
+        root = _Node(points) if points else None
+        with self._lock:
+            self._root, self._built_at = root, _time.monotonic()
+        return root
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        floor: Optional[int] = None,
+        accept: Callable[[SpacePoint], bool] = lambda point: True,
+        max_distance_m: Optional[float] = None,
+    ) -> Iterator[Tuple[float, SpacePoint]]:
+        """Yield (khoảng cách mét, space) theo thứ tự gần -> xa."""
+        root = self._ensure()
+        if root is None:
+            return
+        q = to_xyz(latitude, longitude, floor)
+        limit2 = max_distance_m ** 2 if max_distance_m is not None else math.inf
+
+        # heap chứa cả node (theo min distance tới box) lẫn điểm (khoảng cách thật)
+        counter = 0
+        heap = [(root.min_dist2(q), counter, root)]
+        while heap:
+            d2, _, item = heapq.heappop(heap)
+            if d2 > limit2:
+                return
+            if isinstance(item, SpacePoint):
+                yield math.sqrt(d2), item
+                continue
+            if item.points is not None:
+                for point in item.points:
+                    if accept(point):
+                        counter += 1
+                        heapq.heappush(heap, (_dist2(q, point.xyz), counter, point))
+            else:
+                for child in (item.left, item.right):
+                    counter += 1
+                    heapq.heappush(heap, (child.min_dist2(q), counter, child))
+
+
+index = SpaceIndex()
@@ -1,5 +1,14 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.no_show import process_no_show_bookings
+from app.services.auto_complete import complete_overdue_bookings
+from app.services.occupancy import reconcile_occupancy
+from app.services.analytics import refresh_recent_rollups
+from app.crud.rating import rebuild_rating_buckets
+from app.services.ranking import refresh_space_scores, REFRESH_INTERVAL_MINUTES
+from app.services.penalty_ledger import expire_penalties, reconcile_penalty_counts
+from app.crud.hold import purge_expired_holds
+from app.services.idempotency import purge_expired_records
+from app.services.purge import run_purge_jobs
 from app.core.database import SessionLocal
 
 scheduler = BackgroundScheduler()
@@ -11,6 +20,88 @@ def auto_no_show_job():
     finally:
         db.close()
 
+def auto_complete_job():
+    db = SessionLocal()
+    try:
+        complete_overdue_bookings(db)
+    finally:
+        db.close()
+
+def occupancy_reconcile_job():
+    db = SessionLocal()
+    try:
+        reconcile_occupancy(db)
+    finally:
+        db.close()
+
+def analytics_rollup_job():
+    db = SessionLocal()
+    try:
+        refresh_recent_rollups(db)
+    finally:
+        db.close()
+
+def rating_rebuild_job():
+    db = SessionLocal()
+    try:
+        rebuild_rating_buckets(db)
+    finally:
+        db.close()
+
+def space_scores_job():
+    db = SessionLocal()
+    try:
+        refresh_space_scores(db)
+    finally:
+        db.close()
+
+def penalty_expiry_job():
+    db = SessionLocal()
+    try:
+        expire_penalties(db)
+    finally:
+        db.close()
+
+def penalty_reconcile_job():
+    db = SessionLocal()
+    try:
+        expire_penalties(db)
+        reconcile_penalty_counts(db)
+    finally:
+        db.close()
+
+def hold_purge_job():
+    db = SessionLocal()
+    try:
+        purge_expired_holds(db)
+    finally:
+        db.close()
+
+def idempotency_purge_job():
+    db = SessionLocal()
+    try:
+        purge_expired_records(db)
+    finally:
+        db.close()
+
+def purge_jobs_job():
+    db = SessionLocal()
+    try:
+        run_purge_jobs(db)
+    finally:
+        db.close()
+
 def start_scheduler():
     scheduler.add_job(auto_no_show_job, "interval", minutes=1)
+    scheduler.add_job(auto_complete_job, "interval", minutes=1)
+    scheduler.add_job(occupancy_reconcile_job, "interval", minutes=5)
+    scheduler.add_job(analytics_rollup_job, "interval", minutes=15)
+    scheduler.add_job(rating_rebuild_job, "cron", hour=3)
+    scheduler.add_job(space_scores_job, "interval", minutes=REFRESH_INTERVAL_MINUTES)
+    scheduler.add_job(penalty_expiry_job, "interval", minutes=5)
+    scheduler.add_job(penalty_reconcile_job, "cron", hour=4)
+    scheduler.add_job(hold_purge_job, "interval", minutes=5)
+    scheduler.add_job(idempotency_purge_job, "interval", hours=1)
+    # mỗi lượt tối đa PURGE_TIME_BUDGET_SECONDS, không chồng lượt
+    scheduler.add_job(purge_jobs_job, "interval", seconds=30, max_instances=1)
     scheduler.start()
@@ -0,0 +1,130 @@
+# scripts/bench_checkin_burst.py
+"""
+Benchmark check-in đầu giờ: N booking check-in đồng thời, so sánh
+  - direct   : crud.booking.check_in (mỗi request 1 commit + refresh)
+  - pipeline : services.checkin_pipeline (micro-batch)
+
+Chạy với Postgres trong docker-compose (schema đã tạo):
+    python -m scripts.bench_checkin_burst --bookings 500 --threads 64
+
+Script tự tạo 1 user + 1 space tạm rồi xoá (cascade) khi xong.
+"""
+import argparse
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app.core.database import SessionLocal, engine
+from app.crud import booking as crud_booking
+from app.models.booking import Booking
+from app.models.space import Space
+from app.models.user import User
+from app.models import rating, penalty, utility  # noqa: F401  (đăng ký mapper)
+from app.services.checkin_pipeline import pipeline
+
+_commits = 0
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(conn):
+    global _commits
+    _commits += 1
+
+
+def _seed(n: int):
+    db = SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        user = User(
+            email=f"bench-{tag}@example.com",
+            username=f"bench-{tag}",
+            full_name="Bench",
+            hashed_password="x",
+        )
+        space = Space(name=f"bench-{tag}", capacity=n, type="group", location="bench")
+        db.add_all([user, space])
+        db.flush()
+
+        start = datetime.now(timezone.utc)
+        db.add_all([
+            Booking(
+                user_id=user.id,
+                space_id=space.id,
+                start_time=start + timedelta(minutes=i),
+                end_time=start + timedelta(minutes=i, hours=1),
+                status="pending",
+            )
+            for i in range(n)
+        ])
+        db.commit()
+        ids = [b for (b,) in db.query(Booking.id).filter(Booking.space_id == space.id)]
+        return user.id, space.id, ids
+    finally:
+        db.close()
+
+
+def _cleanup(user_id: int, space_id: int):
+    db = SessionLocal()
+    try:
+        db.query(Booking).filter(Booking.space_id == space_id).delete()
+        db.query(Space).filter(Space.id == space_id).delete()
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _direct(booking_id: int, user_id: int):
+    db = SessionLocal()
+    try:
+        booking = crud_booking.get_booking(db, booking_id)
+        crud_booking.check_in(db, booking)
+    finally:
+        db.close()
+
+
+def _pipelined(booking_id: int, user_id: int):
+    pipeline.check_in(booking_id, user_id)
+
+
+def run(mode: str, n: int, threads: int):
+    global _commits
+    user_id, space_id, ids = _seed(n)
+    fn = _direct if mode == "direct" else _pipelined
+    latencies = []
+
+    def timed(booking_id):
+        t0 = time.perf_counter()
+        fn(booking_id, user_id)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    _commits = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, ids))
+    elapsed = time.perf_counter() - t0
+    commits = _commits
+
+    _cleanup(user_id, space_id)
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{mode:9s} n={n} threads={threads} "
+        f"wall={elapsed:.2f}s commits={commits} "
+        f"p50={statistics.median(latencies):.1f}ms p99={p99:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    for mode in ("direct", "pipeline"):
+        run(mode, args.bookings, args.threads)
@@ -0,0 +1,88 @@
+# tests/conftest.py
+"""
+Fixture dùng chung: test chạy trên Postgres trong docker-compose (schema đã
+tạo); không kết nối được thì test bị skip. User / space tạm được xoá
+(cascade) sau mỗi test.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import SessionLocal, engine
+from app.crud import space as crud_space
+from app.crud import user as crud_user
+from app.models.space import Space
+from app.models.user import User
+from app.models import penalty, waitlist  # noqa: F401  (đăng ký mapper)
+from app.schemas.space import SpaceCreate
+from app.schemas.user import UserCreate
+from app.services.booking_policy import policy
+from app.services.space_calendar import calendar
+
+
+@pytest.fixture(scope="session")
+def postgres():
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("Postgres is not available")
+    return engine
+
+
+@pytest.fixture
+def db(postgres):
+    db = SessionLocal()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def make_user(db):
+    created = []
+
+    def make(**fields) -> User:
+        tag = uuid.uuid4().hex[:8]
+        user = crud_user.create_user(db, UserCreate(**{
+            "email": f"test-{tag}@example.com",
+            "username": f"test-{tag}",
+            "full_name": "Test",
+            "password": "test-password",
+            **fields,
+        }))
+        created.append(user.id)
+        return user
+
+    yield make
+    db.rollback()
+    if created:
+        db.execute(delete(User).where(User.id.in_(created)))
+        db.commit()
+    for user_id in created:
+        policy.invalidate(user_id)
+
+
+@pytest.fixture
+def make_space(db):
+    created = []
+
+    def make(**fields) -> Space:
+        space = crud_space.create_space(db, SpaceCreate(**{
+            "name": f"test-{uuid.uuid4().hex[:8]}",
+            "capacity": 8,
+            "type": "group",
+            "location": "test",
+            **fields,
+        }))
+        created.append(space.id)
+        return space
+
+    yield make
+    db.rollback()
+    if created:
+        db.execute(delete(Space).where(Space.id.in_(created)))
+        db.commit()
+    for space_id in created:
+        calendar.invalidate(space_id)
@@ -0,0 +1,76 @@
+# tests/test_idempotency.py
+"""Handler và kết quả idempotency được commit cùng nhau hoặc không gì cả."""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from app.crud import penalty as crud_penalty
+from app.models.idempotency import IdempotencyRecord
+from app.models.penalty import Penalty
+from app.schemas.penalty import PenaltyCreate, PenaltyOut
+from app.services import idempotency
+from app.services.idempotency import run_idempotent
+
+
+@pytest.fixture
+def admin(db, make_user):
+    user = make_user()
+    yield user
+    db.rollback()
+    db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key.like(f"{user.id}:%")))
+    db.commit()
+
+
+def _penalties(db, user_id: int) -> int:
+    return db.execute(select(func.count()).where(Penalty.user_id == user_id)).scalar_one()
+
+
+def _create(db, admin, data, handler, key):
+    return run_idempotent(
+        db, key, user_id=admin.id, route="POST /penalties", payload=data,
+        handler=handler, response_model=PenaltyOut, status_code=201,
+    )
+
+
+def test_failure_after_handler_commit_writes_nothing(db, admin, make_user):
+    target = make_user()
+    data = PenaltyCreate(user_id=target.id, penalty_type="damage", points=0)
+    key = uuid.uuid4().hex
+
+    def handler(session):
+        crud_penalty.create_penalty(session, data)   # commit() bên trong handler
+        raise RuntimeError("worker died before the result was stored")
+
+    with pytest.raises(RuntimeError):
+        _create(db, admin, data, handler, key)
+
+    assert _penalties(db, target.id) == 0
+    # key được nhả: retry chạy lại bình thường
+    response = _create(db, admin, data, lambda session: crud_penalty.create_penalty(session, data), key)
+    assert response.status_code == 201
+    assert _penalties(db, target.id) == 1
+
+
+def test_stale_claim_is_taken_over_once(db, admin, make_user, monkeypatch):
+    target = make_user()
+    data = PenaltyCreate(user_id=target.id, penalty_type="damage", points=0)
+    key = uuid.uuid4().hex
+    stale = datetime.now(timezone.utc) - idempotency.STALE_CLAIM - timedelta(seconds=1)
+    db.add(IdempotencyRecord(
+        key=f"{admin.id}:POST /penalties:{key}",
+        fingerprint=idempotency._fingerprint(data),
+        claimed_at=stale,
+        expires_at=stale + idempotency.RECORD_TTL,
+    ))
+    db.commit()
+
+    handler = lambda session: crud_penalty.create_penalty(session, data)  # noqa: E731
+    first = _create(db, admin, data, handler, key)
+    monkeypatch.setattr(idempotency, "cache", idempotency.ResponseCache())   # replay từ DB, không từ LRU
+    replay = _create(db, admin, data, handler, key)
+
+    assert first.status_code == replay.status_code == 201
+    assert first.body == replay.body
+    assert _penalties(db, target.id) == 1
@@ -0,0 +1,219 @@
+# tests/test_query_counts.py
+"""
+Số câu SQL mỗi write path gửi tới Postgres (không tính COMMIT) phải nằm
+trong BUDGETS: path nào thêm round trip thì test đỏ.
+
+Cần Postgres (xem conftest). Cache trong RAM (policy counter, lịch space)
+được làm nóng trước khi đo, giống request thứ 2 trở đi của 1 worker.
+"""
+import json
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, event
+
+from app.core.security import verify_qr_token
+from app.crud import booking as crud_booking
+from app.crud import penalty as crud_penalty
+from app.crud import rating as crud_rating
+from app.crud import space as crud_space
+from app.crud import user as crud_user
+from app.crud import utility as crud_utility
+from app.models.booking import Booking
+from app.models.idempotency import IdempotencyRecord
+from app.models.space import Space
+from app.models.user import User
+from app.models.utility import Utility
+from app.schemas.booking import BookingCreate, BookingResponse, BookingUpdate
+from app.schemas.penalty import PenaltyCreate, PenaltyOut
+from app.schemas.rating import RatingCreate
+from app.schemas.space import SpaceCreate
+from app.schemas.user import UserCreate, UserUpdate
+from app.schemas.utility import UtilityCreate
+from app.services.booking_policy import policy
+from app.services.idempotency import run_idempotent
+from app.services.space_calendar import calendar
+
+# Số câu SQL tối đa / path. "+ change_log" = INSERT của listener after_flush,
+# "+ notify" = pg_notify cho SSE, "claim / result" = 2 câu của run_idempotent.
+BUDGETS = {
+    "create_user": 1,       # INSERT ... RETURNING
+    "update_user": 1,       # UPDATE ... RETURNING updated_at
+    "create_utility": 2,    # INSERT + change_log
+    "create_space": 2,      # INSERT + change_log
+    "create_rating": 3,     # SELECT exists + UPSERT histogram + INSERT
+    # claim + UPDATE users.penalty_count + INSERT + change_log + result
+    "POST /penalties": 5,
+    # claim + SELECT space FOR UPDATE + overlap của user + DELETE hold của
+    # user + count_taken + INSERT + change_log + notify + UPDATE qr
+    # + change_log + result
+    "POST /bookings": 11,
+    "POST /bookings replay": 0,     # LRU trong RAM
+    "update_booking": 3,    # notify + UPDATE + change_log
+    # UPDATE ... FROM (VALUES) + notify + change_log, không phụ thuộc cỡ batch
+    "apply_transitions": 3,
+    "check_in_by_token": 3,  # notify + UPDATE + change_log
+}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    @contextmanager
+    def measure(self):
+        self.count = 0
+        yield self
+
+
+@pytest.fixture(scope="module")
+def counter(postgres):
+    counter = StatementCounter()
+    event.listen(postgres, "before_cursor_execute", counter)
+    yield counter
+    event.remove(postgres, "before_cursor_execute", counter)
+
+
+@pytest.fixture
+def fixtures(db, counter, make_user, make_space):
+    user, space = make_user(), make_space()
+    user_id = user.id
+    yield {"tag": uuid.uuid4().hex[:8], "user": user, "user_id": user_id, "space_id": space.id}
+
+    db.rollback()
+    db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key.like(f"{user_id}:%")))
+    db.commit()
+
+
+def _pending(db, user_id: int, space_id: int, n: int):
+    """n booking pending bắt đầu sau 5 phút (trong khung check-in)."""
+    start = datetime.now(timezone.utc) + timedelta(minutes=5)
+    bookings = [
+        Booking(
+            user_id=user_id, space_id=space_id, status="pending",
+            start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i, minutes=30),
+        )
+        for i in range(n)
+    ]
+    db.add_all(bookings)
+    db.flush()
+    for booking in bookings:
+        crud_booking.issue_qr_token(booking)
+    db.commit()
+    return bookings
+
+
+def test_crud_write_paths(db, counter, fixtures):
+    tag, user_id = fixtures["tag"], fixtures["user_id"]
+    results = {}
+
+    with counter.measure():
+        crud_user.create_user(db, UserCreate(
+            email=f"count2-{tag}@example.com",
+            username=f"count2-{tag}",
+            full_name="Count",
+            password="count-queries",
+        ))
+    results["create_user"] = counter.count
+
+    with counter.measure():
+        crud_user.update_user(db, fixtures["user"], UserUpdate(full_name="Count Queries"))
+    results["update_user"] = counter.count
+
+    with counter.measure():
+        utility_id = crud_utility.create_utility(db, UtilityCreate(key=f"count_{tag}", label="Count")).id
+    results["create_utility"] = counter.count
+
+    with counter.measure():
+        extra_space_id = crud_space.create_space(db, SpaceCreate(
+            name=f"count2-{tag}", capacity=4, type="group", location="count",
+        )).id
+    results["create_space"] = counter.count
+
+    # Booking đã completed trong quá khứ để được rating
+    now = datetime.now(timezone.utc)
+    db.add(Booking(
+        user_id=user_id, space_id=fixtures["space_id"], status="completed",
+        start_time=now - timedelta(days=1, hours=1), end_time=now - timedelta(days=1),
+    ))
+    db.commit()
+    with counter.measure():
+        crud_rating.create_rating(db, RatingCreate(space_id=fixtures["space_id"], score=5), user_id)
+    results["create_rating"] = counter.count
+
+    db.execute(delete(User).where(User.email == f"count2-{tag}@example.com"))
+    db.execute(delete(Space).where(Space.id == extra_space_id))
+    db.execute(delete(Utility).where(Utility.id == utility_id))
+    db.commit()
+
+    for name, count in results.items():
+        assert count <= BUDGETS[name], f"{name}: {count} statements > budget {BUDGETS[name]}"
+
+
+def test_idempotent_create_paths(db, counter, fixtures):
+    user_id, space_id = fixtures["user_id"], fixtures["space_id"]
+    key = uuid.uuid4().hex
+
+    penalty_data = PenaltyCreate(user_id=user_id, penalty_type="damage", points=0)
+    with counter.measure():
+        run_idempotent(
+            db, key, user_id=user_id, route="POST /penalties", payload=penalty_data,
+            handler=lambda session: crud_penalty.create_penalty(session, penalty_data),
+            response_model=PenaltyOut, status_code=201,
+        )
+    assert counter.count <= BUDGETS["POST /penalties"]
+
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    data = BookingCreate(space_id=space_id, start_time=start, end_time=start + timedelta(hours=1))
+    calendar.get(db, space_id)
+    policy.check(db, user_id=user_id, role="student", penalty_points=0,
+                 start=data.start_time, end=data.end_time)
+
+    def create():
+        return run_idempotent(
+            db, key, user_id=user_id, route="POST /bookings", payload=data,
+            handler=lambda session: crud_booking.create_booking(session, data, user_id),
+            response_model=BookingResponse, status_code=201,
+        )
+
+    with counter.measure():
+        response = create()
+    assert response.status_code == 201
+    assert counter.count <= BUDGETS["POST /bookings"]
+
+    with counter.measure():
+        replay = create()
+    assert replay.body == response.body
+    assert counter.count <= BUDGETS["POST /bookings replay"]
+
+    booking = db.get(Booking, json.loads(replay.body)["id"])
+    with counter.measure():
+        crud_booking.update_booking(db, booking, BookingUpdate(notes="count"))
+    assert counter.count <= BUDGETS["update_booking"]
+
+
+@pytest.mark.parametrize("batch_size", [1, 5])
+def test_apply_transitions_is_constant_per_batch(db, counter, fixtures, batch_size):
+    user_id = fixtures["user_id"]
+    bookings = _pending(db, user_id, fixtures["space_id"], batch_size)
+
+    for op in ("check_in", "check_out"):
+        with counter.measure():
+            results = crud_booking.apply_transitions(db, [(b.id, user_id, op) for b in bookings])
+        assert all(isinstance(r, dict) for r in results.values())
+        assert counter.count <= BUDGETS["apply_transitions"], f"{op} x{batch_size}: {counter.count}"
+
+
+def test_check_in_by_token(db, counter, fixtures):
+    (booking,) = _pending(db, fixtures["user_id"], fixtures["space_id"], 1)
+    claims = verify_qr_token(booking.qr_code_data)
+
+    with counter.measure():
+        checked_in = crud_booking.check_in_by_token(db, claims)
+    assert checked_in.status == "checked_in"
+    assert counter.count <= BUDGETS["check_in_by_token"]
@@ -0,0 +1,43 @@
+# tests/test_spaces.py
+"""Response của các endpoint ghi space phải serialize được sau commit."""
+from fastapi import Response
+
+from app.api.v1 import spaces as spaces_api
+from app.schemas.space import SpaceResponse, SpaceUpdate
+
+
+def _patch(db, space_id: int, **changes) -> SpaceResponse:
+    result = spaces_api.update_existing_space(
+        space_id, SpaceUpdate(**changes), Response(), if_match=None, db=db, current_admin=None,
+    )
+    return SpaceResponse.model_validate(result)
+
+
+def test_patch_space_serializes_rating_stats(db, make_space):
+    space = make_space(capacity=4)
+    db.expunge_all()
+
+    body = _patch(db, space.id, name=f"{space.name}-renamed")
+    assert body.name.endswith("-renamed")
+    assert body.total_ratings == 0
+    assert body.average_rating == 0.0
+
+
+def test_patch_space_capacity_increase_serializes(db, make_space):
+    # Tăng capacity chạy promote_waiters (flush thêm lần nữa trước commit)
+    space = make_space(capacity=2)
+    db.expunge_all()
+
+    body = _patch(db, space.id, capacity=3)
+    assert body.capacity == 3
+    assert body.total_ratings == 0
+
+
+def test_delete_space_serializes(db, make_space):
+    space = make_space()
+    db.expunge_all()
+
+    result = spaces_api.delete_space(space.id, db=db, current_admin=None)
+    body = SpaceResponse.model_validate(result)
+    assert body.is_active is False
+    assert body.total_ratings == 0
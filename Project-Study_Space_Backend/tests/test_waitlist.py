@@ -0,0 +1,68 @@
+# tests/test_waitlist.py
+"""Huỷ / dời booking trên space đã đầy phải promote người đang chờ."""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.crud import booking as crud_booking
+from app.crud import space as crud_space
+from app.models.booking import Booking
+from app.models.waitlist import WaitlistEntry
+from app.schemas.booking import BookingUpdate
+from app.schemas.space import SpaceRules
+
+
+def _full_space_with_waiter(db, make_user, make_space, start: datetime, end: datetime):
+    owner, waiter = make_user(), make_user()
+    space = make_space(capacity=1)
+    booking = Booking(user_id=owner.id, space_id=space.id, status="pending", start_time=start, end_time=end)
+    entry = WaitlistEntry(user_id=waiter.id, space_id=space.id, start_time=start, end_time=end)
+    db.add_all([booking, entry])
+    db.commit()
+    return space, booking, entry
+
+
+def _tomorrow():
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(hours=1)
+
+
+def test_cancel_on_full_space_promotes_waiter(db, make_user, make_space):
+    space, booking, entry = _full_space_with_waiter(db, make_user, make_space, *_tomorrow())
+
+    crud_booking.delete_booking(db, booking)
+
+    db.refresh(entry)
+    assert entry.status == "promoted"
+    promoted = db.get(Booking, entry.booking_id)
+    assert promoted.user_id == entry.user_id
+    assert (promoted.start_time, promoted.end_time) == (entry.start_time, entry.end_time)
+
+
+def test_reschedule_on_full_space_promotes_waiter(db, make_user, make_space):
+    start, end = _tomorrow()
+    space, booking, entry = _full_space_with_waiter(db, make_user, make_space, start, end)
+
+    crud_booking.update_booking(
+        db, booking, BookingUpdate(start_time=start + timedelta(hours=2), end_time=end + timedelta(hours=2))
+    )
+
+    db.refresh(entry)
+    assert entry.status == "promoted"
+
+
+def test_mid_slot_promotion_respects_slot_grid(db, make_user, make_space):
+    # Chỗ trống giữa chừng: booking sẽ bắt đầu từ bây giờ, lệch lưới 60 phút
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    space, booking, entry = _full_space_with_waiter(
+        db, make_user, make_space, start, start + timedelta(hours=2)
+    )
+    crud_space.set_space_rules(db, space, SpaceRules(slot_minutes=60))
+
+    crud_booking.delete_booking(db, booking)
+
+    db.refresh(entry)
+    assert entry.status == "waiting"
+    assert db.execute(
+        select(Booking.id).where(Booking.space_id == space.id, Booking.user_id == entry.user_id)
+    ).first() is None